@@ -0,0 +1,86 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import sys
+
+from neutron.common import config as common_config
+from neutron import manager
+from neutron_lib import context as n_context
+from oslo_config import cfg
+import six
+
+from networking_opencontrail.common import utils
+from networking_opencontrail.sync import reconciler
+
+cli_opts = [
+    cfg.BoolOpt('dry-run', default=False,
+                help='Only report differences, do not change TF'),
+    cfg.BoolOpt('delete-orphans', default=False,
+                help='Find TF objects created by Neutron which do not exist '
+                'in Neutron anymore, and delete them when confirmed'),
+    cfg.BoolOpt('yes', default=False,
+                help='Delete orphans found with --delete-orphans without '
+                'asking for confirmation'),
+    cfg.IntOpt('page-size', default=500, min=1,
+               help='Number of resources fetched in a single request'),
+    cfg.ListOpt('resources',
+                default=[res.name for res in reconciler.RESOURCE_TYPES],
+                help='Resources to reconcile, in order of creation'),
+]
+
+
+def main():
+    cfg.CONF.register_cli_opts(cli_opts)
+    common_config.init(sys.argv[1:])
+    common_config.setup_logging()
+    utils.register_vnc_api_options()
+    manager.init()
+
+    known = dict((res.name, res) for res in reconciler.RESOURCE_TYPES)
+    unknown = set(cfg.CONF.resources) - set(known)
+    if unknown:
+        sys.exit("Unknown resources: %s" % ", ".join(sorted(unknown)))
+
+    engine = reconciler.Reconciler(page_size=cfg.CONF.page_size,
+                                   dry_run=cfg.CONF.dry_run,
+                                   find_orphans=cfg.CONF.delete_orphans)
+    context = n_context.get_admin_context()
+    report = engine.reconcile(context,
+                              [known[name] for name in cfg.CONF.resources])
+
+    if engine.orphans:
+        for resource_type, tf_obj in engine.orphans:
+            print("Orphaned %s %s: %s" % (
+                resource_type.tf_type, tf_obj['uuid'],
+                ":".join(tf_obj.get('fq_name', []))))
+        if cfg.CONF.yes or _confirm("Delete %d orphaned objects from TF?" %
+                                    len(engine.orphans)):
+            engine.delete_orphans(context, report)
+
+    failed = 0
+    for resource, stats in report.items():
+        print("%s: %s" % (resource, ", ".join(
+            "%s=%d" % (key, stats[key])
+            for key in ('created', 'updated', 'orphaned', 'deleted',
+                        'in_sync', 'failed'))))
+        failed += stats['failed']
+    return 1 if failed else 0
+
+
+def _confirm(question):
+    # Orphans are only reported when nobody can answer.
+    if not sys.stdin.isatty():
+        return False
+    answer = six.moves.input("%s [y/N] " % question)
+    return answer.strip().lower() in ('y', 'yes')
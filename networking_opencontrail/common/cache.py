@@ -0,0 +1,92 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import time
+
+MISSING = object()
+
+
+class LRUCache(object):
+    """Bounded cache with least recently used eviction and expiring entries.
+
+    :param max_size: maximum number of entries, 0 disables caching
+    :param ttl: default time to live of an entry in seconds
+    """
+
+    def __init__(self, max_size, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self.stats = collections.Counter()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Get cached value or MISSING if not cached or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return MISSING
+
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return MISSING
+
+        self._entries.pop(key)
+        self._entries[key] = entry
+        self.stats['hits'] += 1
+        return value
+
+    def peek(self, key):
+        """Get cached value without updating recency and counters."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return MISSING
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if not self.enabled or ttl <= 0:
+            return
+
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + ttl)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.stats['invalidations'] += 1
+
+    def invalidate_matching(self, predicate):
+        for key in [key for key in self._entries if predicate(key)]:
+            self.invalidate(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['size'] = len(self._entries)
+        return stats
@@ -0,0 +1,167 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+import requests
+
+from networking_opencontrail.common import metrics
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Errors meaning that API server cannot be reached. Error responses
+# are not counted, because the server is available.
+FAILURES = (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Request was rejected without sending, because circuit is open."""
+
+
+class CircuitBreaker(object):
+    """Circuit breaker of requests to an unavailable API server.
+
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail immediately with CircuitOpenError, instead of waiting for
+    connection timeout. After reset_timeout the circuit is half-open and
+    up to half_open_max_calls trial calls are let through at a time.
+    A trial which reached the server closes the circuit, one which failed
+    to connect opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0,
+                 half_open_max_calls=1, enabled=True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self.stats = collections.Counter()
+
+    @property
+    def state(self):
+        if (self._state == OPEN and
+                time.time() - self._opened_at >= self.reset_timeout):
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    @property
+    def is_open(self):
+        return self.enabled and self.state == OPEN
+
+    def allow_request(self):
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+            self._trials += 1
+            return True
+        self.stats['rejected'] += 1
+        return False
+
+    def record_success(self):
+        if self._state != CLOSED:
+            LOG.info("Circuit %s closed, API server is available again",
+                     self.name)
+        self._state = CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        self.stats['failures'] += 1
+        if (self._state == HALF_OPEN or
+                self._failures >= self.failure_threshold):
+            if self._state != OPEN:
+                self.stats['trips'] += 1
+                LOG.warning("Circuit %s opened after %d failures, requests "
+                            "fail immediately for %s seconds", self.name,
+                            self._failures, self.reset_timeout)
+            self._state = OPEN
+            self._opened_at = time.time()
+
+    def call(self, func, *args, **kwargs):
+        """Call func unless circuit is open, and record the outcome."""
+        if not self.allow_request():
+            raise CircuitOpenError(
+                "Circuit %s is open, API server is unavailable" % self.name)
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        trial = self._state == HALF_OPEN
+        try:
+            result = func(*args, **kwargs)
+        except FAILURES:
+            self.record_failure()
+            raise
+        except Exception:
+            # Other errors are raised for error responses or before the
+            # request is sent, neither means that API server is down.
+            self.record_success()
+            raise
+        finally:
+            if trial:
+                self._release_trial()
+        self.record_success()
+        return result
+
+    def _release_trial(self):
+        if self._state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['state'] = self.state
+        return stats
+
+
+_breakers = {}
+
+
+def get_circuit_breaker(name):
+    """Get circuit breaker shared by drivers of the process."""
+    conf = cfg.CONF.CIRCUIT_BREAKER
+    options = (conf.enabled, conf.failure_threshold, conf.reset_timeout,
+               conf.half_open_max_calls)
+    breaker, breaker_options = _breakers.get(name, (None, None))
+    if breaker is None or breaker_options != options:
+        breaker = CircuitBreaker(name,
+                                 failure_threshold=conf.failure_threshold,
+                                 reset_timeout=conf.reset_timeout,
+                                 half_open_max_calls=conf.half_open_max_calls,
+                                 enabled=conf.enabled)
+        _breakers[name] = (breaker, options)
+    return breaker
+
+
+def get_stats():
+    return dict((name, breaker.get_stats())
+                for name, (breaker, _) in _breakers.items())
+
+
+metrics.register_provider('circuit_breaker', get_stats)
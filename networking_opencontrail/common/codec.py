@@ -0,0 +1,174 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import codecs
+import collections
+import json
+import re
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from oslo_utils import importutils
+import six
+
+orjson = importutils.try_import('orjson')
+ujson = importutils.try_import('ujson')
+
+AUTO = 'auto'
+ALL_CODECS = ('orjson', 'ujson', 'stdlib')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class StdlibCodec(object):
+    """JSON codec of the standard library, always available."""
+
+    name = 'stdlib'
+
+    def dumps(self, obj):
+        return jsonutils.dump_as_bytes(obj)
+
+    def loads(self, data):
+        """Decode JSON document from bytes or text.
+
+        :raises ValueError: when data is not a valid JSON document
+        """
+        if not data:
+            raise ValueError("No JSON document to decode")
+        try:
+            return json.loads(data)
+        except TypeError:
+            # Older Pythons decode only text.
+            return json.loads(data.decode('utf-8'))
+
+
+class OrjsonCodec(StdlibCodec):
+    name = 'orjson'
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=jsonutils.to_primitive,
+                                option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson does not serialize integers wider than 64 bits.
+            return super(OrjsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        if not data:
+            raise ValueError("No JSON document to decode")
+        return orjson.loads(data)
+
+
+class UjsonCodec(StdlibCodec):
+    name = 'ujson'
+
+    def dumps(self, obj):
+        try:
+            return ujson.dumps(obj).encode('utf-8')
+        except (TypeError, OverflowError):
+            # ujson does not serialize dates and other objects.
+            return super(UjsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        if not data:
+            raise ValueError("No JSON document to decode")
+        return ujson.loads(data)
+
+
+# Available codecs in order of preference.
+CODECS = collections.OrderedDict()
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec()
+if ujson is not None:
+    CODECS[UjsonCodec.name] = UjsonCodec()
+CODECS[StdlibCodec.name] = StdlibCodec()
+
+
+def get_codec(name=None):
+    """Get JSON codec by name, or the fastest available one.
+
+    A codec which is not installed is replaced by the fastest available.
+    """
+    name = name or cfg.CONF.APISERVER.json_codec
+    if name in CODECS:
+        return CODECS[name]
+    return next(iter(CODECS.values()))
+
+
+def dumps(obj):
+    return get_codec().dumps(obj)
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+def iter_array(chunks):
+    """Decode items of a JSON array as chunks of the document arrive.
+
+    Only the item being decoded is kept in memory, so arrays of any size
+    can be iterated over while they are read from a response stream.
+
+    :param chunks: iterable of bytes forming a JSON array
+    :raises ValueError: when the document is not a valid JSON array
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    started = False
+    # Whether the last token was an item, so a separator must follow.
+    after_item = False
+    empty = True
+    for chunk in chunks:
+        buf = buf[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError("Expected JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                if not after_item and not empty:
+                    raise ValueError("Expected item after ',' in JSON array")
+                return
+            if after_item:
+                if buf[pos] != ',':
+                    raise ValueError("Expected ',' or ']' in JSON array")
+                after_item = False
+                pos += 1
+                continue
+            if buf[pos] == ',':
+                raise ValueError("Expected item in JSON array")
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Item continues in the next chunk.
+                break
+            if end == len(buf) and not isinstance(
+                    item, (dict, list) + six.string_types):
+                # Number or literal may continue in the next chunk.
+                break
+            pos = end
+            after_item = True
+            empty = False
+            yield item
+
+    raise ValueError("Unterminated JSON array")
@@ -0,0 +1,91 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import zlib
+
+from oslo_config import cfg
+import six
+
+from networking_opencontrail.common import metrics
+
+NONE = 'none'
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+ENCODINGS = (NONE, GZIP, DEFLATE)
+
+ACCEPT_ENCODING = '%s, %s' % (GZIP, DEFLATE)
+
+# Window bits selecting the container of zlib compressed data.
+_WBITS = {GZIP: 16 + zlib.MAX_WBITS, DEFLATE: zlib.MAX_WBITS}
+
+stats = collections.Counter()
+
+
+def compress(data, encoding=GZIP, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_request(data, headers):
+    """Compress request body when it is large enough to benefit.
+
+    Content-Encoding header is set when data is compressed. Data which
+    is not a serialized document is returned unchanged.
+
+    :returns: body of the request to send
+    """
+    conf = cfg.CONF.APISERVER
+    encoding = conf.request_compression
+    if encoding not in _WBITS:
+        return data
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    if not isinstance(data, bytes) or len(data) < conf.compression_threshold:
+        return data
+
+    compressed = compress(data, encoding, conf.compression_level)
+    if len(compressed) >= len(data):
+        return data
+
+    headers['Content-Encoding'] = encoding
+    stats['compressed_requests'] += 1
+    stats['request_bytes_saved'] += len(data) - len(compressed)
+    return compressed
+
+
+def record_response(response):
+    """Count bytes saved by a compressed response which was read.
+
+    requests decodes compressed responses transparently, size of the
+    encoded body is the number of bytes read from the connection.
+    """
+    encoding = response.headers.get('Content-Encoding')
+    if encoding not in _WBITS:
+        return
+    stats['compressed_responses'] += 1
+    try:
+        received = response.raw.tell()
+    except AttributeError:
+        return
+    if isinstance(received, six.integer_types):
+        stats['response_bytes_saved'] += max(
+            len(response.content) - received, 0)
+
+
+def get_stats():
+    return dict(stats)
+
+
+metrics.register_provider('compression', get_stats)
@@ -19,3 +19,15 @@ VNC_API_DEFAULT_PORT = 8082
 VNC_API_DEFAULT_BASE_URL = '/'
 VNC_API_DEFAULT_USE_SSL = False
 VNC_API_DEFAULT_INSECURE = False
+VNC_API_DEFAULT_POOL_SIZE = 10
+VNC_API_DEFAULT_CONNECT_TIMEOUT = 10.0
+VNC_API_DEFAULT_READ_TIMEOUT = 120.0
+VNC_API_DEFAULT_BULK_CONCURRENCY = 8
+VNC_API_DEFAULT_HEALTH_CHECK_INTERVAL = 10.0
+VNC_API_DEFAULT_LIST_PAGE_SIZE = 500
+VNC_API_DEFAULT_COMPRESSION_THRESHOLD = 4096
+VNC_API_DEFAULT_COMPRESSION_LEVEL = 6
+
+# Keystone defaults
+KEYSTONE_DEFAULT_DOMAIN = 'Default'
+KEYSTONE_DEFAULT_TOKEN_REFRESH_MARGIN = 300.0
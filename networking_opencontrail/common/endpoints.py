@@ -0,0 +1,201 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import itertools
+import os
+
+import eventlet
+from oslo_config import cfg
+from oslo_log import log as logging
+import requests
+from urllib3 import exceptions as urllib3_exc
+
+LOG = logging.getLogger(__name__)
+
+
+class Endpoint(object):
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.healthy = True
+        self.outstanding = 0
+
+    def make_url(self, scheme, path=''):
+        return "%s://%s:%s%s" % (scheme, self.host, self.port, path)
+
+    def __repr__(self):
+        return "%s:%s" % (self.host, self.port)
+
+
+class EndpointPool(object):
+    """Pool of VNC API servers of a TF config cluster.
+
+    Requests go to the healthy server with the least outstanding requests.
+    When connection to a server fails, it is marked unhealthy and the
+    request is repeated on the next server. Unhealthy servers are probed
+    in background and return to the pool when they respond again.
+
+    :param verify: verify argument of requests used by probes
+    :param cert: cert argument of requests used by probes
+    """
+
+    def __init__(self, hosts, port, verify=True, cert=None):
+        self.port = port
+        self.verify = verify
+        self.cert = cert
+        self.endpoints = [Endpoint(host, port) for host in hosts]
+        self._rotation = itertools.count()
+        self._prober_pid = None
+        self._prober = None
+
+    @property
+    def hosts(self):
+        return [endpoint.host for endpoint in self.endpoints]
+
+    def get_ordered(self):
+        """Get endpoints in order in which they should be tried."""
+        if not self.endpoints:
+            return []
+        # Rotation spreads requests between idle endpoints.
+        shift = next(self._rotation) % len(self.endpoints)
+        rotated = self.endpoints[shift:] + self.endpoints[:shift]
+        return sorted(rotated, key=lambda endpoint: (not endpoint.healthy,
+                                                     endpoint.outstanding))
+
+    def request(self, send, idempotent=False):
+        """Call send(endpoint), failing over to other endpoints.
+
+        Request is repeated on the next endpoint only when connection to
+        the server could not be established, so the server did not get
+        it. Connection errors after that are repeated only for idempotent
+        requests. Other errors and responses with error status are
+        returned to the caller.
+        """
+        self._ensure_prober()
+        error = requests.exceptions.ConnectionError(
+            "No VNC API server is configured")
+        for endpoint in self.get_ordered():
+            endpoint.outstanding += 1
+            try:
+                return send(endpoint)
+            except requests.exceptions.ConnectionError as exc:
+                error = exc
+                self.mark_unhealthy(endpoint, exc)
+                if not idempotent and not is_connect_error(exc):
+                    raise
+            finally:
+                endpoint.outstanding -= 1
+        raise error
+
+    def mark_unhealthy(self, endpoint, reason=None):
+        if endpoint.healthy:
+            LOG.warning("VNC API server %s is unavailable: %s",
+                        endpoint, reason)
+        endpoint.healthy = False
+
+    def probe(self, endpoint, scheme):
+        try:
+            requests.get(endpoint.make_url(scheme), verify=self.verify,
+                         cert=self.cert,
+                         timeout=cfg.CONF.APISERVER.connect_timeout)
+        except requests.exceptions.RequestException as exc:
+            self.mark_unhealthy(endpoint, exc)
+            return False
+
+        if not endpoint.healthy:
+            LOG.info("VNC API server %s is available again", endpoint)
+        endpoint.healthy = True
+        return True
+
+    def _ensure_prober(self):
+        # Green threads do not survive fork of Neutron workers.
+        pid = os.getpid()
+        if len(self.endpoints) < 2 or self._prober_pid == pid:
+            return
+        self._prober_pid = pid
+        self._prober = eventlet.spawn(self._probe_loop)
+
+    def stop(self):
+        """Stop probing endpoints of a pool which is no longer used."""
+        # Prober of the parent process does not run in forked workers.
+        if self._prober is not None and self._prober_pid == os.getpid():
+            self._prober.kill()
+        self._prober = None
+        self._prober_pid = None
+
+    def _probe_loop(self):
+        scheme = 'https' if cfg.CONF.APISERVER.use_ssl else 'http'
+        while True:
+            eventlet.sleep(cfg.CONF.APISERVER.health_check_interval)
+            for endpoint in self.endpoints:
+                try:
+                    self.probe(endpoint, scheme)
+                except Exception:
+                    LOG.exception("Unexpected error while probing %s",
+                                  endpoint)
+
+
+def is_connect_error(exc):
+    """Check if request failed before connection to the server was made."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, 'reason', reason)
+    # NewConnectionError is raised when the server refused connection
+    # or its address could not be resolved.
+    return isinstance(reason, (urllib3_exc.NewConnectionError,
+                               urllib3_exc.ConnectTimeoutError))
+
+
+_endpoint_pool = None
+_endpoint_pool_pid = None
+
+
+def parse_hosts(value):
+    return [host.strip() for host in value.split(',') if host.strip()]
+
+
+def _get_tls_options():
+    """Get verify and cert arguments of requests matching the drivers."""
+    apiserver = cfg.CONF.APISERVER
+    if apiserver.insecure:
+        verify = False
+    elif apiserver.use_ssl and apiserver.cafile:
+        verify = apiserver.cafile
+    else:
+        verify = True
+    cert = None
+    if apiserver.use_ssl and apiserver.certfile and apiserver.keyfile:
+        cert = (apiserver.certfile, apiserver.keyfile)
+    return verify, cert
+
+
+def get_endpoint_pool():
+    """Get pool of VNC API servers shared by drivers of the process."""
+    global _endpoint_pool, _endpoint_pool_pid
+
+    pid = os.getpid()
+    hosts = parse_hosts(cfg.CONF.APISERVER.api_server_ip)
+    port = cfg.CONF.APISERVER.api_server_port
+    verify, cert = _get_tls_options()
+    if (_endpoint_pool is None or _endpoint_pool_pid != pid or
+            _endpoint_pool.hosts != hosts or
+            _endpoint_pool.port != port or
+            _endpoint_pool.verify != verify or
+            _endpoint_pool.cert != cert):
+        if _endpoint_pool is not None:
+            _endpoint_pool.stop()
+        _endpoint_pool = EndpointPool(hosts, port, verify=verify, cert=cert)
+        _endpoint_pool_pid = pid
+    return _endpoint_pool
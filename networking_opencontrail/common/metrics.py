@@ -0,0 +1,423 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+"""Latency, payload size and status metrics of requests to Tungsten Fabric.
+
+Requests are observed per (client, resource, action), where client is the
+interface used to talk to TF: 'neutron' for the /neutron endpoint of VNC
+API, 'vnc_api' for VNC API library and 'rest' for its REST resources.
+Every Neutron worker keeps its own metrics and exports them periodically.
+"""
+import atexit
+import bisect
+import collections
+import errno
+import fcntl
+import os
+import re
+import socket
+import tempfile
+import time
+
+import eventlet
+from oslo_config import cfg
+from oslo_log import log as logging
+import six
+
+LOG = logging.getLogger(__name__)
+
+PROMETHEUS_FILE = 'prometheus_file'
+STATSD = 'statsd'
+EXPORTERS = (PROMETHEUS_FILE, STATSD)
+
+PREFIX = 'networking_opencontrail'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Statsd samples kept between exports when they are produced faster
+# than exported.
+_MAX_STATSD_SAMPLES = 10000
+_MAX_STATSD_PACKET = 1400
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+
+
+class Histogram(object):
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Measurement(object):
+    """Context manager observing a request to TF.
+
+    Status is taken from the exception raised by the request, unless it
+    is set by the caller, e.g. to the status code of the response.
+    """
+
+    __slots__ = ('registry', 'key', 'status', 'request_size',
+                 'response_size', 'start')
+
+    def __init__(self, registry, key, request_size=None):
+        self.registry = registry
+        self.key = key
+        self.status = 'ok'
+        self.request_size = request_size
+        self.response_size = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.status = exc_type.__name__
+        self.registry.observe(self.key, time.time() - self.start,
+                              self.status, self.request_size,
+                              self.response_size)
+
+
+class _NullMeasurement(object):
+    """Measurement ignored when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class Registry(object):
+    def __init__(self):
+        self.latency = {}
+        self.request_size = {}
+        self.response_size = {}
+        self.responses = collections.Counter()
+        self.statsd_samples = collections.deque(maxlen=_MAX_STATSD_SAMPLES)
+        self.providers = collections.OrderedDict()
+
+    def observe(self, key, latency, status, request_size=None,
+                response_size=None):
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(latency)
+        self.responses[key + (str(status),)] += 1
+        if request_size is not None:
+            self._observe_size(self.request_size, key, request_size)
+        if response_size is not None:
+            self._observe_size(self.response_size, key, response_size)
+        if _statsd_enabled():
+            self.statsd_samples.append((key, latency, status))
+
+    @staticmethod
+    def _observe_size(histograms, key, size):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(SIZE_BUCKETS)
+        histogram.observe(size)
+
+    def collect_provided(self):
+        """Get numeric statistics of plugin components as flat names."""
+        values = []
+        for component, provider in self.providers.items():
+            try:
+                stats = provider()
+            except Exception:
+                LOG.exception("Failed to get statistics of %s", component)
+                continue
+            values.extend(_flatten(component, stats or {}))
+        return values
+
+    def render_prometheus(self, worker=None):
+        labels = ('client', 'resource', 'action')
+        extra = {'worker': worker} if worker is not None else {}
+        lines = []
+        for name, histograms in (
+                ('request_duration_seconds', self.latency),
+                ('request_size_bytes', self.request_size),
+                ('response_size_bytes', self.response_size)):
+            if not histograms:
+                continue
+            name = '%s_%s' % (PREFIX, name)
+            lines.append('# TYPE %s histogram' % name)
+            for key, histogram in sorted(histograms.items()):
+                key_labels = dict(zip(labels, key), **extra)
+                for bound, count in histogram.cumulative_counts():
+                    lines.append('%s_bucket%s %d' % (
+                        name, _format_labels(key_labels,
+                                             le=_format_bound(bound)),
+                        count))
+                lines.append('%s_sum%s %s' % (
+                    name, _format_labels(key_labels), histogram.sum))
+                lines.append('%s_count%s %d' % (
+                    name, _format_labels(key_labels), histogram.count))
+
+        if self.responses:
+            name = '%s_responses_total' % PREFIX
+            lines.append('# TYPE %s counter' % name)
+            for key, count in sorted(self.responses.items()):
+                key_labels = dict(zip(labels + ('status',), key), **extra)
+                lines.append('%s%s %d' % (name, _format_labels(key_labels),
+                                          count))
+
+        for stat_name, value in self.collect_provided():
+            name = '%s_%s' % (PREFIX, stat_name)
+            lines.append('# TYPE %s gauge' % name)
+            lines.append('%s%s %s' % (name, _format_labels(extra), value))
+        return '\n'.join(lines) + '\n'
+
+    def render_statsd(self, prefix):
+        lines = []
+        while self.statsd_samples:
+            key, latency, status = self.statsd_samples.popleft()
+            path = '.'.join(_statsd_name(part) for part in key)
+            lines.append('%s.%s.duration:%.3f|ms' % (prefix, path,
+                                                     latency * 1000))
+            lines.append('%s.%s.status.%s:1|c' % (prefix, path,
+                                                  _statsd_name(status)))
+        for stat_name, value in self.collect_provided():
+            lines.append('%s.%s:%s|g' % (prefix, stat_name, value))
+        return lines
+
+
+def _flatten(name, stats):
+    for key, value in sorted(stats.items()):
+        stat_name = _INVALID_NAME_CHARS.sub('_', '%s_%s' % (name, key))
+        if isinstance(value, dict):
+            for item in _flatten(stat_name, value):
+                yield item
+        elif isinstance(value, bool):
+            yield stat_name, int(value)
+        elif isinstance(value, six.integer_types + (float,)):
+            yield stat_name, value
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in sorted(labels.items()))
+
+
+def _statsd_name(value):
+    return _INVALID_NAME_CHARS.sub('_', str(value))
+
+
+def _statsd_enabled():
+    return cfg.CONF.METRICS.exporter == STATSD
+
+
+_registry = None
+_registry_pid = None
+_providers = collections.OrderedDict()
+
+
+def get_registry():
+    """Get metrics of the current process, exported in background."""
+    global _registry, _registry_pid
+
+    pid = os.getpid()
+    if _registry is None or _registry_pid != pid:
+        # Metrics of the parent process are not inherited by workers.
+        _registry = Registry()
+        _registry.providers = _providers
+        _registry_pid = pid
+        if cfg.CONF.METRICS.exporter in EXPORTERS:
+            eventlet.spawn_n(_export_loop, _registry)
+    return _registry
+
+
+def register_provider(name, provider):
+    """Export statistics returned by provider() along with metrics.
+
+    Numeric values of the returned dict, nested dicts included, are
+    exported as gauges named after the component and the keys.
+    """
+    _providers[name] = provider
+
+
+def measure(client, resource, action, request_size=None):
+    """Measure a request to TF in a with statement."""
+    if not cfg.CONF.METRICS.enabled:
+        return _NullMeasurement()
+    return Measurement(get_registry(), (client, resource, action),
+                       request_size)
+
+
+def export(registry):
+    conf = cfg.CONF.METRICS
+    if conf.exporter == PROMETHEUS_FILE:
+        write_prometheus_file(registry, conf.textfile_dir)
+    elif conf.exporter == STATSD:
+        send_statsd(registry, conf.statsd_host, conf.statsd_port,
+                    conf.statsd_prefix)
+
+
+def write_prometheus_file(registry, directory):
+    """Write metrics for node_exporter textfile collector.
+
+    Each worker writes its own file, which is replaced atomically,
+    so the collector never reads a partially written one.
+    """
+    slot = _get_worker_slot(directory)
+    path = _slot_path(directory, slot, 'prom')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.%s' % PREFIX)
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(registry.render_prometheus(worker=slot))
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+_worker_slot = None
+_worker_slot_pid = None
+_SLOT_FILE = re.compile(r'^%s_(\d+)\.prom$' % PREFIX)
+
+
+def _slot_path(directory, slot, extension):
+    return os.path.join(directory, '%s_%d.%s' % (PREFIX, slot, extension))
+
+
+def _lock_slot(directory, slot, create=True):
+    """Lock file of the slot, return its descriptor or None when taken."""
+    path = _slot_path(directory, slot, 'lock')
+    try:
+        fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+    except OSError as exc:
+        if exc.errno == errno.ENOENT and not create:
+            return None
+        raise
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        os.close(fd)
+        return None
+    return fd
+
+
+def _get_worker_slot(directory):
+    """Get index of the worker, stable across restarts of workers.
+
+    Worker holds a lock of the slot file for its lifetime, so the slot is
+    reused by a worker which replaces it. The number of files and of
+    exported series is bounded by the number of workers instead of
+    growing with every restart.
+    """
+    global _worker_slot, _worker_slot_pid
+
+    pid = os.getpid()
+    if (_worker_slot is not None and _worker_slot_pid == pid and
+            _worker_slot[0] == directory):
+        return _worker_slot[1]
+    if _worker_slot is not None and _worker_slot_pid == pid:
+        os.close(_worker_slot[2])
+
+    slot = 0
+    fd = _lock_slot(directory, slot)
+    while fd is None:
+        slot += 1
+        fd = _lock_slot(directory, slot)
+    _worker_slot = (directory, slot, fd)
+    _worker_slot_pid = pid
+    _remove_stale_files(directory, slot)
+    return slot
+
+
+def _remove_stale_files(directory, own_slot):
+    """Remove files of slots which are not held by any worker."""
+    for name in os.listdir(directory):
+        match = _SLOT_FILE.match(name)
+        if not match or int(match.group(1)) == own_slot:
+            continue
+        slot = int(match.group(1))
+        lock_path = _slot_path(directory, slot, 'lock')
+        # File without a lock was written by a previous version, which
+        # named files after pids of workers.
+        fd = _lock_slot(directory, slot, create=False)
+        if fd is None and os.path.exists(lock_path):
+            continue
+        try:
+            os.unlink(os.path.join(directory, name))
+            LOG.debug("Removed stale metrics file %s", name)
+        except OSError:
+            pass
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+@atexit.register
+def _remove_prometheus_file():
+    # Handler is inherited by forked workers, which must not remove
+    # the file of their parent.
+    if _worker_slot is None or _worker_slot_pid != os.getpid():
+        return
+    directory, slot, _ = _worker_slot
+    try:
+        os.unlink(_slot_path(directory, slot, 'prom'))
+    except OSError:
+        pass
+
+
+def send_statsd(registry, host, port, prefix):
+    lines = registry.render_statsd(prefix)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packet = []
+        size = 0
+        for line in lines:
+            if packet and size + len(line) + 1 > _MAX_STATSD_PACKET:
+                sock.sendto('\n'.join(packet).encode('utf-8'), (host, port))
+                packet = []
+                size = 0
+            packet.append(line)
+            size += len(line) + 1
+        if packet:
+            sock.sendto('\n'.join(packet).encode('utf-8'), (host, port))
+    finally:
+        sock.close()
+
+
+def _export_loop(registry):
+    while True:
+        eventlet.sleep(cfg.CONF.METRICS.export_interval)
+        try:
+            export(registry)
+        except Exception:
+            LOG.exception("Failed to export metrics")
@@ -0,0 +1,174 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import os
+
+from eventlet import semaphore
+from keystoneauth1 import exceptions as ks_exceptions
+from keystoneauth1.identity import generic
+from keystoneauth1 import session as ks_session
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from networking_opencontrail.common import metrics
+
+LOG = logging.getLogger(__name__)
+
+
+class TokenManager(object):
+    """Keystone token of the plugin shared by all clients of a process.
+
+    Keystone is asked for a token only after API server rejected a request
+    without one, so API server which does not authenticate requests works
+    without keystone credentials. Token is then refreshed before it
+    expires, so requests are not rejected by API server first. Only one
+    refresh runs at a time, green threads which need a token meanwhile
+    wait for its result instead of sending their own requests to keystone.
+
+    :param auth: keystoneauth plugin used to get tokens
+    :param refresh_margin: time in seconds before expiry when token is
+                           refreshed
+    :param static_token: token sent until API server rejects it
+    """
+
+    def __init__(self, auth, refresh_margin=300.0, verify=True, cert=None,
+                 static_token=None):
+        self.auth = auth
+        self.refresh_margin = refresh_margin
+        self.static_token = static_token
+        self.session = ks_session.Session(auth=auth, verify=verify,
+                                          cert=cert)
+        self._access = None
+        self._lock = semaphore.Semaphore()
+        self.stats = collections.Counter()
+
+    def get_token(self):
+        access = self._access
+        if access is not None and not self._needs_refresh(access):
+            return access.auth_token
+
+        with self._lock:
+            # Another green thread might have refreshed token meanwhile.
+            access = self._access
+            if access is None or self._needs_refresh(access):
+                access = self._authenticate()
+            return access.auth_token
+
+    def current_token(self):
+        """Get token to send with a request, None when none is needed yet."""
+        if self._access is None:
+            return self.static_token
+        return self.get_token()
+
+    def invalidate(self, token=None):
+        """Drop token rejected by API server.
+
+        Token is dropped only when it is still the current one, so
+        requests rejected at the same time cause a single refresh.
+        """
+        if self.static_token and token in (None, self.static_token):
+            self.static_token = None
+        access = self._access
+        if access is not None and token in (None, access.auth_token):
+            self._access = None
+            self.stats['invalidations'] += 1
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def _needs_refresh(self, access):
+        return access.will_expire_soon(stale_duration=self.refresh_margin)
+
+    def _authenticate(self):
+        self.auth.invalidate()
+        try:
+            access = self.auth.get_access(self.session)
+        except ks_exceptions.ClientException as exc:
+            self.stats['failures'] += 1
+            LOG.error("Failed to get token from keystone: %s", exc)
+            raise RuntimeError('Authentication Failure')
+
+        self._access = access
+        self.stats['refreshes'] += 1
+        LOG.debug("Got token from keystone valid until %s", access.expires)
+        return access
+
+
+_token_manager = None
+_token_manager_key = None
+
+
+def _get_auth_options():
+    kcfg = cfg.CONF.keystone_authtoken
+    auth_url = cfg.CONF.APISERVER.auth_url
+    if not auth_url and cfg.CONF.APISERVER.auth_token_url:
+        # Deprecated option pointed to the tokens resource of keystone v2.0,
+        # version is discovered from the URL of the identity API.
+        auth_url = cfg.CONF.APISERVER.auth_token_url
+        if auth_url.rstrip('/').endswith('/tokens'):
+            auth_url = auth_url.rstrip('/')[:-len('/tokens')]
+    if not auth_url:
+        auth_url = "%s://%s:%s/v3" % (kcfg.auth_protocol, kcfg.auth_host,
+                                      kcfg.auth_port)
+    return dict(auth_url=auth_url,
+                username=kcfg.admin_user,
+                password=kcfg.admin_password,
+                project_name=kcfg.admin_tenant_name,
+                user_domain_name=cfg.CONF.APISERVER.user_domain_name,
+                project_domain_name=cfg.CONF.APISERVER.project_domain_name)
+
+
+def _get_admin_token():
+    try:
+        admin_token = cfg.CONF.keystone_authtoken.admin_token
+    except cfg.NoSuchOptError:
+        return None
+    if admin_token:
+        LOG.warning("keystone_authtoken.admin_token is deprecated, it is "
+                    "sent to API server until rejected, then tokens are "
+                    "requested from keystone")
+    return admin_token
+
+
+def get_token_manager():
+    """Get token manager of the process or None without keystone auth."""
+    global _token_manager, _token_manager_key
+
+    if cfg.CONF.auth_strategy != 'keystone':
+        return None
+
+    options = _get_auth_options()
+    key = (os.getpid(), tuple(sorted(options.items())))
+    if _token_manager is None or _token_manager_key != key:
+        kcfg = cfg.CONF.keystone_authtoken
+        verify = False if kcfg.insecure else (kcfg.cafile or True)
+        cert = None
+        if kcfg.certfile and kcfg.keyfile:
+            cert = (kcfg.certfile, kcfg.keyfile)
+        _token_manager = TokenManager(
+            generic.Password(**options),
+            refresh_margin=cfg.CONF.APISERVER.token_refresh_margin,
+            verify=verify, cert=cert, static_token=_get_admin_token())
+        _token_manager_key = key
+    return _token_manager
+
+
+def get_stats():
+    if _token_manager is None:
+        return {}
+    return _token_manager.get_stats()
+
+
+metrics.register_provider('keystone_tokens', get_stats)
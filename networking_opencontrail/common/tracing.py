@@ -0,0 +1,213 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+"""Tracing of callbacks and of requests to Tungsten Fabric they make.
+
+A callback decorated with traced() starts a trace, when it is sampled.
+Requests to TF made by the callback are recorded as nested spans, so the
+trace shows where wall time of e.g. a router update goes. Unlike
+log_method_call, arguments are not formatted unless the call is sampled,
+a span outside of a trace costs an attribute lookup.
+"""
+import functools
+import inspect
+import itertools
+import random
+import time
+import uuid
+
+from eventlet.greenthread import getcurrent
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from oslo_utils import importutils
+import six
+
+osprofiler_profiler = importutils.try_import('osprofiler.profiler')
+
+LOG = logging.getLogger(__name__)
+
+FILE = 'file'
+OSPROFILER = 'osprofiler'
+EXPORTERS = (FILE, OSPROFILER)
+
+_TRACE_ATTR = 'tf_trace'
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    __slots__ = ('trace', 'name', 'info', 'span_id', 'parent_id', 'start',
+                 'duration')
+
+    def __init__(self, trace, name, info):
+        self.trace = trace
+        self.name = name
+        self.info = info
+        self.span_id = None
+        self.parent_id = None
+        self.start = None
+        self.duration = None
+
+    def __enter__(self):
+        self.span_id = next(self.trace.span_ids)
+        if self.trace.stack:
+            self.parent_id = self.trace.stack[-1].span_id
+        self.trace.stack.append(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.time() - self.start
+        if exc_type is not None:
+            self.info['error'] = exc_type.__name__
+        self.trace.stack.pop()
+        self.trace.spans.append(self)
+
+    def to_dict(self):
+        return {'id': self.span_id, 'parent_id': self.parent_id,
+                'name': self.name, 'start': self.start,
+                'duration': self.duration, 'info': self.info}
+
+
+class Trace(object):
+    """Spans of a sampled callback, written to a file when it finishes."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.span_ids = itertools.count(1)
+        self.stack = []
+        self.spans = []
+
+    def span(self, name, info):
+        return Span(self, name, info)
+
+    def export(self):
+        with open(cfg.CONF.TRACING.file_path, 'a') as trace_file:
+            trace_file.write(jsonutils.dumps(
+                {'trace_id': self.trace_id,
+                 'spans': [span.to_dict() for span in self.spans]}) + '\n')
+        root = self.spans[-1]
+        LOG.debug("Trace %(trace)s of %(name)s took %(duration).3f s",
+                  {'trace': self.trace_id, 'name': root.name,
+                   'duration': root.duration})
+
+
+class OsprofilerTrace(object):
+    """Spans recorded as points of the osprofiler trace of the request."""
+
+    def span(self, name, info):
+        return osprofiler_profiler.Trace(name, info=info)
+
+    def export(self):
+        # osprofiler notifier has already sent the spans.
+        pass
+
+
+def span(name, **info):
+    """Record a nested span when it is made within a sampled trace."""
+    trace = getattr(getcurrent(), _TRACE_ATTR, None)
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name, info)
+
+
+def traced(func):
+    """Decorate a callback to record it as a span.
+
+    The callback starts a new trace when it is not called within one
+    and it is sampled. Resource IDs are taken from its arguments.
+    """
+    name = '%s.%s' % (func.__module__,
+                      getattr(func, '__qualname__', func.__name__))
+    arg_names = _get_arg_names(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        current = getcurrent()
+        trace = getattr(current, _TRACE_ATTR, None)
+        if trace is not None:
+            with trace.span(name, _get_resource_ids(arg_names, args,
+                                                    kwargs)):
+                return func(*args, **kwargs)
+
+        trace = _start_trace()
+        if trace is None:
+            return func(*args, **kwargs)
+        setattr(current, _TRACE_ATTR, trace)
+        try:
+            with trace.span(name, _get_resource_ids(arg_names, args,
+                                                    kwargs)):
+                return func(*args, **kwargs)
+        finally:
+            setattr(current, _TRACE_ATTR, None)
+            try:
+                trace.export()
+            except Exception:
+                LOG.exception("Failed to export trace of %s", name)
+
+    return wrapper
+
+
+def _start_trace():
+    try:
+        conf = cfg.CONF.TRACING
+    except cfg.NoSuchOptError:
+        # Options are registered by the mechanism driver, service plugins
+        # may be used without it.
+        return None
+    if not conf.enabled or conf.exporter not in EXPORTERS:
+        return None
+    if conf.sample_rate < 1.0 and random.random() >= conf.sample_rate:
+        return None
+    if conf.exporter == OSPROFILER:
+        # Requests are traced by osprofiler only when asked for by client.
+        if osprofiler_profiler is None or osprofiler_profiler.get() is None:
+            return None
+        return OsprofilerTrace()
+    return Trace()
+
+
+def _get_arg_names(func):
+    if six.PY2:
+        return inspect.getargspec(func).args
+    return inspect.getfullargspec(func).args
+
+
+def _get_resource_ids(arg_names, args, kwargs):
+    """Get IDs of resources passed to a callback, as span info."""
+    arguments = dict(zip(arg_names, args))
+    arguments.update(kwargs)
+    info = {}
+    for arg_name, value in arguments.items():
+        if arg_name == 'payload':
+            resource_id = getattr(value, 'resource_id', None)
+            if isinstance(resource_id, six.string_types):
+                info['resource_id'] = resource_id
+        elif isinstance(value, dict):
+            if isinstance(value.get('id'), six.string_types):
+                info['%s_id' % arg_name] = value['id']
+        elif (arg_name.endswith('_id') and
+                isinstance(value, six.string_types)):
+            info[arg_name] = value
+    return info
@@ -12,16 +12,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
 import requests
+from requests import adapters
 
 from oslo_config import cfg
 
+from networking_opencontrail.common import codec
+from networking_opencontrail.common import compression
 from networking_opencontrail.common import constants
+from networking_opencontrail.common import endpoints
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import tracing
 
 vnc_opts = [
     cfg.StrOpt('api_server_ip',
                default=constants.VNC_API_DEFAULT_HOST,
-               help='IP address to connect to VNC API'),
+               help='IP address to connect to VNC API, or comma separated '
+               'addresses of all VNC API servers of a cluster'),
     cfg.IntOpt('api_server_port',
                default=constants.VNC_API_DEFAULT_PORT,
                help='Port to connect to VNC API'),
@@ -39,7 +48,82 @@ vnc_opts = [
     cfg.StrOpt('keyfile',
                help='Key file path to connect securely to  VNC API'),
     cfg.StrOpt('cafile',
-               help='CA file path to connect securely to VNC API')
+               help='CA file path to connect securely to VNC API'),
+    cfg.IntOpt('connection_pool_size',
+               default=constants.VNC_API_DEFAULT_POOL_SIZE,
+               min=1,
+               help='Maximum number of connections kept open to the VNC API '
+               'by a single Neutron worker'),
+    cfg.BoolOpt('keep_alive',
+                default=True,
+                help='Reuse connections to VNC API between requests'),
+    cfg.FloatOpt('connect_timeout',
+                 default=constants.VNC_API_DEFAULT_CONNECT_TIMEOUT,
+                 help='Timeout in seconds for establishing a connection '
+                 'to VNC API'),
+    cfg.FloatOpt('read_timeout',
+                 default=constants.VNC_API_DEFAULT_READ_TIMEOUT,
+                 help='Timeout in seconds for waiting on VNC API response'),
+    cfg.FloatOpt('health_check_interval',
+                 default=constants.VNC_API_DEFAULT_HEALTH_CHECK_INTERVAL,
+                 help='Interval in seconds between checks of availability '
+                 'of VNC API servers, when more than one is configured'),
+    cfg.IntOpt('bulk_concurrency',
+               default=constants.VNC_API_DEFAULT_BULK_CONCURRENCY,
+               min=1,
+               help='Maximum number of requests of a bulk operation sent '
+               'to VNC API at the same time'),
+    cfg.IntOpt('list_page_size',
+               default=constants.VNC_API_DEFAULT_LIST_PAGE_SIZE,
+               min=1,
+               help='Number of resources requested at once when resources '
+               'are iterated over page by page'),
+    cfg.StrOpt('request_compression',
+               default=compression.NONE,
+               choices=compression.ENCODINGS,
+               help='Encoding used to compress bodies of requests to VNC API '
+               'which exceed compression_threshold. VNC API must accept '
+               'compressed requests, e.g. behind a proxy decoding them'),
+    cfg.IntOpt('compression_threshold',
+               default=constants.VNC_API_DEFAULT_COMPRESSION_THRESHOLD,
+               min=0,
+               help='Minimal size in bytes of a request body compressed '
+               'before it is sent to VNC API'),
+    cfg.IntOpt('compression_level',
+               default=constants.VNC_API_DEFAULT_COMPRESSION_LEVEL,
+               min=1,
+               max=9,
+               help='Level of compression of request bodies, from 1 being '
+               'the fastest to 9 being the smallest'),
+    cfg.BoolOpt('stream_list_responses',
+                default=False,
+                help='Decode listings of resources while they are '
+                'received from VNC API, instead of buffering them'),
+    cfg.StrOpt('json_codec',
+               default=codec.AUTO,
+               choices=[codec.AUTO] + list(codec.ALL_CODECS),
+               help='JSON library used to encode requests to VNC API and '
+               'decode its responses. auto selects the fastest installed '
+               'one of orjson, ujson and stdlib'),
+    cfg.StrOpt('auth_url',
+               help='Keystone v3 URL used to get tokens for VNC API, '
+               'derived from keystone_authtoken options when not set'),
+    cfg.StrOpt('auth_token_url',
+               deprecated_for_removal=True,
+               deprecated_reason='Use auth_url, version of keystone API '
+               'is discovered from it',
+               help='Keystone v2.0 tokens URL used to get tokens for VNC '
+               'API, when auth_url is not set'),
+    cfg.StrOpt('user_domain_name',
+               default=constants.KEYSTONE_DEFAULT_DOMAIN,
+               help='Domain of the user used to get tokens for VNC API'),
+    cfg.StrOpt('project_domain_name',
+               default=constants.KEYSTONE_DEFAULT_DOMAIN,
+               help='Domain of the project used to get tokens for VNC API'),
+    cfg.FloatOpt('token_refresh_margin',
+                 default=constants.KEYSTONE_DEFAULT_TOKEN_REFRESH_MARGIN,
+                 help='Time in seconds before expiry when token for VNC API '
+                 'is refreshed'),
 ]
 
 dm_integration_opts = [
@@ -50,6 +134,187 @@ dm_integration_opts = [
     cfg.StrOpt('topology',
                help='File path to yaml file with topology of baremetals '
                'used by DM integration'),
+    cfg.BoolOpt('topology_snapshot',
+                default=False,
+                help='Keep in memory a snapshot of topology read from VNC '
+                'API, instead of reading it for every port. Not used when '
+                'topology file is set'),
+    cfg.FloatOpt('topology_refresh_interval',
+                 default=60.0,
+                 help='Interval in seconds after which topology snapshot '
+                 'is reloaded'),
+]
+
+async_postcommit_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Send changes from ML2 postcommit calls to VNC API '
+                'asynchronously, without blocking Neutron API worker'),
+    cfg.IntOpt('workers',
+               default=4,
+               min=1,
+               help='Number of green threads sending queued operations'),
+    cfg.IntOpt('max_retries',
+               default=5,
+               min=0,
+               help='Number of retries of a failed queued operation'),
+    cfg.FloatOpt('retry_interval',
+                 default=1.0,
+                 help='Initial interval in seconds between retries, '
+                 'doubled after every failure'),
+    cfg.FloatOpt('max_retry_interval',
+                 default=30.0,
+                 help='Maximum interval in seconds between retries'),
+]
+
+journal_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Record failed ML2 operations in a persistent journal '
+                'and replay them in background'),
+    cfg.StrOpt('path',
+               default='/var/lib/neutron/opencontrail_journal.sqlite',
+               help='Path to SQLite file with the journal, shared by all '
+               'Neutron workers on the host'),
+    cfg.FloatOpt('replay_interval',
+                 default=5.0,
+                 help='Interval in seconds between checks for operations '
+                 'to replay'),
+    cfg.FloatOpt('retry_interval',
+                 default=2.0,
+                 help='Initial interval in seconds before replaying a failed '
+                 'operation again, doubled after every failure'),
+    cfg.FloatOpt('max_retry_interval',
+                 default=300.0,
+                 help='Maximum interval in seconds between replays of '
+                 'a failed operation'),
+    cfg.IntOpt('max_attempts',
+               default=20,
+               min=0,
+               help='Number of replays after which operation is dropped '
+               'from the journal. 0 means never'),
+    cfg.FloatOpt('claim_timeout',
+                 default=300.0,
+                 help='Time in seconds after which an operation claimed by '
+                 'a worker which did not finish it can be replayed by '
+                 'another worker'),
+]
+
+vnc_cache_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Cache objects read from VNC API by the plugin'),
+    cfg.IntOpt('max_size',
+               default=10000,
+               min=0,
+               help='Maximum number of cached objects, least recently used '
+               'objects are evicted first'),
+    cfg.FloatOpt('default_ttl',
+                 default=30.0,
+                 help='Time in seconds for which an object is cached'),
+    cfg.DictOpt('ttls',
+                default={'virtual_router': '300',
+                         'node': '300',
+                         'port': '300',
+                         'physical_router': '300',
+                         'physical_interface': '60',
+                         'project': '300'},
+                help='Time in seconds for which objects of a type are '
+                'cached, overriding default_ttl. 0 disables caching '
+                'of the type'),
+    cfg.FloatOpt('negative_ttl',
+                 default=5.0,
+                 help='Time in seconds for which a missing object '
+                 'is remembered'),
+]
+
+vrouter_index_opts = [
+    cfg.FloatOpt('refresh_interval',
+                 default=300.0,
+                 help='Interval in seconds between reloads of virtual routers '
+                 'used to check if a port can be bound on a host'),
+    cfg.FloatOpt('miss_refresh_interval',
+                 default=30.0,
+                 help='Minimal interval in seconds between reloads of '
+                 'virtual routers caused by binding on an unknown host'),
+]
+
+circuit_breaker_opts = [
+    cfg.BoolOpt('enabled',
+                default=True,
+                help='Fail requests to VNC API immediately, without waiting '
+                'for connection timeout, after it became unavailable'),
+    cfg.IntOpt('failure_threshold',
+               default=5,
+               min=1,
+               help='Number of consecutive connection failures after which '
+               'requests fail immediately'),
+    cfg.FloatOpt('reset_timeout',
+                 default=30.0,
+                 help='Time in seconds after which trial requests are sent '
+                 'to check if VNC API is available again'),
+    cfg.IntOpt('half_open_max_calls',
+               default=1,
+               min=1,
+               help='Number of trial requests sent at the same time'),
+]
+
+metrics_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Collect latency, payload size and status metrics of '
+                'requests to VNC API'),
+    cfg.StrOpt('exporter',
+               default=metrics.PROMETHEUS_FILE,
+               choices=metrics.EXPORTERS,
+               help='Exporter of metrics: prometheus_file writes a file of '
+               'each Neutron worker for node_exporter textfile collector, '
+               'statsd sends them to a statsd server'),
+    cfg.FloatOpt('export_interval',
+                 default=15.0,
+                 help='Interval in seconds between exports of metrics'),
+    cfg.StrOpt('textfile_dir',
+               default='/var/lib/node_exporter/textfile_collector',
+               help='Directory of node_exporter textfile collector'),
+    cfg.StrOpt('statsd_host',
+               default='127.0.0.1',
+               help='Host of statsd server'),
+    cfg.PortOpt('statsd_port',
+                default=8125,
+                help='UDP port of statsd server'),
+    cfg.StrOpt('statsd_prefix',
+               default=metrics.PREFIX,
+               help='Prefix of names of metrics sent to statsd'),
+]
+
+tracing_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Trace callbacks of routers, floating IPs and security '
+                'groups, and requests to VNC API made by them'),
+    cfg.FloatOpt('sample_rate',
+                 default=1.0,
+                 min=0.0,
+                 max=1.0,
+                 help='Fraction of callbacks which are traced'),
+    cfg.StrOpt('exporter',
+               default=tracing.FILE,
+               choices=tracing.EXPORTERS,
+               help='Exporter of traces: file appends a JSON document of '
+               'each trace to file_path, osprofiler adds spans to traces '
+               'of requests profiled by osprofiler'),
+    cfg.StrOpt('file_path',
+               default='/var/log/neutron/networking-opencontrail-traces.log',
+               help='File to which traces are appended'),
+]
+
+snat_sync_opts = [
+    cfg.FloatOpt('delay',
+                 default=2.0,
+                 min=0.0,
+                 help='Seconds without events of a router after which its '
+                 'SNAT interfaces are synchronized, 0 synchronizes them '
+                 'on every event'),
 ]
 
 
@@ -57,6 +322,51 @@ def register_vnc_api_options():
     """Register Contrail Neutron core plugin configuration flags"""
     cfg.CONF.register_opts(vnc_opts, 'APISERVER')
     cfg.CONF.register_opts(dm_integration_opts, 'DM_INTEGRATION')
+    cfg.CONF.register_opts(async_postcommit_opts, 'ASYNC_POSTCOMMIT')
+    cfg.CONF.register_opts(journal_opts, 'JOURNAL')
+    cfg.CONF.register_opts(vnc_cache_opts, 'VNC_CACHE')
+    cfg.CONF.register_opts(vrouter_index_opts, 'VROUTER_INDEX')
+    cfg.CONF.register_opts(circuit_breaker_opts, 'CIRCUIT_BREAKER')
+    cfg.CONF.register_opts(metrics_opts, 'METRICS')
+    cfg.CONF.register_opts(tracing_opts, 'TRACING')
+    cfg.CONF.register_opts(snat_sync_opts, 'SNAT_SYNC')
+
+
+_http_session = None
+_http_session_pid = None
+
+
+def get_http_session():
+    """Get HTTP session shared by all drivers of the current process.
+
+    Session keeps a pool of connections to VNC API, so subsequent requests
+    do not pay for TCP and TLS handshakes. It is recreated after fork, because
+    Neutron workers must not share pooled sockets.
+    """
+    global _http_session, _http_session_pid
+
+    pid = os.getpid()
+    if _http_session is None or _http_session_pid != pid:
+        pool_size = cfg.CONF.APISERVER.connection_pool_size
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=pool_size,
+                                       pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # Large listings are received compressed when VNC API or a proxy
+        # in front of it supports that, requests decodes them.
+        session.headers['Accept-Encoding'] = compression.ACCEPT_ENCODING
+        if not cfg.CONF.APISERVER.keep_alive:
+            session.headers['Connection'] = 'close'
+        _http_session = session
+        _http_session_pid = pid
+    return _http_session
+
+
+def get_http_timeout():
+    """Get (connect, read) timeout tuple for requests to VNC API."""
+    return (cfg.CONF.APISERVER.connect_timeout,
+            cfg.CONF.APISERVER.read_timeout)
 
 
 def vnc_api_is_authenticated():
@@ -64,12 +374,13 @@ def vnc_api_is_authenticated():
 
     :returns: True if credentials are needed, False otherwise
     """
-    url = "%s://%s:%s/aaa-mode" % (
-        'https' if cfg.CONF.APISERVER.use_ssl else 'http',
-        cfg.CONF.APISERVER.api_server_ip,
-        cfg.CONF.APISERVER.api_server_port
-    )
-    response = requests.get(url)
+    scheme = 'https' if cfg.CONF.APISERVER.use_ssl else 'http'
+    verify, cert = endpoints._get_tls_options()
+    response = endpoints.get_endpoint_pool().request(
+        lambda endpoint: get_http_session().get(
+            endpoint.make_url(scheme, '/aaa-mode'), verify=verify, cert=cert,
+            timeout=get_http_timeout()),
+        idempotent=True)
 
     if response.status_code == requests.codes.ok:
         return False
@@ -17,12 +17,16 @@ import json
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from networking_opencontrail.common import cache
 from networking_opencontrail.dm.dm_topology import DmTopologyApi
 from networking_opencontrail.dm.dm_topology import DmTopologyFile
+from networking_opencontrail.dm.dm_topology import DmTopologySnapshot
 
 LOG = logging.getLogger(__name__)
 
 DM_MANAGED_VNIC_TYPE = 'baremetal'
+LOOKUP_CACHE_SIZE = 1024
+LOOKUP_CACHE_TTL = 300.0
 
 
 class DmBindingsHelper(object):
@@ -30,29 +34,53 @@ class DmBindingsHelper(object):
 
     This check if host should be managed by Device Manager and
     prepare bindings for VMI with details about baremetal physical connections.
+    Fabrics of switches and VPGs found for sets of switch ports are
+    remembered, as they change rarely. Callers report with vmi_created()
+    and vpg_changed() writes after which TF may create or delete a VPG.
     """
 
     def __init__(self, tf_client):
         self.tf_client = tf_client
+        self._fabric_names = cache.LRUCache(LOOKUP_CACHE_SIZE,
+                                            LOOKUP_CACHE_TTL)
+        self._vpg_names = cache.LRUCache(LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
         topology_file = cfg.CONF.DM_INTEGRATION.topology
         if topology_file:
             self.topology = DmTopologyFile(topology_file)
+        elif cfg.CONF.DM_INTEGRATION.topology_snapshot:
+            self.topology = DmTopologySnapshot(
+                self.tf_client,
+                cfg.CONF.DM_INTEGRATION.topology_refresh_interval)
         else:
             self.topology = DmTopologyApi(self.tf_client)
 
     def initialize(self):
         self.topology.initialize()
 
+    def vmi_created(self, vpg_key):
+        """Forget that the ports have no VPG, TF creates one for a new VMI.
+
+        vpg_key is the one returned with the bindings of the VMI.
+        """
+        if self._vpg_names.peek(vpg_key) is None:
+            self._vpg_names.invalidate(vpg_key)
+
+    def vpg_changed(self, vpg):
+        """Forget VPG which TF deletes when its last VMI is detached."""
+        ports = [{'switch_name': ref['to'][-2], 'port_name': ref['to'][-1]}
+                 for ref in vpg.get_physical_interface_refs() or []]
+        self._vpg_names.invalidate(self._get_ports_key(ports))
+
     def check_host_managed(self, host_id):
         return host_id in self.topology
 
     def get_bindings_for_host(self, host_id):
+        """Return bindings for a VMI of the host and key of its VPG lookup."""
         node = self.topology.get_node(host_id)
 
         port_profiles = []
         for port in node['ports']:
-            fabric_name = self.tf_client.read_fabric_name_from_switch(
-                port['switch_name'])
+            fabric_name = self._get_fabric_name(port['switch_name'])
 
             if not fabric_name:
                 LOG.error("Cannot find fabric name for switch %s" %
@@ -67,11 +95,33 @@ class DmBindingsHelper(object):
         bindings_list = [('profile', json.dumps(profile)),
                          ('vnic_type', DM_MANAGED_VNIC_TYPE)]
 
-        vpg = self._find_existing_vpg(node['ports'])
+        vpg_key = self._get_ports_key(node['ports'])
+        vpg = self._get_existing_vpg(vpg_key, node['ports'])
         if vpg:
             bindings_list.append(('vpg', vpg))
 
-        return self.tf_client.make_key_value_pairs(bindings_list)
+        return self.tf_client.make_key_value_pairs(bindings_list), vpg_key
+
+    def _get_fabric_name(self, switch_name):
+        fabric_name = self._fabric_names.get(switch_name)
+        if fabric_name is cache.MISSING:
+            fabric_name = self.tf_client.read_fabric_name_from_switch(
+                switch_name)
+            if fabric_name:
+                self._fabric_names.set(switch_name, fabric_name)
+        return fabric_name
+
+    @staticmethod
+    def _get_ports_key(ports):
+        return tuple(sorted((port['switch_name'], port['port_name'])
+                            for port in ports))
+
+    def _get_existing_vpg(self, key, ports):
+        vpg = self._vpg_names.get(key)
+        if vpg is cache.MISSING:
+            vpg = self._find_existing_vpg(ports)
+            self._vpg_names.set(key, vpg)
+        return vpg
 
     def _find_existing_vpg(self, ports):
         pi = self.tf_client.read_pi_from_switch(ports[0]['switch_name'],
@@ -83,10 +133,15 @@ class DmBindingsHelper(object):
             raise PhysicalInterfaceNotFoundError
 
         vpg_refs = pi.get_virtual_port_group_back_refs() or []
+        if not vpg_refs:
+            return None
+        vpgs = self.tf_client.list_virtual_port_groups(
+            obj_uuids=[vpg_ref['uuid'] for vpg_ref in vpg_refs],
+            detail=True, fields=['physical_interface_refs'])
+        vpgs_by_uuid = dict((vpg.uuid, vpg) for vpg in vpgs)
         for vpg_ref in vpg_refs:
-            vpg = self.tf_client.get_virtual_port_group(
-                uuid=vpg_ref['uuid'])
-            if vpg.get_virtual_port_group_user_created():
+            vpg = vpgs_by_uuid.get(vpg_ref['uuid'])
+            if not vpg or vpg.get_virtual_port_group_user_created():
                 continue
             pi_refs = vpg.get_physical_interface_refs() or []
             if self._check_refs_to_all_ports(pi_refs, ports):
@@ -80,12 +80,14 @@ class DeviceManagerIntegrator(object):
             return
 
         properties = self.tf_client.make_vmi_properties_with_vlan_tag(vlan_tag)
-        bindings = self.bindings_helper.get_bindings_for_host(
+        bindings, vpg_key = self.bindings_helper.get_bindings_for_host(
             port['binding:host_id'])
         vmi = self.tf_client.make_virtual_machine_interface(
             vmi_name, tf_vn, properties, bindings, tf_project)
 
         self.tf_client.create_virtual_machine_interface(vmi)
+        # TF creates VPG for the VMI when the host has none yet.
+        self.bindings_helper.vmi_created(vpg_key)
         LOG.debug("Created VMI with bindings for DM for port %s", port['id'])
 
     def delete_vlan_tagging_for_port(self, context, port):
@@ -146,6 +148,7 @@ class DeviceManagerIntegrator(object):
         vpg = self.tf_client.get_virtual_port_group(vpg_refs[0]['uuid'])
         vpg.del_virtual_machine_interface(vmi)
         self.tf_client.update_virtual_port_group(vpg)
+        self.bindings_helper.vpg_changed(vpg)
 
     def _get_vlan_tag(self, context, network_id):
         network = self._core_plugin.get_network(context, network_id)
@@ -13,6 +13,8 @@
 #    under the License.
 #
 import abc
+import time
+
 import six
 
 from oslo_log import log as logging
@@ -21,6 +23,9 @@ from networking_opencontrail.dm.dm_topology_loader import DmTopologyLoader
 
 LOG = logging.getLogger(__name__)
 
+LOAD_RETRY_INTERVAL = 1.0
+LOAD_MAX_RETRY_INTERVAL = 60.0
+
 
 @six.add_metaclass(abc.ABCMeta)
 class DmTopologyBase(object):
@@ -81,6 +86,79 @@ class DmTopologyApi(DmTopologyBase):
         return vnc_node is not None
 
 
+class DmTopologySnapshot(DmTopologyBase):
+    """Object containing node topology based on snapshot of Tungsten API.
+
+    All nodes and ports with their physical interface back references
+    are loaded with two list requests and indexed by hostname, so checking
+    a host and getting its node do not need requests to API. Snapshot is
+    reloaded on use when it is older than refresh_interval. If reloading
+    fails, the previous snapshot is used and loading is attempted again
+    with exponential backoff.
+    """
+
+    def __init__(self, client, refresh_interval):
+        self.tf_client = client
+        self.refresh_interval = refresh_interval
+        self._nodes = None
+        self._loaded_at = 0.0
+        self._next_load = 0.0
+        self._failures = 0
+
+    def __contains__(self, host_id):
+        return host_id in self._get_nodes()
+
+    def get_node(self, host_id):
+        node = self._get_nodes().get(host_id)
+        if node is None:
+            raise NodeNotFoundError
+        if len(node['ports']) == 0:
+            LOG.error("Node %s has no port connected to physical interface"
+                      % host_id)
+            raise InvalidNodeError
+        return node
+
+    def refresh(self):
+        ports = self.tf_client.list_ports(
+            detail=True, fields=['physical_interface_back_refs'])
+        connected_ports = {}
+        for port in ports:
+            pi = port.get_physical_interface_back_refs()
+            if pi:
+                connected_ports[port.uuid] = {'name': port.fq_name[-1],
+                                              'port_name': pi[0]['to'][-1],
+                                              'switch_name': pi[0]['to'][-2]}
+
+        nodes = {}
+        for vnc_node in self.tf_client.list_nodes(detail=True,
+                                                  fields=['ports']):
+            host_id = vnc_node.fq_name[-1]
+            port_refs = vnc_node.get_ports() or []
+            nodes[host_id] = {
+                'name': host_id,
+                'ports': [connected_ports[ref['uuid']] for ref in port_refs
+                          if ref['uuid'] in connected_ports]}
+
+        self._nodes = nodes
+        self._loaded_at = time.time()
+        self._next_load = self._loaded_at + self.refresh_interval
+        self._failures = 0
+        LOG.debug("Loaded topology of %d nodes from API" % len(nodes))
+
+    def _get_nodes(self):
+        now = time.time()
+        if now >= self._next_load:
+            try:
+                self.refresh()
+            except Exception:
+                LOG.exception("Failed to load topology from API")
+                self._failures += 1
+                self._next_load = now + min(
+                    LOAD_RETRY_INTERVAL * 2 ** (self._failures - 1),
+                    LOAD_MAX_RETRY_INTERVAL)
+        return self._nodes or {}
+
+
 class DmTopologyFile(DmTopologyBase):
     """Object contaning node topology based on topology file declaration."""
 
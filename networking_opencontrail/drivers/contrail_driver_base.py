@@ -19,6 +19,9 @@ from neutron_lib.exceptions import allowedaddresspairs
 from neutron_lib.exceptions import l3
 
 from neutron_lib.api.definitions.portbindings import CAP_PORT_FILTER
+from neutron_lib.api.definitions.portbindings import HOST_ID
+from neutron_lib.api.definitions.portbindings import PROFILE
+from neutron_lib.api.definitions.portbindings import VNIC_TYPE
 from neutron_lib.constants import ATTR_NOT_SPECIFIED
 from neutron_lib.constants import PORT_STATUS_ACTIVE
 from neutron_lib import exceptions as neutron_lib_exc
@@ -39,6 +42,41 @@ LOG = logging.getLogger(__name__)
 
 NEUTRON_CONTRAIL_PREFIX = 'NEUTRON'
 
+# Attributes of a port sent to API server when it is bound.
+BINDING_ATTRIBUTES = frozenset((HOST_ID, VNIC_TYPE, PROFILE))
+
+# Attributes of a port maintained by Neutron which TF does not use, so
+# their changes are not sent to API server.
+IGNORED_PORT_ATTRIBUTES = frozenset(('status', 'created_at', 'updated_at',
+                                     'revision_number', 'binding:vif_type',
+                                     'binding:vif_details', 'dns_assignment'))
+
+
+def get_port_changes(original, current):
+    """Get attributes of a port which changed and are used by TF.
+
+    Fixed IPs are compared as sets, so their order does not matter.
+    An empty dict is returned when no attribute used by TF changed,
+    otherwise it contains ID of the port and changed attributes.
+    """
+    changes = {}
+    for key, value in current.items():
+        if key in IGNORED_PORT_ATTRIBUTES:
+            continue
+        if key == 'fixed_ips':
+            if _ip_set(value) != _ip_set(original.get(key) or []):
+                changes[key] = value
+        elif key not in original or original[key] != value:
+            changes[key] = value
+    if changes:
+        changes['id'] = current['id']
+    return changes
+
+
+def _ip_set(fixed_ips):
+    return frozenset((ip.get('subnet_id'), ip.get('ip_address'))
+                     for ip in fixed_ips)
+
 
 def _raise_contrail_error(info, obj_name):
     exc_name = info.get('exception')
@@ -58,6 +96,20 @@ def _raise_contrail_error(info, obj_name):
     raise neutron_lib_exc.NeutronException(**info)
 
 
+def _pagination(sorts=None, limit=None, marker=None, page_reverse=False):
+    """Get pagination arguments which were given by the caller."""
+    args = {}
+    if sorts:
+        args['sorts'] = sorts
+    if limit:
+        args['limit'] = limit
+    if marker:
+        args['marker'] = marker
+    if page_reverse:
+        args['page_reverse'] = page_reverse
+    return args
+
+
 class OpenContrailDriversBase(object):
 
     def _parse_class_args(self):
@@ -112,7 +164,56 @@ class OpenContrailDriversBase(object):
     def _delete_resource(self, res_type, context, id):
         pass
 
-    def _list_resource(self, res_type, context, filters, fields):
+    def _list_resource(self, res_type, context, filters, fields,
+                       sorts=None, limit=None, marker=None,
+                       page_reverse=False):
+        pass
+
+    def _stream_resource(self, res_type, context, filters, fields,
+                         **pagination):
+        """Get an iterable of listed resources.
+
+        Drivers able to decode a listing while it is received yield
+        resources one by one, by default the whole listing is returned.
+        """
+        return self._list_resource(res_type, context, filters, fields,
+                                   **pagination)
+
+    def _iter_resource(self, res_type, context, filters=None, fields=None,
+                       page_size=None):
+        """Iterate over resources sorted by UUID, page by page.
+
+        Next page is requested only when the previous one is consumed.
+        When backend ignores pagination and returns all resources at once,
+        they are iterated over without further requests.
+        """
+        page_size = page_size or cfg.CONF.APISERVER.list_page_size
+        request_fields = fields
+        if fields and 'id' not in fields:
+            # UUID of the last resource is the marker of the next page.
+            request_fields = list(fields) + ['id']
+
+        marker = None
+        while True:
+            page = self._stream_resource(res_type, context, filters,
+                                         request_fields, sorts=[('id', True)],
+                                         limit=page_size, marker=marker)
+            count = 0
+            for item in page:
+                if marker and count == 0 and item['id'] <= marker:
+                    # Backend ignored the marker and returned a page again.
+                    return
+                count += 1
+                last_id = item['id']
+                if request_fields is not fields:
+                    item = dict((key, value) for key, value in item.items()
+                                if key in fields)
+                yield item
+            if count != page_size:
+                return
+            marker = last_id
+
+    def _create_resource_bulk(self, res_type, context, res_datas):
         pass
 
     def _count_resource(self, res_type, context, filters):
@@ -125,6 +226,15 @@ class OpenContrailDriversBase(object):
         """Creates a new Virtual Network."""
         return self._create_resource('network', context, network)
 
+    def create_network_bulk(self, context, networks):
+        """Creates many Virtual Networks in one batch.
+
+        Returns created network or raised exception for each network,
+        in the same order as given.
+        """
+        return self._create_resource_bulk('network', context,
+                                          networks['networks'])
+
     def get_network(self, context, network_id, fields=None):
         """Get the attributes of a particular Virtual Network."""
 
@@ -145,11 +255,21 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('network', context, network_id)
 
-    def get_networks(self, context, filters=None, fields=None):
+    def get_networks(self, context, filters=None, fields=None,
+                     sorts=None, limit=None, marker=None,
+                     page_reverse=False):
         """Gets the list of Virtual Networks."""
 
-        return self._list_resource('network', context, filters,
-                                   fields)
+        return self._list_resource(
+            'network', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_networks(self, context, filters=None, fields=None,
+                      page_size=None):
+        """Iterates over Virtual Networks, requesting them page by page."""
+
+        return self._iter_resource('network', context, filters, fields,
+                                   page_size)
 
     def get_networks_count(self, context, filters=None):
         """Gets the count of Virtual Network."""
@@ -169,6 +289,15 @@ class OpenContrailDriversBase(object):
 
         return self._create_resource('subnet', context, subnet)
 
+    def create_subnet_bulk(self, context, subnets):
+        """Creates many subnets in one batch.
+
+        Returns created subnet or raised exception for each subnet,
+        in the same order as given.
+        """
+        return self._create_resource_bulk('subnet', context,
+                                          subnets['subnets'])
+
     def _get_subnet(self, context, subnet_id, fields=None):
         return self._get_resource('subnet', context, subnet_id, fields)
 
@@ -191,10 +320,21 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('subnet', context, subnet_id)
 
-    def get_subnets(self, context, filters=None, fields=None):
+    def get_subnets(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
         """Gets the list of subnets."""
 
-        return self._list_resource('subnet', context, filters, fields)
+        return self._list_resource(
+            'subnet', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_subnets(self, context, filters=None, fields=None,
+                     page_size=None):
+        """Iterates over subnets, requesting them page by page."""
+
+        return self._iter_resource('subnet', context, filters, fields,
+                                   page_size)
 
     def get_subnets_count(self, context, filters=None):
         """Gets the count of subnets."""
@@ -229,27 +369,24 @@ class OpenContrailDriversBase(object):
 
     def _update_ips_for_port(self, context, network_id, port_id, original_ips,
                              new_ips):
-        """Add or remove IPs from the port."""
-        # These ips are still on the port and haven't been removed
-        prev_ips = []
-
-        # We need to copy list object, because it's still in use by Neutron
-        new_ips = new_ips[:]
+        """Add or remove IPs from the port.
 
-        # Remove all of the intersecting elements
-        for original_ip in original_ips[:]:
-            for new_ip in new_ips[:]:
-                if ('ip_address' in new_ip
-                        and original_ip['ip_address'] == new_ip['ip_address']):
-                    original_ips.remove(original_ip)
-                    new_ips.remove(new_ip)
-                    prev_ips.append(original_ip)
+        :returns: new IPs which are not on the port yet, and IPs of the
+                  port which are kept on it
+        """
+        new_addresses = set(new_ip['ip_address'] for new_ip in new_ips
+                            if 'ip_address' in new_ip)
+        # These ips are still on the port and haven't been removed
+        prev_ips = [original_ip for original_ip in original_ips
+                    if original_ip['ip_address'] in new_addresses]
 
-        return new_ips, prev_ips
+        prev_addresses = set(prev_ip['ip_address'] for prev_ip in prev_ips)
+        added_ips = [new_ip for new_ip in new_ips
+                     if new_ip.get('ip_address') not in prev_addresses]
 
-    def create_port(self, context, port):
-        """Creates a port on the specified Virtual Network."""
+        return added_ips, prev_ips
 
+    def _prepare_port_for_create(self, context, port):
         if (port['port'].get('port_security_enabled') is False
                 and port['port'].get('allowed_address_pairs') == []):
             del port['port']['allowed_address_pairs']
@@ -263,10 +400,25 @@ class OpenContrailDriversBase(object):
               and context.tenant_id):
             port['port']['tenant_id'] = context.tenant_id
 
+    def create_port(self, context, port):
+        """Creates a port on the specified Virtual Network."""
+
+        self._prepare_port_for_create(context, port)
         port = self._create_resource('port', context, port)
 
         return port
 
+    def create_port_bulk(self, context, ports):
+        """Creates many ports in one batch.
+
+        Returns created port or raised exception for each port,
+        in the same order as given.
+        """
+        for port in ports['ports']:
+            self._prepare_port_for_create(context, port)
+
+        return self._create_resource_bulk('port', context, ports['ports'])
+
     def get_port(self, context, port_id, fields=None):
         """Gets the attributes of a particular port."""
 
@@ -278,16 +430,14 @@ class OpenContrailDriversBase(object):
         Updates the attributes of a port on the specified Virtual
         Network.
         """
-        original = self._get_port(context, port_id)
         if 'fixed_ips' in port['port']:
+            # Only a change of IPs needs the current state of the port.
+            original = self._get_port(context, port_id)
             added_ips, prev_ips = self._update_ips_for_port(
                 context, original['network_id'], port_id,
                 original['fixed_ips'], port['port']['fixed_ips'])
             port['port']['fixed_ips'] = prev_ips + added_ips
 
-        if 'binding:host_id' in port['port']:
-            original['binding:host_id'] = port['port']['binding:host_id']
-
         if (port['port'].get('port_security_enabled') is False
                 and port['port'].get('allowed_address_pairs') == []):
             del port['port']['allowed_address_pairs']
@@ -317,10 +467,14 @@ class OpenContrailDriversBase(object):
         details.
         """
 
-        port = {'port': context.current}
+        # Only binding attributes are sent, so API server updates the port
+        # without a read of its current state first.
+        binding = dict((key, value) for key, value in context.current.items()
+                       if key in BINDING_ATTRIBUTES)
+        port = {'port': binding}
         port_id = context.current['id']
 
-        self.update_port(context, port_id, port)
+        self._update_resource('port', context, port_id, port)
 
         vif_type = 'vrouter'
         vif_details = {CAP_PORT_FILTER: True}
@@ -330,14 +484,25 @@ class OpenContrailDriversBase(object):
             context.set_binding(segment['id'], vif_type,
                                 vif_details, port_status)
 
-    def get_ports(self, context, filters=None, fields=None):
+    def get_ports(self, context, filters=None, fields=None,
+                  sorts=None, limit=None, marker=None,
+                  page_reverse=False):
         """Gets all ports.
 
         Retrieves all port identifiers belonging to the
         specified Virtual Network with the specfied filter.
         """
 
-        return self._list_resource('port', context, filters, fields)
+        return self._list_resource(
+            'port', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_ports(self, context, filters=None, fields=None,
+                   page_size=None):
+        """Iterates over ports, requesting them page by page."""
+
+        return self._iter_resource('port', context, filters, fields,
+                                   page_size)
 
     def get_ports_count(self, context, filters=None):
         """Gets the count of ports."""
@@ -370,10 +535,21 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('router', context, router_id)
 
-    def get_routers(self, context, filters=None, fields=None):
+    def get_routers(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
         """Retrieves all router identifiers."""
 
-        return self._list_resource('router', context, filters, fields)
+        return self._list_resource(
+            'router', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_routers(self, context, filters=None, fields=None,
+                     page_size=None):
+        """Iterates over routers, requesting them page by page."""
+
+        return self._iter_resource('router', context, filters, fields,
+                                   page_size)
 
     def get_routers_count(self, context, filters=None):
         """Gets the count of routers."""
@@ -412,6 +588,29 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('floatingip', context, ip_id)
 
+    def get_floatingips(self, context, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
+        """Retrieves all floating IPs."""
+
+        return self._list_resource(
+            'floatingip', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_floatingips(self, context, filters=None, fields=None,
+                         page_size=None):
+        """Iterates over floating IPs, requesting them page by page."""
+
+        return self._iter_resource('floatingip', context, filters, fields,
+                                   page_size)
+
+    def get_floatingips_count(self, context, filters=None):
+        """Gets the count of floating IPs."""
+
+        floatingips_count = self._count_resource('floatingip', context,
+                                                 filters)
+        return floatingips_count['count']
+
     # Route table handlers
     def create_route_table(self, context, table):
         """Creates a route table."""
@@ -434,10 +633,21 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('route_table', context, table_id)
 
-    def get_route_tables(self, context, filters=None, fields=None):
+    def get_route_tables(self, context, filters=None, fields=None,
+                         sorts=None, limit=None, marker=None,
+                         page_reverse=False):
         """Retrieves all route tables identifiers."""
 
-        return self._list_resource('route_table', context, filters, fields)
+        return self._list_resource(
+            'route_table', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_route_tables(self, context, filters=None, fields=None,
+                          page_size=None):
+        """Iterates over route tables, requesting them page by page."""
+
+        return self._iter_resource('route_table', context, filters, fields,
+                                   page_size)
 
     def get_route_tables_count(self, context, filters=None):
         """Gets the count of route tables."""
@@ -469,10 +679,21 @@ class OpenContrailDriversBase(object):
 
         self._delete_resource('nat_instance', context, instance_id)
 
-    def get_nat_instances(self, context, filters=None, fields=None):
+    def get_nat_instances(self, context, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
         """Retrieves all NAT instances identifiers."""
 
-        return self._list_resource('nat_instance', context, filters, fields)
+        return self._list_resource(
+            'nat_instance', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_nat_instances(self, context, filters=None, fields=None,
+                           page_size=None):
+        """Iterates over NAT instances, requesting them page by page."""
+
+        return self._iter_resource('nat_instance', context, filters, fields,
+                                   page_size)
 
     def get_nat_instances_count(self, context, filters=None):
         """Gets the count of NAT instances."""
@@ -509,8 +730,16 @@ class OpenContrailDriversBase(object):
                             page_reverse=False):
         """Retrieves all security group identifiers."""
 
-        return self._list_resource('security_group', context,
-                                   filters, fields)
+        return self._list_resource(
+            'security_group', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_security_groups(self, context, filters=None, fields=None,
+                             page_size=None):
+        """Iterates over security groups, requesting them page by page."""
+
+        return self._iter_resource('security_group', context, filters, fields,
+                                   page_size)
 
     def get_security_groups_count(self, context, filters=None):
         """Gets the count of security groups."""
@@ -548,5 +777,13 @@ class OpenContrailDriversBase(object):
                                  page_reverse=False):
         """Retrieves all security group rules."""
 
-        return self._list_resource('security_group_rule', context,
-                                   filters, fields)
+        return self._list_resource(
+            'security_group_rule', context, filters, fields,
+            **_pagination(sorts, limit, marker, page_reverse))
+
+    def iter_security_group_rules(self, context, filters=None, fields=None,
+                                  page_size=None):
+        """Iterates over security group rules, page by page."""
+
+        return self._iter_resource('security_group_rule', context, filters,
+                                   fields, page_size)
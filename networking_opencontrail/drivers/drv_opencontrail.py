@@ -17,23 +17,33 @@ import errno
 import os
 import requests
 
+import eventlet
+
 from neutron_lib.constants import ATTR_NOT_SPECIFIED
 from neutron_lib.exceptions import BadRequest
 
 from oslo_config import cfg
 from oslo_log import log as logging
-from oslo_serialization import jsonutils as json
 
 from eventlet.greenthread import getcurrent
-from simplejson import JSONDecodeError
 
+from networking_opencontrail.common import circuit_breaker
+from networking_opencontrail.common import codec
+from networking_opencontrail.common import compression
+from networking_opencontrail.common import endpoints
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import tokens
+from networking_opencontrail.common import tracing
+from networking_opencontrail.common import utils
 from networking_opencontrail.drivers import contrail_driver_base as driver_base
 
-_DEFAULT_KS_CERT_BUNDLE = "/tmp/keystonecertbundle.pem"
 _DEFAULT_API_CERT_BUNDLE = "/tmp/apiservercertbundle.pem"
 _DEFAULT_SERVER_CONNECT = "http"
 _DEFAULT_SECURE_SERVER_CONNECT = "https"
 
+# Size of chunks in which streamed responses are read.
+STREAM_CHUNK_SIZE = 64 * 1024
+
 LOG = logging.getLogger(__name__)
 
 
@@ -44,48 +54,11 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
         super(OpenContrailDrivers, self).__init__()
         self._build_auth_details()
 
-    def _build_auth_details(self):
-        # keystone
-        self._authn_token = None
-        if cfg.CONF.auth_strategy == 'keystone':
-            kcfg = cfg.CONF.keystone_authtoken
-            body = '{"auth":{"passwordCredentials":{'
-            body += ' "username": "%s",' % (kcfg.admin_user)
-            body += ' "password": "%s"},' % (kcfg.admin_password)
-            body += ' "tenantName":"%s"}}' % (kcfg.admin_tenant_name)
-
-            self._authn_body = body
-            self._authn_token = cfg.CONF.keystone_authtoken.admin_token
-            try:
-                auth_token_url = cfg.CONF.APISERVER.auth_token_url
-            except cfg.NoSuchOptError:
-                auth_token_url = None
-
-            if auth_token_url:
-                self._keystone_url = auth_token_url
-            else:
-                self._keystone_url = "%s://%s:%s%s" % (
-                    cfg.CONF.keystone_authtoken.auth_protocol,
-                    cfg.CONF.keystone_authtoken.auth_host,
-                    cfg.CONF.keystone_authtoken.auth_port,
-                    "/v2.0/tokens")
-
-            # Keystone SSL Support
-            self._ksinsecure = cfg.CONF.keystone_authtoken.insecure
-            kscertfile = cfg.CONF.keystone_authtoken.certfile
-            kskeyfile = cfg.CONF.keystone_authtoken.keyfile
-            kscafile = cfg.CONF.keystone_authtoken.cafile
-
-            self._use_ks_certs = False
-            if (cfg.CONF.keystone_authtoken.auth_protocol ==
-                    _DEFAULT_SECURE_SERVER_CONNECT and kscafile):
-                certs = [kscafile]
-                if kscertfile and kskeyfile:
-                    certs = [kscertfile, kskeyfile, kscafile]
-                self._kscertbundle = getCertKeyCaBundle(
-                    _DEFAULT_KS_CERT_BUNDLE, certs)
-                self._use_ks_certs = True
+    @property
+    def token_manager(self):
+        return tokens.get_token_manager()
 
+    def _build_auth_details(self):
         # API Server SSL support
         self._apiusessl = cfg.CONF.APISERVER.use_ssl
         self._apiinsecure = cfg.CONF.APISERVER.insecure
@@ -107,7 +80,8 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
                 _DEFAULT_API_CERT_BUNDLE, certs)
             self._use_api_certs = True
 
-    def _request_api_server(self, url, data=None, headers=None):
+    def _request_api_server(self, url, data=None, headers=None,
+                            stream=False):
         LOG.debug('Api-Server request:\n'
                   'URL: %(url)s\n'
                   'Headers: %(headers)s\n'
@@ -115,50 +89,27 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
                   {'url': url, 'headers': headers, 'payload': data})
 
         # Attempt to post to Api-Server
-        if self._apiinsecure:
-            response = requests.post(url, data=data,
-                                     headers=headers, verify=False)
-        elif not self._apiinsecure and self._use_api_certs:
-            response = requests.post(url, data=data,
-                                     headers=headers,
-                                     verify=self._apicertbundle)
-        else:
-            response = requests.post(url, data=data, headers=headers)
-        if (response.status_code == requests.codes.unauthorized):
-            # Get token from keystone and save it for next request
-            if self._ksinsecure:
-                response = (
-                    requests.post(self._keystone_url,
-                                  data=self._authn_body,
-                                  headers={'Content-type': 'application/json'},
-                                  verify=False))
-            elif not self._ksinsecure and self._use_ks_certs:
-                response = (
-                    requests.post(self._keystone_url,
-                                  data=self._authn_body,
-                                  headers={'Content-type': 'application/json'},
-                                  verify=self._kscertbundle))
-            else:
-                response = (
-                    requests.post(self._keystone_url,
-                                  data=self._authn_body,
-                                  headers={'Content-type':
-                                           'application/json'}))
-            if (response.status_code == requests.codes.ok):
-                # plan is to re-issue original request with new token
-                auth_headers = headers or {}
-                authn_content = json.loads(response.text)
-                self._authn_token = authn_content['access']['token']['id']
-                auth_headers['X-AUTH-TOKEN'] = self._authn_token
-                response = self._request_api_server(url, data, auth_headers)
-            else:
-                raise RuntimeError('Authentication Failure')
+        response = self._post(url, data, headers, stream=stream)
+        token_manager = self.token_manager
+        if (response.status_code == requests.codes.unauthorized and
+                token_manager):
+            # Token was rejected before its expiry, so get a new one
+            # and re-issue original request with it.
+            auth_headers = headers or {}
+            token_manager.invalidate(auth_headers.get('X-AUTH-TOKEN'))
+            auth_headers['X-AUTH-TOKEN'] = token_manager.get_token()
+            if stream:
+                response.close()
+            response = self._post(url, data, auth_headers, stream=stream)
 
         LOG.debug('Api-Server response:\n'
                   'Status: %(status)s\n'
                   'Payload: %(payload)s\n',
                   {'status': response.status_code,
-                   'payload': response.content})
+                   # Streamed payload is read by the caller.
+                   'payload': '<streamed>' if stream else response.content})
+        if not stream:
+            compression.record_response(response)
         if response.status_code != requests.codes.ok:
             LOG.error('Api-Server request for %(url)s '
                       'failed with status %(status)s',
@@ -166,7 +117,19 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
 
         return response
 
-    def _request_api_server_authn(self, url, data=None, headers=None):
+    def _post(self, url, data, headers, stream=False):
+        kwargs = {'data': data, 'headers': headers,
+                  'timeout': utils.get_http_timeout()}
+        if self._apiinsecure:
+            kwargs['verify'] = False
+        elif self._use_api_certs:
+            kwargs['verify'] = self._apicertbundle
+        if stream:
+            kwargs['stream'] = True
+        return utils.get_http_session().post(url, **kwargs)
+
+    def _request_api_server_authn(self, url, data=None, headers=None,
+                                  stream=False):
         # forward user token to API server for RBAC
         # token saved earlier in the pipeline
         try:
@@ -174,30 +137,55 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
         except AttributeError:
             auth_token = None
 
+        token_manager = self.token_manager
+        if not auth_token and token_manager:
+            auth_token = token_manager.current_token()
+
         authn_headers = headers or {}
-        if auth_token or self._authn_token:
-            authn_headers['X-AUTH-TOKEN'] = auth_token or self._authn_token
-        response = self._request_api_server(url, data, headers=authn_headers)
+        if auth_token:
+            authn_headers['X-AUTH-TOKEN'] = auth_token
+        response = self._request_api_server(url, data, headers=authn_headers,
+                                            stream=stream)
         return response
 
-    def _relay_request(self, url_path, data=None):
+    def _relay_request(self, url_path, data=None, stream=False,
+                       idempotent=False):
         """Send received request to api server."""
+        headers = {'Content-type': 'application/json'}
+        data = compression.compress_request(data, headers)
 
-        url = "%s://%s:%s%s" % (self._apiserverconnect,
-                                cfg.CONF.APISERVER.api_server_ip,
-                                cfg.CONF.APISERVER.api_server_port,
-                                url_path)
+        def send(endpoint):
+            url = endpoint.make_url(self._apiserverconnect, url_path)
+            return self._request_api_server_authn(
+                url, data=data, headers=dict(headers), stream=stream)
 
-        return self._request_api_server_authn(
-            url, data=data, headers={'Content-type': 'application/json'})
+        breaker = circuit_breaker.get_circuit_breaker('api_server')
+        return breaker.call(endpoints.get_endpoint_pool().request, send,
+                            idempotent=idempotent)
 
-    def _request_backend(self, context, data_dict, obj_name, action):
+    def _send_backend(self, context, data_dict, obj_name, action,
+                      stream=False):
         context_dict = self._encode_context(context, action, obj_name)
-        data = json.dumps({'context': context_dict, 'data': data_dict})
+        data = codec.dumps({'context': context_dict, 'data': data_dict})
 
         url_path = "%s/%s" % (self.PLUGIN_URL_PREFIX, obj_name)
+        with tracing.span('tf.neutron', resource=obj_name, action=action):
+            with metrics.measure('neutron', obj_name, action,
+                                 request_size=len(data)) as measurement:
+                # Only reads may be sent again to another server when
+                # connection breaks after the request was sent.
+                response = self._relay_request(
+                    url_path, data=data, stream=stream,
+                    idempotent=action.startswith('READ'))
+                measurement.status = response.status_code
+                if not stream:
+                    measurement.response_size = len(response.content or b'')
+        return response
+
+    def _request_backend(self, context, data_dict, obj_name, action):
         try:
-            response = self._relay_request(url_path, data=data)
+            response = self._send_backend(context, data_dict, obj_name,
+                                          action)
         except requests.exceptions.ConnectionError as exc:
             # Catch connection error because SDN may not be ready
             # to receive messages. This must not crash OpenStack.
@@ -207,10 +195,37 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
             return requests.codes.unavailable, {'message': str(exc)}
 
         try:
-            return response.status_code, response.json()
-        except JSONDecodeError:
+            return response.status_code, codec.loads(response.content)
+        except ValueError:
             return response.status_code, {'message': response.content}
 
+    def _request_backend_bulk(self, context, data_dicts, obj_name, action):
+        """Send a batch of requests for the same resource type.
+
+        Api-Server accepts a single resource per request to /neutron
+        endpoint, so requests from the batch are sent concurrently over
+        pooled connections. Responses are returned in order of data_dicts.
+        A request which raised is returned as the exception, so failure of
+        one item does not lose responses of the others.
+        """
+        # User token is stored in the calling green thread, so it has to be
+        # passed to threads sending the requests.
+        contrail_vars = getattr(getcurrent(), 'contrail_vars', None)
+
+        def request(data_dict):
+            if contrail_vars is not None:
+                getcurrent().contrail_vars = contrail_vars
+            try:
+                return self._request_backend(context, data_dict, obj_name,
+                                             action)
+            except Exception as exc:
+                LOG.exception("Failed to %(action)s %(obj_name)s in bulk",
+                              {'action': action, 'obj_name': obj_name})
+                return exc
+
+        pool = eventlet.GreenPool(cfg.CONF.APISERVER.bulk_concurrency)
+        return list(pool.imap(request, data_dicts))
+
     def _encode_context(self, context, operation, apitype):
         cdict = {'user_id': getattr(context, 'user_id', ''),
                  'is_admin': getattr(context, 'is_admin', False),
@@ -224,7 +239,8 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
         return cdict
 
     def _encode_resource(self, resource_id=None, resource=None, fields=None,
-                         filters=None):
+                         filters=None, sorts=None, limit=None, marker=None,
+                         page_reverse=False):
         # New OpenStack release replace the 'tenant' term by 'project' and
         # all tools which call OpenStack APIs also did the moved and use
         # 'project_id' instead of 'tenant_id' to query resources for a project
@@ -238,21 +254,39 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
             resource_dict['resource'] = resource
         resource_dict['filters'] = filters
         resource_dict['fields'] = fields
+        resource_dict.update(driver_base._pagination(sorts, limit, marker,
+                                                     page_reverse))
         return resource_dict
 
     def _prune(self, resource_dict, fields):
-        if fields:
+        if self._needs_prune(resource_dict, fields):
             return dict(((key, item) for key, item in resource_dict.items()
                          if key in fields))
         return resource_dict
 
+    @staticmethod
+    def _needs_prune(resource_dict, fields):
+        """Check if API server returned attributes which were not requested.
+
+        Requested fields are sent to API server, which serializes only them,
+        so pruning is a fallback for servers ignoring the projection.
+        """
+        return bool(fields) and any(key not in fields
+                                    for key in resource_dict)
+
     def _transform_response(self, status_code, info=None, obj_name=None,
                             fields=None):
         if status_code == requests.codes.ok:
             if not isinstance(info, list):
                 return self._prune(info, fields)
-            else:
-                return [self._prune(items, fields) for items in info]
+
+            # API server applies projection to all items of a list or to
+            # none, so the decoded list is returned as it is when its first
+            # item does not need pruning.
+            if not info or not self._needs_prune(info[0], fields):
+                return info
+            fields = frozenset(fields)
+            return [self._prune(items, fields) for items in info]
 
         driver_base._raise_contrail_error(info, obj_name)
 
@@ -280,6 +314,38 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
 
         return res_dicts
 
+    def _transform_bulk_response(self, response, obj_name):
+        if isinstance(response, Exception):
+            return response
+        status_code, info = response
+        try:
+            return self._transform_response(status_code, info=info,
+                                            obj_name=obj_name)
+        except Exception as exc:
+            return exc
+
+    def _create_resource_bulk(self, res_type, context, res_datas):
+        """Create many resources of the same type in API server.
+
+        Returns created resource or raised exception for each item
+        of res_datas, in the same order.
+        """
+        res_dicts = []
+        for res_data in res_datas:
+            resource = dict((key, value)
+                            for key, value in res_data[res_type].items()
+                            if value != ATTR_NOT_SPECIFIED)
+            res_dicts.append(self._encode_resource(resource=resource))
+
+        responses = self._request_backend_bulk(context, res_dicts, res_type,
+                                               'CREATE')
+        results = [self._transform_bulk_response(response, res_type)
+                   for response in responses]
+        LOG.debug("create_%(res_type)s_bulk(): %(results)s",
+                  {'res_type': res_type, 'results': results})
+
+        return results
+
     def _get_resource(self, res_type, context, id, fields):
         """Get a resource from API server.
 
@@ -328,12 +394,24 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
             driver_base._raise_contrail_error(info=res_info,
                                               obj_name=res_type)
 
-    def _list_resource(self, res_type, context, filters, fields):
-        res_dict = self._encode_resource(filters=filters, fields=fields)
-        status_code, res_info = self._request_backend(context, res_dict,
-                                                      res_type, 'READALL')
-        res_dicts = self._transform_response(status_code, info=res_info,
-                                             fields=fields, obj_name=res_type)
+    def _list_resource(self, res_type, context, filters, fields,
+                       sorts=None, limit=None, marker=None,
+                       page_reverse=False):
+        res_dict = self._encode_resource(filters=filters, fields=fields,
+                                         sorts=sorts, limit=limit,
+                                         marker=marker,
+                                         page_reverse=page_reverse)
+        if cfg.CONF.APISERVER.stream_list_responses:
+            # Resources are decoded while the response is received, so the
+            # body and its decoded document are never held at once.
+            res_dicts = list(self._iter_response(context, res_dict,
+                                                 res_type, fields))
+        else:
+            status_code, res_info = self._request_backend(
+                context, res_dict, res_type, 'READALL')
+            res_dicts = self._transform_response(
+                status_code, info=res_info, fields=fields,
+                obj_name=res_type)
         LOG.debug(
             "get_%(res_type)s(): filters: %(filters)r data: %(res_dicts)r",
             {'res_type': res_type, 'filters': filters,
@@ -341,6 +419,41 @@ class OpenContrailDrivers(driver_base.OpenContrailDriversBase):
 
         return res_dicts
 
+    def _stream_resource(self, res_type, context, filters, fields,
+                         **pagination):
+        if not cfg.CONF.APISERVER.stream_list_responses:
+            return super(OpenContrailDrivers, self)._stream_resource(
+                res_type, context, filters, fields, **pagination)
+
+        res_dict = self._encode_resource(filters=filters, fields=fields,
+                                         **pagination)
+        return self._iter_response(context, res_dict, res_type, fields)
+
+    def _iter_response(self, context, res_dict, res_type, fields):
+        """Yield resources of READALL response while it is received."""
+        try:
+            response = self._send_backend(context, res_dict, res_type,
+                                          'READALL', stream=True)
+        except requests.exceptions.ConnectionError as exc:
+            LOG.error("Can't connect to remote host:\n{}".format(exc))
+            driver_base._raise_contrail_error({'message': str(exc)},
+                                              res_type)
+
+        try:
+            if response.status_code != requests.codes.ok:
+                try:
+                    info = codec.loads(response.content)
+                except ValueError:
+                    info = {'message': response.content}
+                driver_base._raise_contrail_error(info, res_type)
+
+            fields = frozenset(fields) if fields else fields
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            for item in codec.iter_array(chunks):
+                yield self._prune(item, fields)
+        finally:
+            response.close()
+
     def _count_resource(self, res_type, context, filters):
         res_dict = self._encode_resource(filters=filters)
         status_code, res_count = self._request_backend(context, res_dict,
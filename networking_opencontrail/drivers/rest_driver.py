@@ -13,73 +13,63 @@
 #    under the License.
 #
 
-import json
+from neutron_lib import exceptions as n_exc
+from oslo_config import cfg
+
+from networking_opencontrail.common import circuit_breaker
+from networking_opencontrail.common import codec
+from networking_opencontrail.common import compression
+from networking_opencontrail.common import endpoints
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import tracing
+from networking_opencontrail.common import utils
 from networking_opencontrail.drivers.drv_opencontrail import\
     OpenContrailDrivers
-from oslo_config import cfg
 import requests
+import six
 
 
 class ContrailRestApiDriver(OpenContrailDrivers):
     def __init__(self):
         super(ContrailRestApiDriver, self).__init__()
 
-    def update_auth_token(self):
-        headers = {'Content-type': 'application/json'}
-
-        if self._ksinsecure:
-            response = (
-                requests.post(self._keystone_url,
-                              data=self._authn_body,
-                              headers=headers,
-                              verify=False))
-        elif self._use_ks_certs:
-            response = (
-                requests.post(self._keystone_url,
-                              data=self._authn_body,
-                              headers=headers,
-                              verify=self._kscertbundle))
-        else:
-            response = (
-                requests.post(self._keystone_url,
-                              data=self._authn_body,
-                              headers=headers))
-
-        if response.status_code == requests.codes.ok:
-            authn_content = json.loads(response.text)
-            self._authn_token = authn_content['access']['token']['id']
-        else:
-            raise RuntimeError('Authentication Failure')
-
     def set_auth_token(self, headers=None, update_token=False):
         if headers is None:
             headers = {}
 
+        token_manager = self.token_manager
+        if not token_manager:
+            return headers
         if update_token:
-            self.update_auth_token()
-
-        if self._authn_token:
-            headers['X-AUTH-TOKEN'] = self._authn_token
+            token_manager.invalidate(headers.get('X-AUTH-TOKEN'))
+            token = token_manager.get_token()
+        else:
+            token = token_manager.current_token()
+        if token:
+            headers['X-AUTH-TOKEN'] = token
 
         return headers
 
-    def get_contrail_url(self, resource):
-        url = "%s://%s:%s/%s" % (self._apiserverconnect,
-                                 cfg.CONF.APISERVER.api_server_ip,
-                                 cfg.CONF.APISERVER.api_server_port,
-                                 resource)
-        return url
+    def get_contrail_url(self, resource, endpoint=None):
+        if endpoint is None:
+            ordered = endpoints.get_endpoint_pool().get_ordered()
+            if not ordered:
+                raise n_exc.InvalidConfigurationOption(
+                    opt_name='APISERVER.api_server_ip',
+                    opt_value=cfg.CONF.APISERVER.api_server_ip)
+            endpoint = ordered[0]
+        return endpoint.make_url(self._apiserverconnect, '/' + resource)
 
     def request_contrail(self, resource, type='GET', data=None, headers=None,
                          params=None, update_tokens=False):
         # Request parameters
-        url = self.get_contrail_url(resource)
         headers = self.set_auth_token(headers, update_tokens)
         headers['Content-type'] = 'application/json'
         request = {
             'headers': headers,
-            'data': data,
+            'data': compression.compress_request(data, headers),
             'params': params,
+            'timeout': utils.get_http_timeout(),
         }
 
         # Set auth type
@@ -89,18 +79,34 @@ class ContrailRestApiDriver(OpenContrailDrivers):
             request['verify'] = self._apicertbundle
 
         # Perform request
-        if type == 'GET':
-            response = requests.get(url, **request)
-        elif type == 'POST':
-            response = requests.post(url, **request)
-        elif type == 'PUT':
-            response = requests.put(url, **request)
-        elif type == 'DELETE':
-            response = requests.delete(url, **request)
-        else:
+        session = utils.get_http_session()
+
+        def send(endpoint):
+            url = self.get_contrail_url(resource, endpoint)
+            if type == 'GET':
+                return session.get(url, **request)
+            elif type == 'POST':
+                return session.post(url, **request)
+            elif type == 'PUT':
+                return session.put(url, **request)
+            elif type == 'DELETE':
+                return session.delete(url, **request)
             raise RuntimeError('Unknown request type')
 
+        breaker = circuit_breaker.get_circuit_breaker('api_server')
+        # UUIDs are not part of metrics, so they are kept per resource type.
+        request_size = _get_size(request['data'])
+        resource_type = resource.split('/')[0]
+        with tracing.span('tf.rest', resource=resource, action=type):
+            with metrics.measure('rest', resource_type, type,
+                                 request_size=request_size) as measurement:
+                response = breaker.call(endpoints.get_endpoint_pool().request,
+                                        send, idempotent=(type == 'GET'))
+                measurement.status = response.status_code
+                measurement.response_size = _get_size(response.content)
+
         # Parse response
+        compression.record_response(response)
         if (response.status_code == requests.codes.unauthorized and
                 not update_tokens):
             return self.request_contrail(resource, type=type, data=data,
@@ -108,7 +114,7 @@ class ContrailRestApiDriver(OpenContrailDrivers):
                                          update_tokens=True)
 
         try:
-            content = json.loads(response.text)
+            content = codec.loads(response.content)
             return response.status_code, content
         except ValueError:
             return response.status_code, {'message': response.content}
@@ -132,3 +138,10 @@ class ContrailRestApiDriver(OpenContrailDrivers):
     def list_resource(self, res_type, query):
         res_type += 's'
         return self.request_contrail(res_type, type='GET', params=query)
+
+
+def _get_size(data):
+    """Get size of a serialized body, None for data of other types."""
+    if isinstance(data, (bytes, six.text_type)):
+        return len(data)
+    return None
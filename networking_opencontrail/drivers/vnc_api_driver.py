@@ -20,8 +20,105 @@ from oslo_log import log as logging
 
 from vnc_api import vnc_api
 
+from networking_opencontrail.common import cache
+from networking_opencontrail.common import circuit_breaker
+from networking_opencontrail.common import endpoints
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import tokens
+from networking_opencontrail.common import tracing
+
 LOG = logging.getLogger(__name__)
 
+# Writing an object of a type changes references or back references
+# of objects of other types, so their cached copies become stale.
+DEPENDENT_TYPES = {
+    'virtual_machine_interface': ('virtual_network', 'virtual_port_group',
+                                  'physical_interface'),
+    'virtual_port_group': ('virtual_machine_interface',
+                           'physical_interface'),
+}
+
+
+class VncObjectCache(object):
+    """Cache of VNC objects keyed by type and UUID or fully qualified name.
+
+    An object is stored under both of its keys, so it may be found and
+    invalidated by any of them. Objects which do not exist are cached
+    for a short time as well.
+    """
+
+    _NOT_FOUND = object()
+
+    def __init__(self, max_size, default_ttl, ttls=None, negative_ttl=0):
+        self._cache = cache.LRUCache(max_size, default_ttl)
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.negative_ttl = negative_ttl
+
+    @classmethod
+    def from_config(cls):
+        conf = cfg.CONF.VNC_CACHE
+        max_size = conf.max_size if conf.enabled else 0
+        ttls = dict((obj_type, float(ttl))
+                    for obj_type, ttl in conf.ttls.items())
+        return cls(max_size, conf.default_ttl, ttls, conf.negative_ttl)
+
+    def get(self, obj_type, uuid=None, fq_name=None):
+        """Get cached object or MISSING if it is not cached.
+
+        None is returned for object which is known not to exist.
+        """
+        value = self._cache.get(self._make_key(obj_type, uuid, fq_name))
+        if value is self._NOT_FOUND:
+            return None
+        return value
+
+    def store(self, obj_type, obj, uuid=None, fq_name=None):
+        if not self._cache.enabled:
+            return
+
+        ttl = self.ttls.get(obj_type, self.default_ttl)
+        if obj is None:
+            self._cache.set(self._make_key(obj_type, uuid, fq_name),
+                            self._NOT_FOUND, min(ttl, self.negative_ttl))
+            return
+        self._cache.set(self._make_key(obj_type, uuid=obj.uuid), obj, ttl)
+        self._cache.set(self._make_key(obj_type, fq_name=obj.fq_name), obj,
+                        ttl)
+
+    def invalidate(self, obj_type, uuid=None, fq_name=None):
+        if not self._cache.enabled:
+            return
+
+        keys = set()
+        if uuid:
+            keys.add(self._make_key(obj_type, uuid=uuid))
+        if fq_name:
+            keys.add(self._make_key(obj_type, fq_name=fq_name))
+        for key in list(keys):
+            obj = self._cache.peek(key)
+            if obj not in (cache.MISSING, self._NOT_FOUND):
+                keys.add(self._make_key(obj_type, uuid=obj.uuid))
+                keys.add(self._make_key(obj_type, fq_name=obj.fq_name))
+        for key in keys:
+            self._cache.invalidate(key)
+
+        dependent = DEPENDENT_TYPES.get(obj_type)
+        if dependent:
+            self._cache.invalidate_matching(lambda key: key[0] in dependent)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self):
+        return self._cache.get_stats()
+
+    @staticmethod
+    def _make_key(obj_type, uuid=None, fq_name=None):
+        if uuid:
+            return (obj_type, 'uuid', uuid)
+        return (obj_type, 'fq_name', tuple(fq_name or ()))
+
 
 class VncApiClient(object):
     DEFAULT_GLOBAL_CONF = "default-global-system-config"
@@ -35,10 +132,36 @@ class VncApiClient(object):
             functools.update_wrapper(self, func)
             self._func = func
 
+        # Methods taking name of the object type as the first argument.
+        OBJECT_ACTIONS = {'_read_object': 'READ', '_list_objects': 'READALL'}
+
         def __call__(self, obj, *args, **kwargs):
+            breaker = circuit_breaker.get_circuit_breaker('vnc_api')
+            resource, action = self._describe(args, kwargs)
+            with tracing.span('tf.vnc_api', resource=resource,
+                              action=action):
+                with metrics.measure('vnc_api', resource, action):
+                    return breaker.call(self._connect_and_call, obj, *args,
+                                        **kwargs)
+
+        def _describe(self, args, kwargs):
+            """Get resource and action of the call for metrics."""
+            name = self._func.__name__
+            if name in self.OBJECT_ACTIONS:
+                obj_name = args[0] if args else kwargs.get('obj_name')
+                return obj_name, self.OBJECT_ACTIONS[name]
+            action, _, resource = name.partition('_')
+            return resource, action.upper()
+
+        def _connect_and_call(self, obj, *args, **kwargs):
+            token_manager = tokens.get_token_manager()
+            token = token_manager.current_token() if token_manager else None
             if not obj.vnc_lib:
+                # VncApi fails over between listed servers on its own,
+                # healthy servers of the pool are listed first.
+                pool = endpoints.get_endpoint_pool()
                 obj.vnc_lib = vnc_api.VncApi(
-                    api_server_host=cfg.CONF.APISERVER.api_server_ip,
+                    api_server_host=[e.host for e in pool.get_ordered()],
                     api_server_port=cfg.CONF.APISERVER.api_server_port,
                     api_server_use_ssl=cfg.CONF.APISERVER.use_ssl,
                     apicertfile=cfg.CONF.APISERVER.certfile,
@@ -52,14 +175,37 @@ class VncApiClient(object):
                     tenant_name=cfg.CONF.keystone_authtoken.admin_tenant_name,
                     kscertfile=cfg.CONF.keystone_authtoken.certfile,
                     kskeyfile=cfg.CONF.keystone_authtoken.keyfile,
-                    ksinsecure=cfg.CONF.keystone_authtoken.insecure)
-            return self._func(obj, *args, **kwargs)
+                    ksinsecure=cfg.CONF.keystone_authtoken.insecure,
+                    auth_token=token)
+            elif token:
+                obj.vnc_lib.set_auth_token(token)
+
+            try:
+                return self._func(obj, *args, **kwargs)
+            except vnc_api.AuthFailed:
+                if not token_manager:
+                    raise
+                # Token was rejected before its expiry, retry once
+                # with a new one.
+                token_manager.invalidate(token)
+                obj.vnc_lib.set_auth_token(token_manager.get_token())
+                return self._func(obj, *args, **kwargs)
 
         def __get__(self, instance, instancetype):
             return functools.partial(self.__call__, instance)
 
-    def __init__(self):
+    def __init__(self, object_cache=None):
         self.vnc_lib = None
+        self._object_cache = object_cache
+
+    @property
+    def object_cache(self):
+        if self._object_cache is None:
+            self._object_cache = VncObjectCache.from_config()
+        return self._object_cache
+
+    def get_cache_stats(self):
+        return self.object_cache.get_stats()
 
     def read_pi_from_switch(self, switch_name, pi_name):
         pi_fq_name = [self.DEFAULT_GLOBAL_CONF, switch_name, pi_name]
@@ -111,12 +257,28 @@ class VncApiClient(object):
         return self._get_object("virtual_router",
                                 uuid=uuid, fq_name=fq_name)
 
+    def list_nodes(self, **kwargs):
+        return self._list_objects("node", **kwargs)
+
+    def list_ports(self, **kwargs):
+        return self._list_objects("port", **kwargs)
+
+    def list_virtual_port_groups(self, **kwargs):
+        return self._list_objects("virtual_port_group", **kwargs)
+
+    def list_virtual_routers(self, **kwargs):
+        return self._list_objects("virtual_router", **kwargs)
+
     @vnc_connect
     def create_virtual_machine_interface(self, vmi):
         try:
             self.vnc_lib.virtual_machine_interface_create(vmi)
         except vnc_api.RefsExistError:
             LOG.debug("VMI %s already exists in VNC", vmi.name)
+        finally:
+            self.object_cache.invalidate("virtual_machine_interface",
+                                         uuid=vmi.uuid,
+                                         fq_name=vmi.fq_name)
 
     @vnc_connect
     def delete_virtual_machine_interface(self, fq_name):
@@ -124,6 +286,9 @@ class VncApiClient(object):
             self.vnc_lib.virtual_machine_interface_delete(fq_name=fq_name)
         except vnc_api.NoIdError:
             LOG.warning("Cannot delete VMI %s: not exists" % fq_name)
+        finally:
+            self.object_cache.invalidate("virtual_machine_interface",
+                                         fq_name=fq_name)
 
     @vnc_connect
     def update_virtual_port_group(self, vpg):
@@ -131,9 +296,24 @@ class VncApiClient(object):
             self.vnc_lib.virtual_port_group_update(vpg)
         except vnc_api.NoIdError:
             LOG.warning("Cannot update VPG %s: not exists" % vpg.name)
+        finally:
+            # Cached copy could be modified by the caller, even if update
+            # failed.
+            self.object_cache.invalidate("virtual_port_group",
+                                         uuid=vpg.uuid,
+                                         fq_name=vpg.fq_name)
 
-    @vnc_connect
     def _get_object(self, obj_name, uuid=None, fq_name=None):
+        obj = self.object_cache.get(obj_name, uuid=uuid, fq_name=fq_name)
+        if obj is not cache.MISSING:
+            return obj
+
+        obj = self._read_object(obj_name, uuid=uuid, fq_name=fq_name)
+        self.object_cache.store(obj_name, obj, uuid=uuid, fq_name=fq_name)
+        return obj
+
+    @vnc_connect
+    def _read_object(self, obj_name, uuid=None, fq_name=None):
         func_name = "%s_read" % obj_name
         read_obj = getattr(self.vnc_lib, func_name)
         try:
@@ -141,6 +321,15 @@ class VncApiClient(object):
         except vnc_api.NoIdError:
             return None
 
+    @vnc_connect
+    def _list_objects(self, obj_name, **kwargs):
+        res_type = obj_name.replace('_', '-')
+        response = self.vnc_lib.resource_list(res_type, **kwargs)
+        if kwargs.get('detail'):
+            # Detailed list is already translated to VNC objects.
+            return response
+        return response["%ss" % res_type]
+
     @classmethod
     def make_virtual_machine_interface(cls, name, network, properties,
                                        bindings, project):
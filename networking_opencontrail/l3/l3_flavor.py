@@ -22,23 +22,42 @@ from neutron_lib.callbacks import resources
 from neutron_lib import constants as q_const
 from neutron_lib.plugins import constants as plugin_constants
 from neutron_lib.plugins import directory
-from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 
+from networking_opencontrail.common import cache
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import tracing
 import networking_opencontrail.drivers.drv_opencontrail as driver
 import networking_opencontrail.l3.snat_synchronizer as snat_sync
 
 LOG = logging.getLogger(__name__)
 
+ROUTER_CACHE_SIZE = 4096
+ROUTER_CACHE_TTL = 3600.0
+FLAVOR_CACHE_SIZE = 256
+FLAVOR_CACHE_TTL = 60.0
+
 
 @registry.has_registry_receivers
 class TFL3ServiceProvider(base.L3ServiceProvider):
-    @log_helpers.log_method_call
+    """L3 service provider of routers with a flavor pointing to TF.
+
+    Every router event checks whether the router belongs to this provider.
+    Flavors of routers are remembered from their creation until deletion,
+    and providers of flavors for a short time, because service profiles
+    of a flavor can be changed without notifying providers.
+    """
+
     def __init__(self, l3_plugin):
         super(TFL3ServiceProvider, self).__init__(l3_plugin)
         self.driver = driver.OpenContrailDrivers()
         self.provider = __name__ + "." + self.__class__.__name__
         self.snat_sync = snat_sync.SnatSynchronizer()
+        self._router_flavors = cache.LRUCache(ROUTER_CACHE_SIZE,
+                                              ROUTER_CACHE_TTL)
+        self._flavor_owned = cache.LRUCache(FLAVOR_CACHE_SIZE,
+                                            FLAVOR_CACHE_TTL)
+        metrics.register_provider('l3_flavor', self.get_stats)
 
     @property
     def _flavor_plugin(self):
@@ -49,18 +68,36 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
                 plugin_constants.FLAVORS)
             return self._flavor_plugin_ref
 
+    def get_stats(self):
+        return {'router_cache': dict(self._router_flavors.stats),
+                'flavor_cache': dict(self._flavor_owned.stats)}
+
     def _validate_l3_flavor(self, context, router_id, flavor_id=None):
         if router_id is None or flavor_id is q_const.ATTR_NOT_SPECIFIED:
             return False
         if not flavor_id:
-            router = l3_obj.Router.get_object(context, id=router_id)
-            if router.flavor_id is None:
+            flavor_id = self._get_router_flavor(context, router_id)
+            if flavor_id is None:
                 return False
-            flavor_id = router.flavor_id
 
-        provider = self._flavor_plugin.get_flavor_next_provider(
-            context, flavor_id)[0]
-        return str(provider['driver']) == self.provider
+        owned = self._flavor_owned.get(flavor_id)
+        if owned is cache.MISSING:
+            provider = self._flavor_plugin.get_flavor_next_provider(
+                context, flavor_id)[0]
+            owned = str(provider['driver']) == self.provider
+            self._flavor_owned.set(flavor_id, owned)
+        return owned
+
+    def _get_router_flavor(self, context, router_id):
+        flavor_id = self._router_flavors.get(router_id)
+        if flavor_id is not cache.MISSING:
+            return flavor_id
+
+        router = l3_obj.Router.get_object(context, id=router_id)
+        if router is None:
+            return None
+        self._router_flavors.set(router_id, router.flavor_id)
+        return router.flavor_id
 
     def _update_floatingip_status(self, context, fip_dict):
         port_id = fip_dict.get('port_id')
@@ -70,25 +107,31 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
 
     @registry.receives(resources.ROUTER, [events.PRECOMMIT_CREATE],
                        priority_group.PRIORITY_ROUTER_DRIVER)
-    @log_helpers.log_method_call
+    @tracing.traced
     def router_create_precommit(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         router_dict = kwargs['router']
         flavor_id = router_dict['flavor_id']
         router_id = router_dict['id']
         router_dict['gw_port_id'] = kwargs['router_db'].gw_port_id
+        if flavor_id is q_const.ATTR_NOT_SPECIFIED:
+            self._router_flavors.set(router_id, None)
+        else:
+            self._router_flavors.set(router_id, flavor_id or None)
         if not self._validate_l3_flavor(context, router_id, flavor_id):
             return
         self.driver.create_router(context, {'router': router_dict})
 
     @registry.receives(resources.ROUTER, [events.PRECOMMIT_UPDATE],
                        priority_group.PRIORITY_ROUTER_DRIVER)
-    @log_helpers.log_method_call
+    @tracing.traced
     def router_update_precommit(self, resource, event, trigger, payload=None):
         context = payload.context
         router_id = payload.resource_id
         router_dict = payload.request_body.get('router', {})
         external_gw = payload.states[0].get('external_gateway_info', None)
+        if 'flavor_id' in router_dict:
+            self._router_flavors.invalidate(router_id)
         if not self._validate_l3_flavor(context, router_id):
             return
         if 'external_gateway_info' not in router_dict and external_gw:
@@ -99,16 +142,18 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
         self.driver.update_router(context, router_id, {'router': router_dict})
 
     @registry.receives(resources.ROUTER, [events.PRECOMMIT_DELETE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def router_delete_precommit(self, resource, event, trigger, **kwargs):
         router_id = kwargs['router_id']
         context = kwargs['context']
-        if not self._validate_l3_flavor(context, router_id):
+        owned = self._validate_l3_flavor(context, router_id)
+        self._router_flavors.invalidate(router_id)
+        if not owned:
             return
         self.driver.delete_router(context, router_id)
 
     @registry.receives(resources.ROUTER_INTERFACE, [events.AFTER_CREATE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def router_intf_after_create(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         router_id = kwargs['router_id']
@@ -118,7 +163,7 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
         self.driver.add_router_interface(context, router_id, interface_info)
 
     @registry.receives(resources.ROUTER_INTERFACE, [events.AFTER_DELETE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def router_intf_after_delete(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         router_id = kwargs['router_id']
@@ -128,7 +173,7 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
         self.driver.remove_router_interface(context, router_id, interface_info)
 
     @registry.receives(resources.FLOATING_IP, [events.PRECOMMIT_CREATE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def floating_ip_create_precommit(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         fip_dict = kwargs['floatingip']
@@ -140,7 +185,7 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
         self.driver.create_floatingip(context, {'floatingip': fip_dict})
 
     @registry.receives(resources.FLOATING_IP, [events.PRECOMMIT_UPDATE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def floating_ip_update_precommit(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         fip_dict = kwargs['floatingip']['floatingip']
@@ -153,7 +198,7 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
                                       {'floatingip': fip_dict})
 
     @registry.receives(resources.FLOATING_IP, [events.PRECOMMIT_DELETE])
-    @log_helpers.log_method_call
+    @tracing.traced
     def floating_ip_delete_precommit(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         fip_id = kwargs['port']['device_id']
@@ -164,9 +209,9 @@ class TFL3ServiceProvider(base.L3ServiceProvider):
         events.AFTER_UPDATE,
         events.AFTER_DELETE,
     ])
-    @log_helpers.log_method_call
+    @tracing.traced
     def snat_synchronization(self, resource, event, trigger, **kwargs):
         context = kwargs['context']
         router_id = kwargs['router_id']
         router = kwargs['router']
-        self.snat_sync.sync_snat_interfaces(context, router_id, router)
+        self.snat_sync.schedule_sync(context, router_id, router)
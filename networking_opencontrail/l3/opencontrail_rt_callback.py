@@ -21,10 +21,10 @@ from neutron.db import l3_gwmode_db
 from neutron_lib import constants as const
 from neutron_lib.db import api as db_api
 from neutron_lib.plugins import constants as plugin_const
-from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 from oslo_utils import excutils
 
+from networking_opencontrail.common import tracing
 import networking_opencontrail.drivers.drv_opencontrail as driver
 import networking_opencontrail.l3.snat_synchronizer as snat_sync
 
@@ -55,11 +55,13 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
         return ("L3 Router Service Plugin for basic L3 forwarding "
                 "using OpenContrail.")
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def create_router(self, context, router):
         """Create Router callback handler for OpenContrail networking.
 
-        Invokes back-end driver to create router in OpenContrail.
+        Invokes back-end driver to create router in OpenContrail. SNAT
+        interfaces are synchronized only once the router is committed,
+        so a rollback never has to undo a sync.
         """
         created_router = {}
         try:
@@ -75,25 +77,23 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
                 super(OpenContrailRouterHandler,
                       self).create_router(context, {'router': created_router})
 
-            self.snat_sync.sync_snat_interfaces(context, created_router['id'],
-                                                created_router)
+            self.snat_sync.schedule_sync(context, created_router['id'],
+                                         created_router)
         except Exception as e:
             with excutils.save_and_reraise_exception():
                 LOG.error("Failed to create a router %(id)s: %(err)s",
                           {"id": created_router.get('id', ''), "err": e})
                 try:
                     if created_router:
-                        tf_router = self.driver.delete_router(
-                            context, created_router['id'])
-                        self.snat_sync.sync_snat_interfaces(
-                            context, tf_router['id'], tf_router)
+                        self.driver.delete_router(context,
+                                                  created_router['id'])
                 except Exception:
                     LOG.exception("Failed to rollback creation router %s",
                                   created_router.get('id', ''))
 
         return created_router
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def delete_router(self, context, router_id):
         """Delete Router callback handler for OpenContrail networking.
 
@@ -106,16 +106,18 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
 
             try:
                 self.driver.delete_router(context, router_id)
-                self.snat_sync.sync_snat_interfaces(context, router_id)
+                self.snat_sync.schedule_sync(context, router_id)
             except Exception as e:
                 LOG.error("Failed to delete router %(id)s: %(err)s",
                           {"id": router_id, "err": e})
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def update_router(self, context, router_id, router):
         """Update Router callback handler for OpenContrail networking.
 
-        Invokes back-end driver to update router in OpenContrail.
+        Invokes back-end driver to update router in OpenContrail. SNAT
+        interfaces are synchronized only once the router is committed,
+        so a rollback never has to undo a sync.
         """
         if 'name' in router['router']:
             LOG.warning("OpenContrail doesn't allow for changing router "
@@ -131,7 +133,6 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
 
             tf_router = self.driver.update_router(context, router_id,
                                                   router_data)
-            self.snat_sync.sync_snat_interfaces(context, router_id, tf_router)
 
             session = db_api.get_writer_session()
             with session.begin(subtransactions=True):
@@ -139,23 +140,23 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
                                     self).update_router(context, router_id,
                                                         router)
 
+            self.snat_sync.schedule_sync(context, router_id, tf_router)
+
         except Exception as e:
             with excutils.save_and_reraise_exception():
                 LOG.error("Failed to update router %(id)s: %(err)s",
                           {"id": router_id, "err": e})
                 try:
                     if prev_router and tf_router:
-                        tf_router = self.driver.update_router(
+                        self.driver.update_router(
                             context, router_id, {'router': prev_router})
-                        self.snat_sync.sync_snat_interfaces(
-                            context, router_id, tf_router)
                 except Exception:
                     LOG.exception("Failed to rollback update router %s",
                                   router_id)
 
         return router_dict
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def add_router_interface(self, context, router_id, interface_info):
         """Add Router Interface callback handler for OpenContrail.
 
@@ -185,7 +186,7 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
 
         return new_router
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def remove_router_interface(self, context, router_id, interface_info):
         """Remove router interface callback handler for OpenContrail.
 
@@ -206,7 +207,7 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
 
         return new_router
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def create_floatingip(self, context, floatingip,
                           initial_status=const.FLOATINGIP_STATUS_ACTIVE):
         fip = floatingip['floatingip']
@@ -237,7 +238,7 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
                     context, fip_dict['id'])
             raise
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def update_floatingip(self, context, floatingip_id, floatingip):
         session = db_api.get_writer_session()
 
@@ -291,7 +292,7 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
                     raise
             raise
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def delete_floatingip(self, context, floatingip_id):
         session = db_api.get_writer_session()
 
@@ -327,7 +328,7 @@ class OpenContrailRouterHandler(extraroute_db.ExtraRoute_db_mixin,
 
             raise
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def disassociate_floatingips(self, context, port_id, do_notify=True):
         session = db_api.get_writer_session()
 
@@ -12,21 +12,94 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import collections
+import functools
 
+import eventlet
 from requests import codes as http_status
 
+from neutron_lib import context as n_context
 from neutron_lib.plugins import directory
+from oslo_config import cfg
+from oslo_log import log as logging
 from retrying import retry
 
+from networking_opencontrail.common import metrics
 import networking_opencontrail.drivers.rest_driver as rest_driver
 
+LOG = logging.getLogger(__name__)
+
 TF_SNAT_DEVICE_OWNER = 'tf-compatibility:snat'
+# Limits length of URL of a list request.
+MAX_UUIDS_PER_REQUEST = 50
 
 
 class SnatSynchronizer(object):
+    """Synchronizer of SNAT interfaces of routers from TF to Neutron.
+
+    Syncs requested with schedule_sync() are debounced per router: a burst
+    of events is collapsed into a single sync, started when no event came
+    for SNAT_SYNC.delay seconds, with the state of the router from the last
+    event. At most one sync of a router is in flight. Events which come
+    during a sync make it run once again afterwards, so the final state of
+    the router is always synchronized. Delayed syncs run with a fresh admin
+    context, the context of the request is not kept after it returns.
+    """
+
     def __init__(self):
         self.tf_helper = TFHelper()
         self.neutron_helper = NeutronHelper()
+        self._pending = {}
+        self._timers = {}
+        self._running = set()
+        self.stats = collections.Counter()
+        metrics.register_provider('snat_sync', self.get_stats)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending'] = len(self._pending)
+        stats['running'] = len(self._running)
+        return stats
+
+    def schedule_sync(self, context, router_id, router=None):
+        """Sync SNAT interfaces of a router after a quiet period."""
+        self.stats['scheduled'] += 1
+        delay = cfg.CONF.SNAT_SYNC.delay
+        if delay <= 0:
+            self._sync(context, router_id, router)
+            return
+
+        if router_id in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[router_id] = router
+        if router_id in self._running:
+            # The running sync picks up the latest state when it finishes.
+            return
+
+        timer = self._timers.pop(router_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[router_id] = eventlet.spawn_after(
+            delay, self._run_scheduled, router_id)
+
+    def _run_scheduled(self, router_id):
+        del self._timers[router_id]
+        self._running.add(router_id)
+        try:
+            while router_id in self._pending:
+                router = self._pending.pop(router_id)
+                self._sync(n_context.get_admin_context(), router_id, router)
+        finally:
+            self._running.discard(router_id)
+
+    def _sync(self, context, router_id, router):
+        self.stats['synced'] += 1
+        try:
+            self.sync_snat_interfaces(context, router_id, router)
+        except Exception:
+            self.stats['failed'] += 1
+            LOG.exception("Failed to synchronize SNAT interfaces of "
+                          "router %s", router_id)
 
     def sync_snat_interfaces(self, context, router_id, router=None):
         new_snat_ips = self._get_tf_snat_ips(router_id, router)
@@ -43,7 +116,8 @@ class SnatSynchronizer(object):
 
         for new_ip in new_snat_ips:
             self.neutron_helper.create_snat_interface(
-                context, router['external_gateway_info'], router_id, new_ip)
+                context, router['external_gateway_info'], router_id, new_ip,
+                tenant_id=router.get('tenant_id'))
 
     def _get_tf_snat_ips(self, router_id, router):
         if (router and 'external_gateway_info' in router
@@ -60,8 +134,8 @@ class NeutronHelper(object):
         return ports
 
     def create_snat_interface(self, context, external_gateway_info,
-                              router_id, snat_ip):
-        port_data = {'tenant_id': context.tenant_id,
+                              router_id, snat_ip, tenant_id=None):
+        port_data = {'tenant_id': tenant_id or context.tenant_id,
                      'network_id': external_gateway_info['network_id'],
                      'fixed_ips': [{'ip_address': snat_ip}],
                      'device_id': router_id,
@@ -88,9 +162,10 @@ class TFHelper(object):
         if not router:
             return []
 
-        instance_ip_uuids = set(self._get_snat_ip_refs(router))
-        snat_ips = set(self._get_instance_ip(iip_id)['instance_ip_address']
-                       for iip_id in instance_ip_uuids)
+        instance_ip_uuids = self._get_snat_ip_refs(router)
+        instance_ips = self._get_resources_by_uuids(
+            'instance-ip', instance_ip_uuids)
+        snat_ips = set(iip['instance_ip_address'] for iip in instance_ips)
 
         return list(snat_ips)
 
@@ -100,11 +175,13 @@ class TFHelper(object):
         except KeyError:
             return []
 
-    # TF creates snat async, so max. 3 retry to try get it
+    # TF creates snat async, so it is polled for a few seconds.
     # Key error usually means that snat interface is not ready yet
     @retry(retry_on_exception=lambda exc: isinstance(exc, KeyError),
-           stop_max_attempt_number=3,
-           wait_fixed=1000)
+           stop_max_attempt_number=5,
+           stop_max_delay=5000,
+           wait_exponential_multiplier=100,
+           wait_exponential_max=1600)
     def _get_snat_ip_refs_retry(self, router):
         for service_ref in router['service_instance_refs']:
             if self._not_a_snat_service(service_ref):
@@ -117,34 +194,57 @@ class TFHelper(object):
     def _get_right_ip_refs_from_service(self, service):
         # Since ServiceInstance.right_ip_address is deprecated, we need
         # to get the value manually by traversing TF's data structures.
+        # All objects of a level are read together.
         ip_refs = []
-        for vm in self._get_vms_from_service_instances_back_refs(service):
-            for vmi in self._get_vmis_from_virtual_machines_back_refs(vm):
-                if self._service_interface_is_of_right_type(vmi):
-                    ip_refs.extend(vmi['instance_ip_back_refs'])
+        vms = self._get_resources_by_objects_refs(
+            'virtual-machine', [service], 'virtual_machine_back_refs',
+            fields=['virtual_machine_interface_back_refs'])
+        vmis = self._get_resources_by_objects_refs(
+            'virtual-machine-interface', vms,
+            'virtual_machine_interface_back_refs',
+            fields=['instance_ip_back_refs'])
+        for vmi in vmis:
+            if self._service_interface_is_of_right_type(vmi):
+                ip_refs.extend(vmi['instance_ip_back_refs'])
         return ip_refs
 
-    def _get_vms_from_service_instances_back_refs(self, service_instance):
-        return self._get_resources_by_objects_refs(
-            'virtual-machine', service_instance,
-            'virtual_machine_back_refs')
+    def _get_resources_by_objects_refs(self, resource_type, objs, ref_type,
+                                       fields=None):
+        uuids = [ref['uuid'] for obj in objs for ref in obj[ref_type]]
+        return self._get_resources_by_uuids(resource_type, uuids, fields)
 
-    def _get_vmis_from_virtual_machines_back_refs(self, virtual_machine):
-        return self._get_resources_by_objects_refs(
-            'virtual-machine-interface', virtual_machine,
-            'virtual_machine_interface_back_refs')
+    def _get_resources_by_uuids(self, res_type, uuids, fields=None):
+        """Read resources with list requests, sent in parallel chunks."""
+        uuids = sorted(set(uuids))
+        if not uuids:
+            return []
 
-    def _get_resources_by_objects_refs(self, resource_type, obj, ref_type):
-        resources = [self._get_resource(resource_type, ref['uuid'])
-                     for ref in obj[ref_type]]
-        return [res for res in resources if res is not None]
+        chunks = [uuids[i:i + MAX_UUIDS_PER_REQUEST]
+                  for i in range(0, len(uuids), MAX_UUIDS_PER_REQUEST)]
+        list_chunk = functools.partial(self._list_resources, res_type,
+                                       fields=fields)
+        if len(chunks) == 1:
+            return list_chunk(chunks[0])
+
+        pool = eventlet.GreenPool(cfg.CONF.APISERVER.bulk_concurrency)
+        resources = []
+        for chunk_resources in pool.imap(list_chunk, chunks):
+            resources.extend(chunk_resources)
+        return resources
+
+    def _list_resources(self, res_type, uuids, fields=None):
+        query = {'obj_uuids': ','.join(uuids), 'detail': True}
+        if fields:
+            query['fields'] = ','.join(fields)
+        status_code, response = self.rest_driver.list_resource(res_type,
+                                                               query)
+        if status_code != http_status.ok:
+            return []
+        return [item[res_type] for item in response['%ss' % res_type]]
 
     def _get_service_instance(self, service_id):
         return self._get_resource('service-instance', service_id)
 
-    def _get_instance_ip(self, iip_id):
-        return self._get_resource('instance-ip', iip_id)
-
     def _get_router(self, router_id):
         return self._get_resource('logical-router', router_id)
 
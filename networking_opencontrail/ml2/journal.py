@@ -0,0 +1,307 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import os
+import sqlite3
+import struct
+import time
+
+import eventlet
+from eventlet import semaphore
+from eventlet import tpool
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+LOG = logging.getLogger(__name__)
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource_id TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    action TEXT NOT NULL,
+    data TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    original TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_resource_id ON journal (resource_id);
+"""
+
+# File change counter in the header of SQLite database, incremented by
+# every transaction which modified the database.
+_CHANGE_COUNTER_OFFSET = 24
+
+
+class JournalEntry(object):
+    def __init__(self, seq, resource_id, resource, action, data, attempts,
+                 next_attempt, claimed_until, original=None):
+        self.seq = seq
+        self.resource_id = resource_id
+        self.resource = resource
+        self.action = action
+        self.data = jsonutils.loads(data)
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.claimed_until = claimed_until
+        self.original = jsonutils.loads(original) if original else None
+
+    def is_claimed(self, now):
+        return self.claimed_until > now
+
+
+class OperationJournal(object):
+    """Persistent journal of failed Tungsten Fabric synchronizations.
+
+    Journal is a SQLite file shared by all Neutron workers on a host.
+    Operations of a resource are replayed in the order of recording,
+    and an operation is claimed by a worker before it is replayed,
+    so it is never sent twice at the same time. While a resource has
+    pending operations, new operations for it are recorded as well,
+    to keep them in order. Recorded operations are compacted: creation
+    followed by deletion cancels out, and successive updates are merged,
+    because every operation carries a full state of the resource.
+
+    SQLite calls block, so they run in native threads of eventlet tpool,
+    one at a time, and do not stall other green threads while waiting
+    for other workers.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cfg.CONF.JOURNAL.path
+        self._connection = None
+        self._connection_pid = None
+        self._lock = semaphore.Semaphore()
+        self._pending_ids = frozenset()
+        self._pending_version = None
+
+    @property
+    def _db(self):
+        # SQLite connections must not be shared with forked processes.
+        pid = os.getpid()
+        if self._connection is None or self._connection_pid != pid:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._connection_pid = pid
+        return self._connection
+
+    def _call(self, func, *args):
+        with self._lock:
+            return tpool.execute(func, *args)
+
+    def has_pending(self, resource_id):
+        """Check if operations of the resource wait in the journal.
+
+        Identifiers of pending resources are loaded again only when the
+        journal was modified, so the check is cheap for every operation.
+        """
+        version = self._get_version()
+        if version is None:
+            return False
+        if version != self._pending_version:
+            self._pending_ids = self._call(self._load_pending_ids)
+            self._pending_version = version
+        return resource_id in self._pending_ids
+
+    def _get_version(self):
+        try:
+            with open(self.path, 'rb') as db_file:
+                db_file.seek(_CHANGE_COUNTER_OFFSET)
+                header = db_file.read(4)
+        except (IOError, OSError):
+            return None
+        if len(header) < 4:
+            return None
+        return struct.unpack('>I', header)[0]
+
+    def _load_pending_ids(self):
+        rows = self._db.execute("SELECT DISTINCT resource_id FROM journal")
+        return frozenset(row[0] for row in rows)
+
+    def count(self):
+        return self._call(self._count)
+
+    def _count(self):
+        return self._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def get_stats(self):
+        return {'pending': self.count()}
+
+    def record(self, resource, action, data, original=None):
+        """Record operation, original is the state before an update."""
+        self._call(self._record, resource, action, data, original)
+
+    def _record(self, resource, action, data, original=None):
+        resource_id = data['id']
+        now = time.time()
+        with _transaction(self._db) as db:
+            entries = self._get_entries(db, resource_id)
+            unclaimed = [entry for entry in entries
+                         if not entry.is_claimed(now)]
+            last = unclaimed[-1] if unclaimed else None
+
+            if (action == DELETE and len(unclaimed) == len(entries) and
+                    entries and entries[0].action == CREATE):
+                # Resource has never been created, so there is nothing
+                # to delete.
+                db.execute("DELETE FROM journal WHERE resource_id = ?",
+                           (resource_id,))
+                LOG.debug("Journal: %s %s compacted out", resource,
+                          resource_id)
+                return
+            if action == DELETE:
+                # Pending updates are not needed for resource which is
+                # deleted anyway.
+                for entry in unclaimed:
+                    if entry.action == UPDATE:
+                        db.execute("DELETE FROM journal WHERE seq = ?",
+                                   (entry.seq,))
+            elif action == UPDATE and last and last.action in (CREATE,
+                                                               UPDATE):
+                # Original of the first update is kept, it is the state
+                # known to Tungsten Fabric.
+                db.execute("UPDATE journal SET data = ? WHERE seq = ?",
+                           (jsonutils.dumps(data), last.seq))
+                LOG.debug("Journal: %s %s merged into entry %d", resource,
+                          resource_id, last.seq)
+                return
+
+            db.execute(
+                "INSERT INTO journal "
+                "(resource_id, resource, action, data, original) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (resource_id, resource, action, jsonutils.dumps(data),
+                 jsonutils.dumps(original) if original else None))
+            LOG.debug("Journal: %s %s of %s recorded", action, resource,
+                      resource_id)
+
+    def claim_next(self):
+        """Claim the oldest operation which is due to be replayed.
+
+        Only the first operation of a resource may be claimed.
+        """
+        return self._call(self._claim_next)
+
+    def _claim_next(self):
+        now = time.time()
+        with _transaction(self._db) as db:
+            row = db.execute(
+                "SELECT * FROM journal WHERE seq IN ("
+                "    SELECT MIN(seq) FROM journal GROUP BY resource_id) "
+                "AND next_attempt <= ? AND claimed_until <= ? "
+                "ORDER BY seq LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            entry = JournalEntry(*row)
+            entry.claimed_until = now + cfg.CONF.JOURNAL.claim_timeout
+            db.execute("UPDATE journal SET claimed_until = ? WHERE seq = ?",
+                       (entry.claimed_until, entry.seq))
+            return entry
+
+    def complete(self, entry):
+        self._call(self._complete, entry)
+
+    def _complete(self, entry):
+        with _transaction(self._db) as db:
+            db.execute("DELETE FROM journal WHERE seq = ?", (entry.seq,))
+
+    def fail(self, entry):
+        self._call(self._fail, entry)
+
+    def _fail(self, entry):
+        attempts = entry.attempts + 1
+        max_attempts = cfg.CONF.JOURNAL.max_attempts
+        with _transaction(self._db) as db:
+            if max_attempts and attempts >= max_attempts:
+                LOG.error("Journal: dropping %s %s of %s after %d attempts",
+                          entry.action, entry.resource, entry.resource_id,
+                          attempts)
+                db.execute("DELETE FROM journal WHERE seq = ?", (entry.seq,))
+                return
+
+            delay = min(
+                cfg.CONF.JOURNAL.retry_interval * 2 ** entry.attempts,
+                cfg.CONF.JOURNAL.max_retry_interval)
+            db.execute(
+                "UPDATE journal SET attempts = ?, next_attempt = ?, "
+                "claimed_until = 0 WHERE seq = ?",
+                (attempts, time.time() + delay, entry.seq))
+
+    def replay(self, execute):
+        """Replay all due operations with execute(entry) callable."""
+        replayed = 0
+        entry = self.claim_next()
+        while entry is not None:
+            try:
+                execute(entry)
+            except Exception:
+                LOG.exception("Journal: replay of %s %s of %s failed",
+                              entry.action, entry.resource,
+                              entry.resource_id)
+                self.fail(entry)
+            else:
+                self.complete(entry)
+                replayed += 1
+            entry = self.claim_next()
+        return replayed
+
+    def start_replay(self, execute, paused=None):
+        """Replay operations in background.
+
+        :param paused: optional callable, replay is skipped while it returns
+                       True, so attempts are not used up in vain
+        """
+        eventlet.spawn_n(self._replay_loop, execute, paused)
+
+    def _replay_loop(self, execute, paused=None):
+        while True:
+            try:
+                if paused is None or not paused():
+                    self.replay(execute)
+            except Exception:
+                LOG.exception("Journal: unexpected error during replay")
+            eventlet.sleep(cfg.CONF.JOURNAL.replay_interval)
+
+    @staticmethod
+    def _get_entries(db, resource_id):
+        rows = db.execute(
+            "SELECT * FROM journal WHERE resource_id = ? ORDER BY seq",
+            (resource_id,)).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+
+class _transaction(object):
+    """Run statements in an immediate transaction of SQLite connection."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
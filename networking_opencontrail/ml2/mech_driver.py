@@ -12,17 +12,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import collections
 
+from oslo_config import cfg
 from oslo_log import log as logging
 
 import networking_opencontrail.drivers.drv_opencontrail as drv
+from neutron_lib.callbacks import events
+from neutron_lib.callbacks import registry
+from neutron_lib.callbacks import resources
+from neutron_lib import context as n_context
 from neutron_lib.plugins.ml2 import api
 
+from networking_opencontrail.common import circuit_breaker
+from networking_opencontrail.common import metrics
+from networking_opencontrail.common import utils
 from networking_opencontrail.dm import dm_integrator
+from networking_opencontrail.drivers import contrail_driver_base as driver_base
 from networking_opencontrail.drivers.vnc_api_driver import VncApiClient
 from networking_opencontrail.l3 import snat_synchronizer
+from networking_opencontrail.ml2 import journal
 from networking_opencontrail.ml2 import opencontrail_sg_callback
+from networking_opencontrail.ml2 import postcommit_dispatcher
 from networking_opencontrail.ml2 import subnet_dns_integrator
+from networking_opencontrail.ml2 import vrouter_index
 
 LOG = logging.getLogger(__name__)
 OMIT_DEVICES_TYPES = [
@@ -39,11 +52,21 @@ class OpenContrailMechDriver(api.MechanismDriver):
     Plugin. Additionally, it manages the Security Groups
     Note: All the xxx_precommit() calls are ignored at the
     moment as there is no relevance for them in the OpenContrial
-    SDN controller.
+    SDN controller. The xxx_postcommit() calls are passed to
+    the dispatcher, which may send them to OpenContrail asynchronously.
     """
 
     def initialize(self):
+        utils.register_vnc_api_options()
         self.drv = drv.OpenContrailDrivers()
+        self.dispatcher = postcommit_dispatcher.PostcommitDispatcher()
+        self.stats = collections.Counter()
+        self.journal = None
+        if cfg.CONF.JOURNAL.enabled:
+            self.journal = journal.OperationJournal()
+            # Replay runs in every Neutron worker, after it is forked.
+            registry.subscribe(self._start_journal_replay,
+                               resources.PROCESS, events.AFTER_INIT)
         self.sg_handler = (
             opencontrail_sg_callback.OpenContrailSecurityGroupHandler(self))
         self.subnet_handler = (
@@ -51,6 +74,12 @@ class OpenContrailMechDriver(api.MechanismDriver):
         self.dm_integrator = dm_integrator.DeviceManagerIntegrator()
         self.dm_integrator.initialize()
         self.tf_client = VncApiClient()
+        self.vrouter_index = vrouter_index.VirtualRouterIndex(self.tf_client)
+        # Index is loaded in every Neutron worker, so connection to VNC API
+        # is not shared by forked processes.
+        registry.subscribe(self._load_vrouter_index,
+                           resources.PROCESS, events.AFTER_INIT)
+        self._register_metrics_providers()
         LOG.info("Initialization of networking-opencontrail plugin: COMPLETE")
 
     def create_network_precommit(self, context):
@@ -58,105 +87,85 @@ class OpenContrailMechDriver(api.MechanismDriver):
 
     def create_network_postcommit(self, context):
         """Create a network in OpenContrail."""
-        network = {'network': context.current}
-        try:
-            self.drv.create_network(context._plugin_context, network)
-        except Exception:
-            LOG.exception("Create Network Failed")
+        self._dispatch(context, 'network', journal.CREATE,
+                       context.current)
 
     def delete_network_precommit(self, context):
         pass
 
     def delete_network_postcommit(self, context):
         """Delete a network from OpenContrail."""
-        network = context.current
-        try:
-            self.drv.delete_network(context._plugin_context, network['id'])
-        except Exception:
-            LOG.exception("Delete Network Failed")
+        self._dispatch(context, 'network', journal.DELETE,
+                       context.current)
 
     def update_network_precommit(self, context):
         pass
 
     def update_network_postcommit(self, context):
         """Update an existing network in OpenContrail."""
-        network = {'network': context.current}
-        try:
-            self.drv.update_network(context._plugin_context,
-                                    network['network']['id'], network)
-        except Exception:
-            LOG.exception("Update Network Failed")
+        self._dispatch(context, 'network', journal.UPDATE,
+                       context.current)
 
     def create_subnet_precommit(self, context):
         pass
 
     def create_subnet_postcommit(self, context):
         """Create a subnet in OpenContrail."""
-        subnet = {'subnet': context.current}
-        try:
-            ret_subnet = self.drv.create_subnet(context._plugin_context,
-                                                subnet)
-            self.subnet_handler.add_dns_port_for_subnet(
-                context._plugin_context, ret_subnet)
-        except Exception:
-            LOG.exception("Create Subnet Failed")
+        self._dispatch(context, 'subnet', journal.CREATE,
+                       context.current)
 
     def delete_subnet_precommit(self, context):
         pass
 
     def delete_subnet_postcommit(self, context):
         """Delete a subnet from OpenContrail."""
-        subnet = context.current
-        try:
-            self.drv.delete_subnet(context._plugin_context, subnet['id'])
-        except Exception:
-            LOG.exception("Delete Subnet Failed")
+        self._dispatch(context, 'subnet', journal.DELETE,
+                       context.current)
 
     def update_subnet_precommit(self, context):
         pass
 
     def update_subnet_postcommit(self, context):
         """Update a subnet in OpenContrail."""
-        subnet = {'subnet': context.current}
-        try:
-            self.drv.update_subnet(context._plugin_context,
-                                   subnet['subnet']['id'], subnet)
-        except Exception:
-            LOG.exception("Update Subnet Failed")
+        self._dispatch(context, 'subnet', journal.UPDATE,
+                       context.current)
 
     def create_port_precommit(self, context):
         pass
 
     def create_port_postcommit(self, context):
         """Create a port in OpenContrail."""
-        port = {'port': dict(context.current)}
+        port = dict(context.current)
 
-        if self._is_callback_to_omit(port['port']['device_owner']):
+        if self._is_callback_to_omit(port['device_owner']):
             return
 
-        try:
-            self.drv.create_port(context._plugin_context, port)
-        except Exception:
-            LOG.exception("Create Port Failed")
+        self._dispatch(context, 'port', journal.CREATE, port)
 
     def update_port_precommit(self, context):
         pass
 
     def update_port_postcommit(self, context):
         """Update a port in OpenContrail."""
-        port = {'port': dict(context.current)}
+        port = dict(context.current)
 
-        if self._is_callback_to_omit(port['port']['device_owner']):
+        if self._is_callback_to_omit(port['device_owner']):
             return
 
-        try:
-            self.drv.update_port(context._plugin_context,
-                                 port['port']['id'], port)
-            if self.dm_integrator.enabled:
-                self.dm_integrator.sync_vlan_tagging_for_port(
-                    context._plugin_context, context.current, context.original)
-        except Exception:
-            LOG.exception("Update port Failed")
+        changes = port
+        if context.original:
+            changes = driver_base.get_port_changes(context.original, port)
+        if not changes:
+            # Status flips and other changes made by agents are not used
+            # by TF, so there is nothing to send.
+            self.stats['port_updates_suppressed'] += 1
+            LOG.debug("Port %s has no changes for TF, update skipped",
+                      port['id'])
+            return
+
+        self.stats['port_updates_sent'] += 1
+        self._dispatch(context, 'port', journal.UPDATE, port,
+                       context.original, changes)
 
     def delete_port_precommit(self, context):
         pass
@@ -168,13 +177,109 @@ class OpenContrailMechDriver(api.MechanismDriver):
         if self._is_callback_to_omit(port['device_owner']):
             return
 
+        self._dispatch(context, 'port', journal.DELETE, port)
+
+    def _dispatch(self, context, resource, action, data, original=None,
+                  changes=None):
+        """Send operation to OpenContrail, or queue it in async mode.
+
+        Queued operations are ordered per network: operations on a network,
+        its subnets and ports are sent one at a time, in order of arrival,
+        so subnets and ports are never sent before their network is
+        created, nor after it is deleted. A busy network is served by a
+        single worker. Queued operations get a copy of the request context
+        with its user, tenant and roles, but without its DB session, which
+        must not be used after the API request has finished.
+        """
+        description = "%s %s Failed" % (action.capitalize(),
+                                        resource.capitalize())
+        if resource == 'network':
+            key = data['id']
+        else:
+            key = data.get('network_id') or data['id']
+        plugin_context = context._plugin_context
+        if self.dispatcher.enabled:
+            plugin_context = n_context.Context.from_dict(
+                plugin_context.to_dict())
+        self.dispatcher.dispatch(key, description, self._sync,
+                                 plugin_context, resource, action, data,
+                                 original, changes)
+
+    def _sync(self, plugin_context, resource, action, data, original=None,
+              changes=None):
+        """Send operation to OpenContrail or record it in the journal.
+
+        Operation is recorded when it fails, when previous operations
+        on the resource are still waiting in the journal, or when
+        OpenContrail is known to be unavailable. Whole resource is
+        recorded, because recorded updates of a resource are merged.
+        """
+        if not self.journal:
+            self._execute(plugin_context, resource, action, data, original,
+                          changes)
+            return
+
+        if (self.journal.has_pending(data['id']) or
+                self._is_api_server_unavailable()):
+            self.journal.record(resource, action, data, original)
+            return
         try:
-            self.drv.delete_port(context._plugin_context, port['id'])
-            if self.dm_integrator.enabled:
-                self.dm_integrator.delete_vlan_tagging_for_port(
-                    context._plugin_context, port)
+            self._execute(plugin_context, resource, action, data, original,
+                          changes)
         except Exception:
-            LOG.exception("Delete Port Failed")
+            LOG.exception("%s %s failed, recording it in the journal" %
+                          (action.capitalize(), resource))
+            self.journal.record(resource, action, data, original)
+
+    def _execute(self, plugin_context, resource, action, data,
+                 original=None, changes=None):
+        if action == journal.CREATE:
+            result = getattr(self.drv, 'create_%s' % resource)(
+                plugin_context, {resource: data})
+        elif action == journal.UPDATE:
+            result = getattr(self.drv, 'update_%s' % resource)(
+                plugin_context, data['id'], {resource: changes or data})
+        else:
+            result = getattr(self.drv, 'delete_%s' % resource)(
+                plugin_context, data['id'])
+
+        if resource == 'subnet' and action == journal.CREATE:
+            self.subnet_handler.add_dns_port_for_subnet(plugin_context,
+                                                        result)
+        elif resource == 'port' and self.dm_integrator.enabled:
+            if action == journal.UPDATE:
+                self.dm_integrator.sync_vlan_tagging_for_port(
+                    plugin_context, data, original or data)
+            elif action == journal.DELETE:
+                self.dm_integrator.delete_vlan_tagging_for_port(
+                    plugin_context, data)
+
+    def _replay_journal_entry(self, entry):
+        self._execute(n_context.get_admin_context(), entry.resource,
+                      entry.action, entry.data, entry.original)
+
+    def _start_journal_replay(self, resource, event, trigger, payload=None):
+        self.journal.start_replay(self._replay_journal_entry,
+                                  paused=self._is_api_server_unavailable)
+
+    @staticmethod
+    def _is_api_server_unavailable():
+        return circuit_breaker.get_circuit_breaker('api_server').is_open
+
+    def _load_vrouter_index(self, resource, event, trigger, payload=None):
+        self.vrouter_index.refresh()
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def _register_metrics_providers(self):
+        metrics.register_provider('postcommit', self.dispatcher.get_stats)
+        metrics.register_provider('mech_driver', self.get_stats)
+        metrics.register_provider('vnc_cache', self.tf_client.get_cache_stats)
+        metrics.register_provider(
+            'dm_vnc_cache', self.dm_integrator.tf_client.get_cache_stats)
+        if self.journal:
+            metrics.register_provider('journal', self.journal.get_stats)
 
     def bind_port(self, context):
         """Bind port in OpenContrail."""
@@ -186,12 +291,7 @@ class OpenContrailMechDriver(api.MechanismDriver):
                     network=context.network.current['id']))
 
             host_id = context._port['binding:host_id']
-            fq_name = [
-                self.tf_client.DEFAULT_GLOBAL_CONF,
-                host_id]
-            vrouter = self.tf_client.get_virtual_router(fq_name=fq_name)
-
-            if vrouter is None:
+            if not self.vrouter_index.is_managed(host_id):
                 LOG.debug(
                     "Refusing to bind port for {host}. "
                     "Not managed by TF.".format(host=host_id))
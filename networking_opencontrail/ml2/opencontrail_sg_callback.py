@@ -16,10 +16,11 @@
 from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
-from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 from oslo_utils import excutils
 
+from networking_opencontrail.common import tracing
+
 LOG = logging.getLogger(__name__)
 
 
@@ -32,7 +33,7 @@ class OpenContrailSecurityGroupHandler(object):
         self.client = client
         self.subscribe()
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def create_security_group(self, resource, event, trigger, **kwargs):
         """Create Security Group callback handler for OpenContrail networking.
 
@@ -52,7 +53,7 @@ class OpenContrailSecurityGroupHandler(object):
                     LOG.exception("Failed to delete security group %s",
                                   sg['id'])
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def delete_security_group(self, resource, event, trigger, payload=None):
         """Delete Security Group callback handler for OpenContrail networking.
 
@@ -66,7 +67,7 @@ class OpenContrailSecurityGroupHandler(object):
             LOG.error("Failed to delete security group %(sg_id)s"
                       ": %(err)s"), {"sg_id": sg["id"], "err": e}
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def update_security_group(self, resource, event, trigger, **kwargs):
         """Update Security Group callback handler for OpenContrail networking.
 
@@ -81,7 +82,7 @@ class OpenContrailSecurityGroupHandler(object):
             LOG.error("Failed to update security group %(sg_id)s"
                       ": %(err)s"), {"sg_id": sg["id"], "err": e}
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def create_security_group_rule(self, resource, event, trigger, **kwargs):
         """Create Security Group Rule callback handler for OpenContrail.
 
@@ -97,12 +98,13 @@ class OpenContrailSecurityGroupHandler(object):
                           "rule: %(err)s",
                           {"sgr_id": sgr["id"], "err": e})
                 try:
-                    self.client.delete_security_group_rule(context, sgr)
+                    self.client.delete_security_group_rule(context,
+                                                           sgr['id'])
                 except Exception:
                     LOG.exception("Failed to delete security group "
                                   "rule %s", sgr['id'])
 
-    @log_helpers.log_method_call
+    @tracing.traced
     def delete_security_group_rule(self, resource, event, trigger, **kwargs):
         """Delete Security Group rule callback handler for OpenContrail.
 
@@ -0,0 +1,136 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import os
+import time
+
+import eventlet
+from eventlet import queue
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class Operation(object):
+    def __init__(self, description, func, args):
+        self.description = description
+        self.func = func
+        self.args = args
+        self.enqueued_at = time.time()
+
+    def __call__(self):
+        return self.func(*self.args)
+
+
+class PostcommitDispatcher(object):
+    """Dispatcher of mechanism driver postcommit operations.
+
+    When async mode is enabled, operations are put into queues by their
+    key and Neutron API worker does not wait for Tungsten Fabric. Queues
+    are drained by a bounded number of green threads. Operations with the
+    same key are always executed in order of dispatching, so the key must
+    be shared by resources which depend on each other. Failed operation
+    is retried with exponential backoff before the next one is taken.
+    When async mode is disabled, operations are executed immediately.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._ready = queue.LightQueue()
+        self._workers_pid = None
+        self.stats = collections.Counter()
+
+    @property
+    def enabled(self):
+        return cfg.CONF.ASYNC_POSTCOMMIT.enabled
+
+    def dispatch(self, key, description, func, *args):
+        operation = Operation(description, func, args)
+        if not self.enabled:
+            self._execute(operation)
+            return
+
+        self._ensure_workers()
+        self.stats['dispatched'] += 1
+        key_queue = self._queues.setdefault(key, collections.deque())
+        key_queue.append(operation)
+        if len(key_queue) == 1:
+            self._ready.put(key)
+
+    def get_queue_depth(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def get_lag(self):
+        """Get age in seconds of the oldest operation waiting in queues."""
+        oldest = [q[0].enqueued_at for q in self._queues.values() if q]
+        if not oldest:
+            return 0.0
+        return time.time() - min(oldest)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.get_queue_depth()
+        stats['lag'] = self.get_lag()
+        return stats
+
+    def _ensure_workers(self):
+        # Green threads do not survive fork of Neutron API workers,
+        # so they are started in the process which dispatches operations.
+        pid = os.getpid()
+        if self._workers_pid == pid:
+            return
+        self._workers_pid = pid
+        for _ in range(cfg.CONF.ASYNC_POSTCOMMIT.workers):
+            eventlet.spawn_n(self._worker)
+
+    def _worker(self):
+        while True:
+            key = self._ready.get()
+            try:
+                self._drain(key)
+            except Exception:
+                LOG.exception("Unexpected error while processing operations "
+                              "for %s", key)
+
+    def _drain(self, key):
+        key_queue = self._queues[key]
+        while key_queue:
+            operation = key_queue[0]
+            self._execute_with_retries(operation)
+            key_queue.popleft()
+        del self._queues[key]
+
+    def _execute_with_retries(self, operation):
+        max_retries = cfg.CONF.ASYNC_POSTCOMMIT.max_retries
+        interval = cfg.CONF.ASYNC_POSTCOMMIT.retry_interval
+        for attempt in range(max_retries + 1):
+            if attempt:
+                self.stats['retried'] += 1
+                eventlet.sleep(min(
+                    interval * 2 ** (attempt - 1),
+                    cfg.CONF.ASYNC_POSTCOMMIT.max_retry_interval))
+            if self._execute(operation):
+                self.stats['completed'] += 1
+                return
+        self.stats['failed'] += 1
+
+    def _execute(self, operation):
+        try:
+            operation()
+            return True
+        except Exception:
+            LOG.exception(operation.description)
+            return False
@@ -0,0 +1,72 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class VirtualRouterIndex(object):
+    """Index of hosts with a vRouter managed by Tungsten Fabric.
+
+    Names of all virtual routers are loaded with a single list request
+    and kept in memory, so checking a host does not need a request to
+    VNC API. The index is reloaded periodically, and when an unknown host
+    is checked, but not more often than miss_refresh_interval, so bindings
+    on hosts not managed by TF do not cause a request each. If the index
+    cannot be loaded, hosts are checked one by one.
+    """
+
+    def __init__(self, tf_client):
+        self.tf_client = tf_client
+        self._hostnames = None
+        self._loaded_at = 0.0
+        self._refreshed_on_miss_at = 0.0
+
+    def refresh(self):
+        try:
+            vrouters = self.tf_client.list_virtual_routers()
+        except Exception:
+            LOG.exception("Failed to load virtual routers from TF")
+            return False
+
+        self._hostnames = set(vrouter['fq_name'][-1] for vrouter in vrouters)
+        self._loaded_at = time.time()
+        LOG.debug("Loaded %d virtual routers from TF", len(self._hostnames))
+        return True
+
+    def is_managed(self, host_id):
+        now = time.time()
+        refreshed = False
+        if (self._hostnames is None or now - self._loaded_at >=
+                cfg.CONF.VROUTER_INDEX.refresh_interval):
+            refreshed = self.refresh()
+        if self._hostnames is None:
+            return self._read_virtual_router(host_id)
+        if host_id in self._hostnames:
+            return True
+
+        if not refreshed and (now - self._refreshed_on_miss_at >=
+                              cfg.CONF.VROUTER_INDEX.miss_refresh_interval):
+            self._refreshed_on_miss_at = now
+            self.refresh()
+            return host_id in self._hostnames
+        return False
+
+    def _read_virtual_router(self, host_id):
+        fq_name = [self.tf_client.DEFAULT_GLOBAL_CONF, host_id]
+        return self.tf_client.get_virtual_router(fq_name=fq_name) is not None
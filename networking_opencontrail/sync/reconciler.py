@@ -0,0 +1,352 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import collections
+import hashlib
+
+from neutron_lib.plugins import constants as plugin_constants
+from neutron_lib.plugins import directory
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from requests import codes as http_status
+
+import networking_opencontrail.drivers.drv_opencontrail as drv
+import networking_opencontrail.drivers.rest_driver as rest_driver
+from networking_opencontrail.ml2 import mech_driver
+
+LOG = logging.getLogger(__name__)
+
+DM_VMI_PREFIX = '_vlan_tag_for_vn_'
+SNAT_NETWORK_PREFIX = 'snat-si-left_'
+COUNTERS = {'create': 'created', 'update': 'updated', 'delete': 'deleted'}
+# Creators in id_perms of objects created through Neutron, other TF
+# services record their own names.
+NEUTRON_CREATORS = (None, '', 'neutron')
+
+
+class ResourceType(object):
+    """Description of a resource kept in sync between Neutron and TF.
+
+    :param name: Neutron name of the resource
+    :param tf_type: type of matching object in TF REST API
+    :param fields: attributes compared between Neutron and TF
+    :param plugin_type: Neutron plugin which owns the resource
+    """
+
+    def __init__(self, name, tf_type, fields,
+                 plugin_type=plugin_constants.CORE):
+        self.name = name
+        self.tf_type = tf_type
+        self.fields = fields
+        self.plugin_type = plugin_type
+
+    @property
+    def collection(self):
+        return self.name + 's'
+
+    def is_managed(self, neutron_obj):
+        """Check if the resource is sent to TF by the plugin."""
+        return True
+
+    def is_tf_internal(self, tf_obj):
+        """Check if TF object was created by TF, not by Neutron."""
+        return False
+
+    def get_project_id(self, tf_obj):
+        """Get Neutron project ID of TF object, None if it has none."""
+        if tf_obj.get('parent_type') == 'project':
+            project_uuid = tf_obj.get('parent_uuid')
+        else:
+            refs = tf_obj.get('project_refs') or []
+            project_uuid = refs[0].get('uuid') if refs else None
+        return project_uuid.replace('-', '') if project_uuid else None
+
+    def prepare(self, neutron_obj):
+        """Translate Neutron resource to form sent to TF."""
+        return neutron_obj
+
+    def content_hash(self, obj):
+        content = [(field, _normalize(obj.get(field)))
+                   for field in self.fields]
+        return hashlib.sha1(repr(content).encode('utf-8')).hexdigest()
+
+
+class NetworkType(ResourceType):
+    def is_tf_internal(self, tf_obj):
+        fq_name = tf_obj.get('fq_name', [])
+        return (len(fq_name) < 3 or fq_name[1] == 'default-project' or
+                fq_name[-1].startswith(SNAT_NETWORK_PREFIX))
+
+
+class PortType(ResourceType):
+    def is_managed(self, neutron_obj):
+        device_owner = neutron_obj.get('device_owner')
+        return device_owner not in mech_driver.OMIT_DEVICES_TYPES
+
+    def is_tf_internal(self, tf_obj):
+        properties = tf_obj.get('virtual_machine_interface_properties') or {}
+        return (bool(properties.get('service_interface_type')) or
+                tf_obj.get('fq_name', [''])[-1].startswith(DM_VMI_PREFIX))
+
+
+class SecurityGroupType(ResourceType):
+    def is_tf_internal(self, tf_obj):
+        fq_name = tf_obj.get('fq_name', [])
+        return fq_name[-1:] == ['default'] or 'default-project' in fq_name
+
+    def prepare(self, neutron_obj):
+        # vnc_openstack does not allow to create default security group,
+        # so it is renamed in the same way as mechanism driver does.
+        if neutron_obj.get('name') == 'default':
+            neutron_obj = dict(neutron_obj,
+                               name='default-openstack',
+                               description='default-openstack security '
+                                           'group')
+        return neutron_obj
+
+
+NETWORK = NetworkType(
+    'network', 'virtual-network',
+    ['name', 'admin_state_up', 'shared', 'router:external'])
+SUBNET = ResourceType(
+    'subnet', None,
+    ['name', 'cidr', 'gateway_ip', 'enable_dhcp', 'host_routes',
+     'dns_nameservers'])
+SECURITY_GROUP = SecurityGroupType(
+    'security_group', 'security-group', ['name', 'description'])
+PORT = PortType(
+    'port', 'virtual-machine-interface',
+    ['name', 'admin_state_up', 'mac_address', 'fixed_ips', 'device_id',
+     'device_owner', 'security_groups'])
+ROUTER = ResourceType(
+    'router', 'logical-router', ['name', 'admin_state_up'],
+    plugin_type=plugin_constants.L3)
+FLOATINGIP = ResourceType(
+    'floatingip', 'floating-ip',
+    ['floating_ip_address', 'port_id', 'fixed_ip_address'],
+    plugin_type=plugin_constants.L3)
+
+# Order in which resources are created. Orphans are deleted in reverse order.
+RESOURCE_TYPES = [NETWORK, SUBNET, SECURITY_GROUP, PORT, ROUTER, FLOATINGIP]
+
+
+class Reconciler(object):
+    """Find and repair differences between Neutron and Tungsten Fabric.
+
+    Resources are streamed from both sides in pages sorted by UUID, so
+    memory usage does not depend on number of resources. A page of Neutron
+    resources is compared with TF by UUID and hash of compared attributes,
+    and only missing or different resources are sent to TF. When finding
+    orphans is enabled, TF objects are streamed from TF REST API and
+    reported as orphans when they do not exist in Neutron. Only objects
+    owned by Neutron are considered: created by Neutron according to
+    their id_perms, in a project which has resources in Neutron. Found
+    orphans are deleted only by delete_orphans(). Subnets are not
+    separate objects in TF, so orphaned subnets are removed only together
+    with networks.
+    """
+
+    def __init__(self, page_size=500, dry_run=False, find_orphans=False):
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.find_orphans = find_orphans
+        self.orphans = []
+        self.projects = set()
+        self.driver = drv.OpenContrailDrivers()
+        self.rest_driver = rest_driver.ContrailRestApiDriver()
+
+    def reconcile(self, context, resource_types=None):
+        resource_types = resource_types or RESOURCE_TYPES
+        report = collections.OrderedDict(
+            (resource_type.name, collections.Counter())
+            for resource_type in resource_types)
+
+        for resource_type in resource_types:
+            if not self._get_plugin(resource_type):
+                LOG.info("Plugin for %s is not loaded, skipping",
+                         resource_type.collection)
+                continue
+            for page in self._iter_neutron_pages(context, resource_type):
+                self._sync_page(context, resource_type, page,
+                                report[resource_type.name])
+
+        if self.find_orphans:
+            for resource_type in reversed(resource_types):
+                if not resource_type.tf_type or not self._get_plugin(
+                        resource_type):
+                    continue
+                for page in self._iter_tf_pages(resource_type):
+                    self._find_orphans(context, resource_type, page,
+                                       report[resource_type.name])
+
+        return report
+
+    def delete_orphans(self, context, report):
+        """Delete orphans found by reconcile(), in reverse order of types."""
+        for resource_type, tf_obj in self.orphans:
+            self._apply(context, resource_type, 'delete',
+                        {'id': tf_obj['uuid']}, report[resource_type.name])
+        self.orphans = []
+
+    def _sync_page(self, context, resource_type, neutron_objs, stats):
+        ids = [obj['id'] for obj in neutron_objs]
+        list_tf = getattr(self.driver, 'get_%s' % resource_type.collection)
+        tf_hashes = dict(
+            (tf_obj['id'], resource_type.content_hash(tf_obj))
+            for tf_obj in list_tf(context, filters={'id': ids},
+                                  fields=['id'] + resource_type.fields))
+
+        missing = []
+        for neutron_obj in neutron_objs:
+            neutron_obj = resource_type.prepare(neutron_obj)
+            tf_hash = tf_hashes.get(neutron_obj['id'])
+            if tf_hash is None:
+                missing.append(neutron_obj)
+            elif tf_hash != resource_type.content_hash(neutron_obj):
+                self._apply(context, resource_type, 'update', neutron_obj,
+                            stats)
+            else:
+                stats['in_sync'] += 1
+        self._create_missing(context, resource_type, missing, stats)
+
+    def _create_missing(self, context, resource_type, objs, stats):
+        """Create resources of a page in one batch, when TF driver can."""
+        name = resource_type.name
+        create_bulk = getattr(self.driver, 'create_%s_bulk' % name, None)
+        if create_bulk is None or self.dry_run or len(objs) < 2:
+            for obj in objs:
+                self._apply(context, resource_type, 'create', obj, stats)
+            return
+
+        for obj in objs:
+            LOG.info("Create %s %s in TF", name, obj['id'])
+        try:
+            results = create_bulk(context, {resource_type.collection: [
+                {name: obj} for obj in objs]})
+        except Exception:
+            LOG.exception("Failed to create %s in TF",
+                          resource_type.collection)
+            stats['failed'] += len(objs)
+            return
+
+        for obj, result in zip(objs, results):
+            if isinstance(result, Exception):
+                LOG.error("Failed to create %(name)s %(id)s in TF: %(err)s",
+                          {'name': name, 'id': obj['id'], 'err': result})
+                stats['failed'] += 1
+            else:
+                stats['created'] += 1
+
+    def _is_neutron_owned(self, resource_type, tf_obj):
+        if resource_type.is_tf_internal(tf_obj):
+            return False
+        creator = (tf_obj.get('id_perms') or {}).get('creator')
+        if creator not in NEUTRON_CREATORS:
+            return False
+        # Projects are learned from resources listed from Neutron, every
+        # project used with Neutron has at least its default security
+        # group there.
+        return resource_type.get_project_id(tf_obj) in self.projects
+
+    def _find_orphans(self, context, resource_type, tf_objs, stats):
+        candidates = collections.OrderedDict(
+            (tf_obj['uuid'], tf_obj) for tf_obj in tf_objs
+            if self._is_neutron_owned(resource_type, tf_obj))
+        if not candidates:
+            return
+        list_neutron = getattr(self._get_plugin(resource_type),
+                               'get_%s' % resource_type.collection)
+        existing = set(obj['id'] for obj in list_neutron(
+            context, filters={'id': list(candidates)}, fields=['id']))
+
+        for uuid, tf_obj in candidates.items():
+            if uuid not in existing:
+                LOG.info("Orphaned %s %s found in TF", resource_type.name,
+                         uuid)
+                self.orphans.append((resource_type, tf_obj))
+                stats['orphaned'] += 1
+
+    def _apply(self, context, resource_type, action, obj, stats):
+        LOG.info("%s %s %s in TF%s", action.capitalize(), resource_type.name,
+                 obj['id'], " (dry run)" if self.dry_run else "")
+        if self.dry_run:
+            stats[COUNTERS[action]] += 1
+            return
+
+        name = resource_type.name
+        try:
+            if action == 'create':
+                getattr(self.driver, 'create_%s' % name)(
+                    context, {name: obj})
+            elif action == 'update':
+                getattr(self.driver, 'update_%s' % name)(
+                    context, obj['id'], {name: obj})
+            else:
+                getattr(self.driver, 'delete_%s' % name)(context, obj['id'])
+            stats[COUNTERS[action]] += 1
+        except Exception:
+            LOG.exception("Failed to %s %s %s in TF", action, name,
+                          obj['id'])
+            stats['failed'] += 1
+
+    def _iter_neutron_pages(self, context, resource_type):
+        list_neutron = getattr(self._get_plugin(resource_type),
+                               'get_%s' % resource_type.collection)
+        marker = None
+        while True:
+            page = list_neutron(context, sorts=[('id', True)],
+                                limit=self.page_size, marker=marker)
+            self.projects.update(obj.get('tenant_id') for obj in page
+                                 if obj.get('tenant_id'))
+            managed = [obj for obj in page if resource_type.is_managed(obj)]
+            if managed:
+                yield managed
+            if len(page) < self.page_size:
+                return
+            marker = page[-1]['id']
+
+    def _iter_tf_pages(self, resource_type):
+        marker = None
+        while True:
+            query = {'detail': True, 'page_limit': self.page_size}
+            if marker:
+                query['page_marker'] = marker
+            status_code, response = self.rest_driver.list_resource(
+                resource_type.tf_type, query)
+            if status_code != http_status.ok:
+                LOG.error("Cannot list %s from TF: %s",
+                          resource_type.tf_type, response)
+                return
+
+            page = [item[resource_type.tf_type]
+                    for item in response.get(resource_type.tf_type + 's', [])]
+            if page:
+                yield page
+            marker = response.get('marker')
+            if not marker or len(page) < self.page_size:
+                return
+
+    @staticmethod
+    def _get_plugin(resource_type):
+        return directory.get_plugin(resource_type.plugin_type)
+
+
+def _normalize(value):
+    """Make comparable form of a value, ignoring order of lists."""
+    if isinstance(value, dict):
+        return sorted((key, _normalize(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sorted((_normalize(item) for item in value),
+                      key=jsonutils.dumps)
+    return value
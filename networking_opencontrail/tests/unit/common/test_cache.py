@@ -0,0 +1,71 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import mock
+
+from networking_opencontrail.common import cache
+from networking_opencontrail.tests import base
+
+
+class LRUCacheTestCase(base.TestCase):
+    def test_get_and_set(self):
+        lru = cache.LRUCache(max_size=2)
+
+        self.assertIs(cache.MISSING, lru.get('a'))
+        lru.set('a', 1)
+
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                         lru.get_stats())
+
+    def test_least_recently_used_is_evicted(self):
+        lru = cache.LRUCache(max_size=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+
+        lru.set('c', 3)
+
+        self.assertIs(cache.MISSING, lru.get('b'))
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual(1, lru.get_stats()['evictions'])
+
+    def test_entry_expires(self):
+        lru = cache.LRUCache(max_size=2, ttl=10)
+        with mock.patch('time.time', return_value=100.0):
+            lru.set('a', 1)
+            lru.set('b', 2, ttl=30)
+
+        with mock.patch('time.time', return_value=120.0):
+            self.assertIs(cache.MISSING, lru.get('a'))
+            self.assertEqual(2, lru.get('b'))
+
+    def test_disabled_cache_stores_nothing(self):
+        lru = cache.LRUCache(max_size=0)
+
+        lru.set('a', 1)
+
+        self.assertIs(cache.MISSING, lru.get('a'))
+
+    def test_invalidate_matching(self):
+        lru = cache.LRUCache(max_size=3)
+        lru.set(('vn', 1), 1)
+        lru.set(('vn', 2), 2)
+        lru.set(('vmi', 1), 3)
+
+        lru.invalidate_matching(lambda key: key[0] == 'vn')
+
+        self.assertEqual(1, len(lru))
+        self.assertEqual(3, lru.get(('vmi', 1)))
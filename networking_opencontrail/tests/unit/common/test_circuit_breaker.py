@@ -0,0 +1,122 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import mock
+import requests
+
+from neutron.tests import base
+
+from networking_opencontrail.common import circuit_breaker
+
+
+class CircuitBreakerTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.breaker = circuit_breaker.CircuitBreaker(
+            'test', failure_threshold=2, reset_timeout=30.0)
+        self.failing = mock.Mock(
+            side_effect=requests.exceptions.ConnectionError())
+
+    def _fail(self, times):
+        for _ in range(times):
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              self.breaker.call, self.failing)
+
+    @mock.patch('time.time', return_value=100.0)
+    def test_opens_after_threshold(self, _):
+        self._fail(2)
+
+        self.assertEqual(circuit_breaker.OPEN, self.breaker.state)
+        self.assertRaises(circuit_breaker.CircuitOpenError,
+                          self.breaker.call, self.failing)
+        self.assertEqual(2, self.failing.call_count)
+        self.assertEqual({'failures': 2, 'trips': 1, 'rejected': 1,
+                          'state': circuit_breaker.OPEN},
+                         self.breaker.get_stats())
+
+    def test_success_resets_failures(self):
+        self._fail(1)
+        self.breaker.call(mock.Mock())
+        self._fail(1)
+
+        self.assertEqual(circuit_breaker.CLOSED, self.breaker.state)
+
+    def test_error_responses_are_not_failures(self):
+        failing = mock.Mock(side_effect=ValueError())
+
+        for _ in range(3):
+            self.assertRaises(ValueError, self.breaker.call, failing)
+
+        self.assertEqual(circuit_breaker.CLOSED, self.breaker.state)
+
+    def test_half_open_trial_success_closes(self):
+        with mock.patch('time.time', return_value=100.0):
+            self._fail(2)
+        with mock.patch('time.time', return_value=130.0):
+            self.assertEqual(circuit_breaker.HALF_OPEN, self.breaker.state)
+            self.assertEqual('ok', self.breaker.call(lambda: 'ok'))
+
+        self.assertEqual(circuit_breaker.CLOSED, self.breaker.state)
+
+    def test_half_open_trial_failure_opens_again(self):
+        with mock.patch('time.time', return_value=100.0):
+            self._fail(2)
+        with mock.patch('time.time', return_value=130.0):
+            self._fail(1)
+            self.assertEqual(circuit_breaker.OPEN, self.breaker.state)
+            self.assertFalse(self.breaker.allow_request())
+
+        self.assertEqual(2, self.breaker.get_stats()['trips'])
+
+    def test_half_open_trial_other_error_closes(self):
+        with mock.patch('time.time', return_value=100.0):
+            self._fail(2)
+        with mock.patch('time.time', return_value=130.0):
+            self.assertRaises(RuntimeError, self.breaker.call,
+                              mock.Mock(side_effect=RuntimeError()))
+            self.assertEqual(circuit_breaker.CLOSED, self.breaker.state)
+            self.assertEqual('ok', self.breaker.call(lambda: 'ok'))
+
+    def test_half_open_limits_trials(self):
+        with mock.patch('time.time', return_value=100.0):
+            self._fail(2)
+        with mock.patch('time.time', return_value=130.0):
+            self.assertTrue(self.breaker.allow_request())
+            self.assertFalse(self.breaker.allow_request())
+
+    def test_disabled_never_opens(self):
+        self.breaker.enabled = False
+
+        self._fail(3)
+
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(3, self.failing.call_count)
+
+
+class GetCircuitBreakerTestCase(base.BaseTestCase):
+    @mock.patch('networking_opencontrail.common.circuit_breaker.cfg')
+    def test_breaker_shared_until_config_changes(self, config):
+        conf = config.CONF.CIRCUIT_BREAKER
+        conf.enabled = True
+        conf.failure_threshold = 5
+        conf.reset_timeout = 30.0
+        conf.half_open_max_calls = 1
+
+        breaker = circuit_breaker.get_circuit_breaker('api')
+        self.assertIs(breaker, circuit_breaker.get_circuit_breaker('api'))
+        self.assertIn('api', circuit_breaker.get_stats())
+
+        conf.failure_threshold = 3
+        breaker = circuit_breaker.get_circuit_breaker('api')
+        self.assertEqual(3, breaker.failure_threshold)
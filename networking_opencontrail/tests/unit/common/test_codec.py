@@ -0,0 +1,88 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import datetime
+
+import ddt
+import mock
+
+from neutron.tests import base
+
+from networking_opencontrail.common import codec
+
+PAYLOAD = {'context': {'operation': 'READALL', 'is_admin': True},
+           'data': [{'id': 'port-1', 'name': u'pórt',
+                     'fixed_ips': [{'ip_address': '10.0.0.3'}],
+                     'mtu': 1500, 'created_at': None}]}
+
+
+@ddt.ddt
+class CodecTestCase(base.BaseTestCase):
+    @ddt.data(*codec.CODECS.values())
+    def test_round_trip_from_bytes(self, json_codec):
+        data = json_codec.dumps(PAYLOAD)
+
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(PAYLOAD, json_codec.loads(data))
+
+    @ddt.data(*codec.CODECS.values())
+    def test_dumps_non_json_types(self, json_codec):
+        data = json_codec.dumps({'at': datetime.datetime(2019, 1, 2)})
+
+        self.assertIn(b'2019-01-02', data)
+
+    @ddt.data(*codec.CODECS.values())
+    def test_loads_invalid_document(self, json_codec):
+        self.assertRaises(ValueError, json_codec.loads, b'<html>')
+        self.assertRaises(ValueError, json_codec.loads, b'')
+        self.assertRaises(ValueError, json_codec.loads, None)
+
+    def test_get_codec_by_name(self):
+        self.assertIsInstance(codec.get_codec('stdlib'), codec.StdlibCodec)
+
+    @mock.patch.dict(codec.CODECS, clear=True,
+                     values={'stdlib': codec.StdlibCodec()})
+    def test_get_codec_falls_back_when_not_installed(self):
+        self.assertEqual('stdlib', codec.get_codec('orjson').name)
+        self.assertEqual('stdlib', codec.get_codec('auto').name)
+
+
+@ddt.ddt
+class IterArrayTestCase(base.BaseTestCase):
+    @ddt.data(1, 3, 7, 1024)
+    def test_iter_array_in_chunks(self, chunk_size):
+        items = PAYLOAD['data'] * 3 + [42, u'text', [], None]
+        data = codec.StdlibCodec().dumps(items)
+        chunks = [data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size)]
+
+        self.assertEqual(items, list(codec.iter_array(chunks)))
+
+    def test_iter_array_is_lazy(self):
+        chunks = iter([b'[{"id": 1},', b' {"id": 2}, {"id"'])
+
+        items = codec.iter_array(chunks)
+
+        self.assertEqual({'id': 1}, next(items))
+        self.assertEqual({'id': 2}, next(items))
+        self.assertRaises(ValueError, next, items)
+
+    def test_iter_array_empty(self):
+        self.assertEqual([], list(codec.iter_array([b' [ ', b'] '])))
+
+    @ddt.data([b'{"id": 1}'], [], [b'[1, 2'], [b'[{"id": 1} {"id": 2}]'],
+              [b'[{"id": 1}', b' "a"]'], [b'[1,, 2]'], [b'[, 1]'],
+              [b'[1, ]'])
+    def test_iter_array_invalid_document(self, chunks):
+        self.assertRaises(ValueError, list, codec.iter_array(chunks))
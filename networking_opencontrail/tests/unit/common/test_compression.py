@@ -0,0 +1,99 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import gzip
+import io
+import zlib
+
+import ddt
+import mock
+
+from neutron.tests import base
+
+from networking_opencontrail.common import compression
+
+DATA = b'{"port": {"fixed_ips": [' + b', '.join(
+    b'{"ip_address": "10.0.0.%d"}' % i for i in range(200)) + b']}}'
+
+
+@ddt.ddt
+class CompressionTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(CompressionTestCase, self).setUp()
+        conf_patcher = mock.patch('oslo_config.cfg.CONF')
+        self.conf = conf_patcher.start().APISERVER
+        self.addCleanup(conf_patcher.stop)
+        self.conf.request_compression = compression.GZIP
+        self.conf.compression_threshold = 1024
+        self.conf.compression_level = 6
+        stats_patcher = mock.patch.object(compression, 'stats',
+                                          compression.collections.Counter())
+        stats_patcher.start()
+        self.addCleanup(stats_patcher.stop)
+
+    def test_compress_request_gzip(self):
+        headers = {}
+
+        data = compression.compress_request(DATA, headers)
+
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        self.assertEqual(DATA, gzip.GzipFile(fileobj=io.BytesIO(data)).read())
+        self.assertEqual(
+            {'compressed_requests': 1,
+             'request_bytes_saved': len(DATA) - len(data)},
+            compression.get_stats())
+
+    def test_compress_request_deflate(self):
+        self.conf.request_compression = compression.DEFLATE
+        headers = {}
+
+        data = compression.compress_request(DATA.decode('utf-8'), headers)
+
+        self.assertEqual('deflate', headers['Content-Encoding'])
+        self.assertEqual(DATA, zlib.decompress(data))
+
+    @ddt.data((compression.NONE, 0), (compression.GZIP, 1000000))
+    @ddt.unpack
+    def test_request_not_compressed(self, encoding, threshold):
+        self.conf.request_compression = encoding
+        self.conf.compression_threshold = threshold
+        headers = {}
+
+        self.assertIs(DATA, compression.compress_request(DATA, headers))
+        self.assertEqual({}, headers)
+        self.assertEqual({}, compression.get_stats())
+
+    def test_request_without_body_not_compressed(self):
+        headers = {}
+
+        self.assertIsNone(compression.compress_request(None, headers))
+        self.assertEqual({}, headers)
+
+    def test_record_response(self):
+        response = mock.Mock(headers={'Content-Encoding': 'gzip'},
+                             content=DATA)
+        response.raw.tell.return_value = 100
+
+        compression.record_response(response)
+
+        self.assertEqual({'compressed_responses': 1,
+                          'response_bytes_saved': len(DATA) - 100},
+                         compression.get_stats())
+
+    def test_record_uncompressed_response(self):
+        response = mock.Mock(headers={}, content=DATA)
+
+        compression.record_response(response)
+
+        self.assertEqual({}, compression.get_stats())
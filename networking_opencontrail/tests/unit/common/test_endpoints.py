@@ -0,0 +1,173 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import mock
+import requests
+from urllib3 import exceptions as urllib3_exc
+
+from neutron.tests import base
+
+from networking_opencontrail.common import endpoints
+
+
+class EndpointPoolTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(EndpointPoolTestCase, self).setUp()
+        self.pool = endpoints.EndpointPool(['10.0.0.1', '10.0.0.2'], 8082)
+        self.pool._ensure_prober = mock.Mock()
+
+    def test_get_ordered_prefers_healthy_endpoints(self):
+        self.pool.endpoints[0].healthy = False
+
+        for _ in range(3):
+            ordered = self.pool.get_ordered()
+            self.assertEqual(['10.0.0.2', '10.0.0.1'],
+                             [endpoint.host for endpoint in ordered])
+
+    def test_get_ordered_prefers_least_outstanding(self):
+        self.pool.endpoints[1].outstanding = 2
+
+        for _ in range(3):
+            ordered = self.pool.get_ordered()
+            self.assertEqual('10.0.0.1', ordered[0].host)
+
+    def test_get_ordered_rotates_idle_endpoints(self):
+        first = [self.pool.get_ordered()[0].host for _ in range(4)]
+
+        self.assertEqual(['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.2'],
+                         first)
+
+    def test_request_fails_over_on_connection_error(self):
+        def send(endpoint):
+            if endpoint.host == '10.0.0.1':
+                raise requests.exceptions.ConnectionError(
+                    urllib3_exc.MaxRetryError(
+                        None, '/path',
+                        urllib3_exc.NewConnectionError(None, 'refused')))
+            return endpoint.make_url('http', '/path')
+
+        result = self.pool.request(send)
+
+        self.assertEqual('http://10.0.0.2:8082/path', result)
+        self.assertFalse(self.pool.endpoints[0].healthy)
+        self.assertTrue(self.pool.endpoints[1].healthy)
+        self.assertEqual(0, self.pool.endpoints[0].outstanding)
+
+    def test_request_fails_over_on_connect_timeout(self):
+        send = mock.Mock(side_effect=[requests.exceptions.ConnectTimeout(),
+                                      'response'])
+
+        self.assertEqual('response', self.pool.request(send))
+        self.assertEqual(2, send.call_count)
+
+    def test_request_does_not_repeat_sent_request(self):
+        send = mock.Mock(side_effect=requests.exceptions.ConnectionError(
+            'Connection reset by peer'))
+
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          self.pool.request, send)
+        send.assert_called_once()
+        self.assertFalse(self.pool.endpoints[0].healthy)
+
+    def test_request_repeats_idempotent_request(self):
+        send = mock.Mock(side_effect=[requests.exceptions.ConnectionError(
+            'Connection reset by peer'), 'response'])
+
+        self.assertEqual('response',
+                         self.pool.request(send, idempotent=True))
+        self.assertEqual(2, send.call_count)
+
+    def test_request_does_not_fail_over_on_other_errors(self):
+        send = mock.Mock(side_effect=requests.exceptions.ReadTimeout())
+
+        self.assertRaises(requests.exceptions.ReadTimeout,
+                          self.pool.request, send)
+        send.assert_called_once()
+
+    def test_request_raises_when_all_endpoints_fail(self):
+        send = mock.Mock(side_effect=requests.exceptions.ConnectTimeout())
+
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          self.pool.request, send)
+        self.assertEqual(2, send.call_count)
+
+    def test_request_raises_when_no_endpoints(self):
+        pool = endpoints.EndpointPool([], 8082)
+        send = mock.Mock()
+
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          pool.request, send)
+        send.assert_not_called()
+
+    @mock.patch('networking_opencontrail.common.endpoints.cfg')
+    @mock.patch('networking_opencontrail.common.endpoints.requests.get')
+    def test_probe_restores_endpoint(self, get, _):
+        endpoint = self.pool.endpoints[0]
+        endpoint.healthy = False
+
+        self.assertTrue(self.pool.probe(endpoint, 'http'))
+        self.assertTrue(endpoint.healthy)
+        get.assert_called_once_with('http://10.0.0.1:8082', verify=True,
+                                    cert=None, timeout=mock.ANY)
+
+    @mock.patch('networking_opencontrail.common.endpoints.cfg')
+    @mock.patch('networking_opencontrail.common.endpoints.requests.get')
+    def test_probe_uses_tls_options(self, get, _):
+        pool = endpoints.EndpointPool(['10.0.0.1'], 8082,
+                                      verify='/etc/ca.pem',
+                                      cert=('/etc/c.pem', '/etc/k.pem'))
+
+        pool.probe(pool.endpoints[0], 'https')
+
+        get.assert_called_once_with('https://10.0.0.1:8082',
+                                    verify='/etc/ca.pem',
+                                    cert=('/etc/c.pem', '/etc/k.pem'),
+                                    timeout=mock.ANY)
+
+    @mock.patch('networking_opencontrail.common.endpoints.cfg')
+    @mock.patch('networking_opencontrail.common.endpoints.requests.get')
+    def test_probe_marks_endpoint_unhealthy(self, get, _):
+        get.side_effect = requests.exceptions.ConnectionError()
+        endpoint = self.pool.endpoints[0]
+
+        self.assertFalse(self.pool.probe(endpoint, 'http'))
+        self.assertFalse(endpoint.healthy)
+
+
+class GetEndpointPoolTestCase(base.BaseTestCase):
+    @mock.patch('networking_opencontrail.common.endpoints.cfg')
+    def test_pool_follows_configuration(self, config):
+        config.CONF.APISERVER.api_server_ip = '10.0.0.1, 10.0.0.2'
+        config.CONF.APISERVER.api_server_port = 8082
+
+        pool = endpoints.get_endpoint_pool()
+        self.assertEqual(['10.0.0.1', '10.0.0.2'], pool.hosts)
+        self.assertIs(pool, endpoints.get_endpoint_pool())
+
+        config.CONF.APISERVER.api_server_ip = '10.0.0.3'
+        self.assertEqual(['10.0.0.3'], endpoints.get_endpoint_pool().hosts)
+
+    @mock.patch('networking_opencontrail.common.endpoints.eventlet')
+    @mock.patch('networking_opencontrail.common.endpoints.cfg')
+    def test_rebuilt_pool_stops_prober(self, config, eventlet):
+        config.CONF.APISERVER.api_server_ip = '10.0.0.1, 10.0.0.2'
+        config.CONF.APISERVER.api_server_port = 8082
+        pool = endpoints.get_endpoint_pool()
+        pool.request(mock.Mock())
+        prober = eventlet.spawn.return_value
+
+        config.CONF.APISERVER.api_server_ip = '10.0.0.3, 10.0.0.4'
+        endpoints.get_endpoint_pool()
+
+        prober.kill.assert_called_once_with()
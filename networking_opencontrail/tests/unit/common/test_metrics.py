@@ -0,0 +1,173 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import os
+import shutil
+import tempfile
+
+import mock
+
+from neutron.tests import base
+
+from networking_opencontrail.common import metrics
+
+KEY = ('neutron', 'port', 'CREATE')
+
+
+class HistogramTestCase(base.BaseTestCase):
+    def test_observe(self):
+        histogram = metrics.Histogram((1, 10))
+
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+
+        self.assertEqual([(1, 2), (10, 3), (float('inf'), 4)],
+                         list(histogram.cumulative_counts()))
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(56.5, histogram.sum)
+
+
+class MetricsTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(MetricsTestCase, self).setUp()
+        conf_patcher = mock.patch('oslo_config.cfg.CONF')
+        self.conf = conf_patcher.start().METRICS
+        self.addCleanup(conf_patcher.stop)
+        self.conf.enabled = True
+        self.conf.exporter = None
+        # Slot of the worker is acquired again in every test directory.
+        slot_patcher = mock.patch.object(metrics, '_worker_slot', None)
+        slot_patcher.start()
+        self.addCleanup(slot_patcher.stop)
+        self.registry = metrics.Registry()
+        registry_patcher = mock.patch.object(metrics, 'get_registry',
+                                             return_value=self.registry)
+        registry_patcher.start()
+        self.addCleanup(registry_patcher.stop)
+
+    def test_measure_status(self):
+        with metrics.measure(*KEY, request_size=100) as measurement:
+            measurement.status = 200
+            measurement.response_size = 2000
+
+        self.assertEqual(1, self.registry.latency[KEY].count)
+        self.assertEqual(100, self.registry.request_size[KEY].sum)
+        self.assertEqual(2000, self.registry.response_size[KEY].sum)
+        self.assertEqual({KEY + ('200',): 1}, self.registry.responses)
+
+    def test_measure_exception(self):
+        def request():
+            with metrics.measure(*KEY):
+                raise ValueError()
+
+        self.assertRaises(ValueError, request)
+        self.assertEqual({KEY + ('ValueError',): 1}, self.registry.responses)
+        self.assertNotIn(KEY, self.registry.request_size)
+
+    def test_measure_disabled(self):
+        self.conf.enabled = False
+
+        with metrics.measure(*KEY) as measurement:
+            measurement.status = 200
+
+        self.assertEqual({}, self.registry.latency)
+        self.assertEqual({}, self.registry.responses)
+
+    def test_render_prometheus(self):
+        self.registry.observe(KEY, 0.02, 200, request_size=300)
+        self.registry.providers = {
+            'circuit_breaker': lambda: {'api_server': {'trips': 2,
+                                                       'state': 'open'}}}
+
+        lines = self.registry.render_prometheus(worker=7).splitlines()
+
+        labels = 'action="CREATE",client="neutron",resource="port",worker="7"'
+        self.assertIn('# TYPE networking_opencontrail_request_duration_seconds'
+                      ' histogram', lines)
+        self.assertIn('networking_opencontrail_request_duration_seconds_'
+                      'bucket{action="CREATE",client="neutron",le="0.01",'
+                      'resource="port",worker="7"} 0', lines)
+        self.assertIn('networking_opencontrail_request_duration_seconds_'
+                      'bucket{action="CREATE",client="neutron",le="+Inf",'
+                      'resource="port",worker="7"} 1', lines)
+        self.assertIn('networking_opencontrail_request_size_bytes_count{%s} 1'
+                      % labels, lines)
+        self.assertIn('networking_opencontrail_responses_total{action='
+                      '"CREATE",client="neutron",resource="port",status="200",'
+                      'worker="7"} 1', lines)
+        self.assertIn('networking_opencontrail_circuit_breaker_api_server_'
+                      'trips{worker="7"} 2', lines)
+        self.assertNotIn('response_size', '\n'.join(lines))
+
+    def test_send_statsd(self):
+        self.conf.exporter = metrics.STATSD
+        for _ in range(100):
+            self.registry.observe(KEY, 0.25, 404)
+
+        with mock.patch('socket.socket') as socket:
+            metrics.send_statsd(self.registry, 'statsd', 8125, 'neutron')
+
+        sendto = socket.return_value.sendto
+        self.assertGreater(sendto.call_count, 1)
+        lines = b'\n'.join(call[0][0]
+                           for call in sendto.call_args_list).splitlines()
+        self.assertEqual(200, len(lines))
+        self.assertIn(b'neutron.neutron.port.CREATE.duration:250.000|ms',
+                      lines)
+        self.assertIn(b'neutron.neutron.port.CREATE.status.404:1|c', lines)
+        sendto.assert_called_with(mock.ANY, ('statsd', 8125))
+        self.assertEqual(0, len(self.registry.statsd_samples))
+
+    def test_write_prometheus_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.registry.observe(KEY, 0.02, 200)
+
+        metrics.write_prometheus_file(self.registry, directory)
+
+        path = os.path.join(directory, 'networking_opencontrail_0.prom')
+        self.assertEqual(['networking_opencontrail_0.lock',
+                          'networking_opencontrail_0.prom'],
+                         sorted(os.listdir(directory)))
+        with open(path) as prom_file:
+            self.assertEqual(self.registry.render_prometheus(0),
+                             prom_file.read())
+
+    def test_write_prometheus_file_removes_stale_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name in ('networking_opencontrail_4242.prom',
+                     'networking_opencontrail_1.prom',
+                     'networking_opencontrail_1.lock'):
+            open(os.path.join(directory, name), 'w').close()
+
+        metrics.write_prometheus_file(self.registry, directory)
+
+        self.assertEqual(['networking_opencontrail_0.lock',
+                          'networking_opencontrail_0.prom',
+                          'networking_opencontrail_1.lock'],
+                         sorted(os.listdir(directory)))
+
+    def test_write_prometheus_file_skips_taken_slot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        taken = mock.patch.object(
+            metrics, '_lock_slot',
+            side_effect=[None, os.open(os.devnull, os.O_RDONLY)])
+
+        with taken, mock.patch.object(metrics, '_remove_stale_files'):
+            metrics.write_prometheus_file(self.registry, directory)
+
+        self.assertTrue(os.path.exists(
+            os.path.join(directory, 'networking_opencontrail_1.prom')))
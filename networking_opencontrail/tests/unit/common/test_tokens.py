@@ -0,0 +1,148 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import eventlet
+from keystoneauth1 import exceptions as ks_exceptions
+import mock
+
+from neutron.tests import base
+
+from networking_opencontrail.common import tokens
+
+
+class TokenManagerTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(TokenManagerTestCase, self).setUp()
+        self.auth = mock.Mock()
+        self.auth.get_access.side_effect = self._get_access
+        self.issued = 0
+        self.expiring = False
+        self.manager = tokens.TokenManager(self.auth, refresh_margin=300)
+
+    def _get_access(self, session):
+        self.issued += 1
+        access = mock.Mock(auth_token='token-%d' % self.issued)
+        access.will_expire_soon.side_effect = lambda **kw: self.expiring
+        return access
+
+    def test_token_is_reused(self):
+        self.assertEqual('token-1', self.manager.get_token())
+        self.assertEqual('token-1', self.manager.get_token())
+
+        self.assertEqual(1, self.auth.get_access.call_count)
+        self.assertEqual({'refreshes': 1}, self.manager.get_stats())
+
+    def test_token_refreshed_before_expiry(self):
+        self.manager.get_token()
+        self.expiring = True
+
+        self.assertEqual('token-2', self.manager.get_token())
+        self.auth.invalidate.assert_called()
+
+    def test_single_flight_refresh(self):
+        def get_access(session):
+            eventlet.sleep(0.01)
+            return self._get_access(session)
+        self.auth.get_access.side_effect = get_access
+
+        pool = eventlet.GreenPool()
+        results = list(pool.imap(lambda _: self.manager.get_token(),
+                                 range(5)))
+
+        self.assertEqual(['token-1'] * 5, results)
+        self.assertEqual(1, self.auth.get_access.call_count)
+
+    def test_invalidate_current_token(self):
+        self.manager.get_token()
+
+        self.manager.invalidate('token-1')
+
+        self.assertEqual('token-2', self.manager.get_token())
+
+    def test_invalidate_ignores_stale_token(self):
+        self.manager.get_token()
+        self.manager.invalidate('token-1')
+        self.manager.get_token()
+
+        self.manager.invalidate('token-1')
+
+        self.assertEqual('token-2', self.manager.get_token())
+        self.assertEqual(2, self.auth.get_access.call_count)
+
+    def test_authentication_failure(self):
+        self.auth.get_access.side_effect = ks_exceptions.Unauthorized()
+
+        self.assertRaises(RuntimeError, self.manager.get_token)
+        self.assertEqual({'failures': 1}, self.manager.get_stats())
+
+    def test_current_token_is_lazy(self):
+        self.assertIsNone(self.manager.current_token())
+        self.assertEqual(0, self.issued)
+
+        self.manager.get_token()
+
+        self.assertEqual('token-1', self.manager.current_token())
+
+    def test_static_token_until_rejected(self):
+        manager = tokens.TokenManager(self.auth, static_token='admin')
+
+        self.assertEqual('admin', manager.current_token())
+        manager.invalidate('admin')
+
+        self.assertIsNone(manager.current_token())
+        self.assertEqual('token-1', manager.get_token())
+        self.assertEqual(1, self.issued)
+
+
+class GetTokenManagerTestCase(base.BaseTestCase):
+    @mock.patch('networking_opencontrail.common.tokens.cfg')
+    def test_no_manager_without_keystone(self, config):
+        config.CONF.auth_strategy = 'noauth'
+
+        self.assertIsNone(tokens.get_token_manager())
+
+    @mock.patch('networking_opencontrail.common.tokens.cfg')
+    def test_manager_uses_keystone_v3(self, config):
+        config.CONF.auth_strategy = 'keystone'
+        config.CONF.APISERVER.auth_url = None
+        config.CONF.APISERVER.auth_token_url = None
+        kcfg = config.CONF.keystone_authtoken
+        kcfg.admin_token = None
+        kcfg.auth_protocol = 'https'
+        kcfg.auth_host = 'keystone'
+        kcfg.auth_port = 5000
+        kcfg.insecure = False
+        kcfg.cafile = None
+        kcfg.certfile = None
+
+        manager = tokens.get_token_manager()
+
+        self.assertEqual('https://keystone:5000/v3', manager.auth.auth_url)
+        self.assertIs(manager, tokens.get_token_manager())
+
+    @mock.patch('networking_opencontrail.common.tokens.cfg')
+    def test_manager_uses_deprecated_options(self, config):
+        config.CONF.auth_strategy = 'keystone'
+        config.CONF.APISERVER.auth_url = None
+        config.CONF.APISERVER.auth_token_url = (
+            'http://keystone:35357/v2.0/tokens')
+        kcfg = config.CONF.keystone_authtoken
+        kcfg.admin_token = 'admin'
+        kcfg.insecure = True
+        kcfg.certfile = None
+
+        manager = tokens.get_token_manager()
+
+        self.assertEqual('http://keystone:35357/v2.0', manager.auth.auth_url)
+        self.assertEqual('admin', manager.current_token())
@@ -0,0 +1,133 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from neutron.tests import base
+
+from networking_opencontrail.common import tracing
+
+
+class Handler(object):
+    def __init__(self):
+        self.calls = 0
+
+    @tracing.traced
+    def update_router(self, context, router_id, router):
+        self.calls += 1
+        with tracing.span('tf.neutron', resource='router', action='UPDATE'):
+            self.sync(resource='router', event='after_update',
+                      router={'id': router_id})
+
+    @tracing.traced
+    def sync(self, resource, event, **kwargs):
+        with tracing.span('tf.vnc_api', resource='port', action='READALL'):
+            pass
+
+    @tracing.traced
+    def fail(self, resource, event, payload=None):
+        raise ValueError()
+
+
+class TracingTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(TracingTestCase, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'traces.log')
+        conf_patcher = mock.patch('oslo_config.cfg.CONF')
+        self.conf = conf_patcher.start().TRACING
+        self.addCleanup(conf_patcher.stop)
+        self.conf.enabled = True
+        self.conf.exporter = tracing.FILE
+        self.conf.sample_rate = 1.0
+        self.conf.file_path = self.path
+        self.handler = Handler()
+
+    def _read_traces(self):
+        with open(self.path) as trace_file:
+            return [json.loads(line) for line in trace_file]
+
+    def test_nested_spans(self):
+        self.handler.update_router(mock.Mock(), 'router-1', {'name': 'r'})
+
+        traces = self._read_traces()
+        self.assertEqual(1, len(traces))
+        spans = dict((span['id'], span) for span in traces[0]['spans'])
+        self.assertEqual(4, len(spans))
+        root = spans[1]
+        self.assertTrue(root['name'].endswith('Handler.update_router'))
+        self.assertIsNone(root['parent_id'])
+        self.assertEqual({'router_id': 'router-1'}, root['info'])
+        self.assertEqual(('tf.neutron', 1), (spans[2]['name'],
+                                             spans[2]['parent_id']))
+        self.assertTrue(spans[3]['name'].endswith('Handler.sync'))
+        self.assertEqual({'router_id': 'router-1'}, spans[3]['info'])
+        self.assertEqual(('tf.vnc_api', 3), (spans[4]['name'],
+                                             spans[4]['parent_id']))
+        self.assertGreaterEqual(root['duration'], spans[2]['duration'])
+
+    def test_error_recorded(self):
+        payload = mock.Mock(resource_id='sg-1')
+
+        self.assertRaises(ValueError, self.handler.fail, 'sg', 'delete',
+                          payload=payload)
+
+        span = self._read_traces()[0]['spans'][0]
+        self.assertEqual({'resource_id': 'sg-1', 'error': 'ValueError'},
+                         span['info'])
+
+    def test_not_sampled(self):
+        self.conf.sample_rate = 0.5
+
+        with mock.patch('random.random', return_value=0.7):
+            self.handler.update_router(mock.Mock(), 'router-1', {})
+
+        self.assertEqual(1, self.handler.calls)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_disabled(self):
+        self.conf.enabled = False
+
+        self.handler.update_router(mock.Mock(), 'router-1', {})
+
+        self.assertEqual(1, self.handler.calls)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIs(tracing._NULL_SPAN, tracing.span('tf.neutron'))
+
+    @mock.patch.object(tracing, 'osprofiler_profiler')
+    def test_osprofiler(self, profiler):
+        self.conf.exporter = tracing.OSPROFILER
+
+        self.handler.update_router(mock.Mock(), 'router-1', {})
+
+        profiler.Trace.assert_any_call('tf.neutron',
+                                       info={'resource': 'router',
+                                             'action': 'UPDATE'})
+        self.assertEqual(4, profiler.Trace.call_count)
+        self.assertFalse(os.path.exists(self.path))
+
+    @mock.patch.object(tracing, 'osprofiler_profiler')
+    def test_osprofiler_without_profiled_request(self, profiler):
+        self.conf.exporter = tracing.OSPROFILER
+        profiler.get.return_value = None
+
+        self.handler.update_router(mock.Mock(), 'router-1', {})
+
+        profiler.Trace.assert_not_called()
@@ -47,11 +47,12 @@ class UtilsTestCases(test_extensions_base.ExtensionTestCase):
         ]
         register.assert_has_calls(expected_calls)
 
-    @mock.patch("requests.get")
+    @mock.patch("requests.Session.get")
     @mock.patch("oslo_config.cfg.CONF")
     def test_vnc_api_is_authenticated_ok(self, config, request):
         config.APISERVER = mock.MagicMock()
         config.APISERVER.use_ssl = False
+        config.APISERVER.insecure = True
         config.APISERVER.api_server_ip = "localhost"
         config.APISERVER.api_server_port = "8082"
         response = requests.Response()
@@ -60,10 +61,11 @@ class UtilsTestCases(test_extensions_base.ExtensionTestCase):
 
         result = utils.vnc_api_is_authenticated()
 
-        request.assert_called_with(mock.ANY)
+        request.assert_called_with(mock.ANY, verify=False, cert=None,
+                                   timeout=mock.ANY)
         self.assertEqual(False, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("requests.Session.get")
     @mock.patch("oslo_config.cfg.CONF")
     def test_vnc_api_is_authenticated_unauthorized(self, config, request):
         config.APISERVER = mock.MagicMock()
@@ -76,14 +78,19 @@ class UtilsTestCases(test_extensions_base.ExtensionTestCase):
 
         result = utils.vnc_api_is_authenticated()
 
-        request.assert_called_with(mock.ANY)
+        request.assert_called_with(mock.ANY, verify=mock.ANY, cert=mock.ANY,
+                                   timeout=mock.ANY)
         self.assertEqual(True, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("requests.Session.get")
     @mock.patch("oslo_config.cfg.CONF")
     def test_vnc_api_is_authenticated_invalid(self, config, request):
         config.APISERVER = mock.MagicMock()
         config.APISERVER.use_ssl = True
+        config.APISERVER.insecure = False
+        config.APISERVER.cafile = '/etc/contrail/ca.pem'
+        config.APISERVER.certfile = '/etc/contrail/cert.pem'
+        config.APISERVER.keyfile = '/etc/contrail/key.pem'
         config.APISERVER.api_server_ip = "localhost"
         config.APISERVER.api_server_port = "8082"
         response = requests.Response()
@@ -93,4 +100,38 @@ class UtilsTestCases(test_extensions_base.ExtensionTestCase):
         self.assertRaises(requests.exceptions.HTTPError,
                           utils.vnc_api_is_authenticated)
 
-        request.assert_called_with(mock.ANY)
+        request.assert_called_with(
+            'https://localhost:8082/aaa-mode',
+            verify='/etc/contrail/ca.pem',
+            cert=('/etc/contrail/cert.pem', '/etc/contrail/key.pem'),
+            timeout=mock.ANY)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_get_http_session_is_shared(self, config):
+        config.APISERVER = mock.MagicMock(connection_pool_size=5,
+                                          keep_alive=True)
+        utils._http_session = None
+        self.addCleanup(setattr, utils, '_http_session', None)
+
+        session = utils.get_http_session()
+
+        self.assertIs(session, utils.get_http_session())
+        adapter = session.get_adapter('http://localhost')
+        self.assertEqual(5, adapter._pool_maxsize)
+        self.assertEqual('keep-alive', session.headers['Connection'])
+
+    @mock.patch("os.getpid")
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_get_http_session_recreated_after_fork(self, config, getpid):
+        config.APISERVER = mock.MagicMock(connection_pool_size=5,
+                                          keep_alive=False)
+        utils._http_session = None
+        self.addCleanup(setattr, utils, '_http_session', None)
+        getpid.return_value = 1
+        parent_session = utils.get_http_session()
+
+        getpid.return_value = 2
+        child_session = utils.get_http_session()
+
+        self.assertIsNot(parent_session, child_session)
+        self.assertEqual('close', child_session.headers['Connection'])
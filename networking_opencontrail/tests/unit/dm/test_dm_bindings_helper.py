@@ -51,6 +51,19 @@ class DmBindingsHelperTestCase(base.TestCase):
         topology.assert_called_with(cfg.CONF.DM_INTEGRATION.topology)
         topology().initialize.assert_called()
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch(
+        "networking_opencontrail.dm.dm_bindings_helper.DmTopologySnapshot")
+    def test_topology_snapshot_is_used_without_file(self, topology, config):
+        config.DM_INTEGRATION.topology = None
+        config.DM_INTEGRATION.topology_snapshot = True
+
+        helper = DmBindingsHelper(self.tf_client)
+
+        topology.assert_called_with(
+            self.tf_client, config.DM_INTEGRATION.topology_refresh_interval)
+        self.assertEqual(topology(), helper.topology)
+
     def test_check_host_managed_true_when_dm_topology_true(self):
         self.dm_topology.__contains__ = mock.Mock(return_value=True)
 
@@ -73,7 +86,7 @@ class DmBindingsHelperTestCase(base.TestCase):
         self._mock_tf_client_read_fabric_name()
         tf_kvpairs = self._mock_tf_client_make_key_value_pairs()
 
-        bindings = self.helper.get_bindings_for_host('compute1')
+        bindings, _ = self.helper.get_bindings_for_host('compute1')
 
         expected_binding_profile = {'local_link_information':
                                     [{'port_id': 'xe-0/0/1',
@@ -101,7 +114,7 @@ class DmBindingsHelperTestCase(base.TestCase):
         self._mock_tf_client_read_fabric_name()
         tf_kvpairs = self._mock_tf_client_make_key_value_pairs()
 
-        bindings = self.helper.get_bindings_for_host('compute1')
+        bindings, _ = self.helper.get_bindings_for_host('compute1')
 
         expected_binding_profile = {'local_link_information':
                                     [{'port_id': 'xe-0/0/1',
@@ -116,7 +129,9 @@ class DmBindingsHelperTestCase(base.TestCase):
             mock.call.read_fabric_name_from_switch('leaf1'),
             mock.call.read_fabric_name_from_switch('leaf2'),
             mock.call.read_pi_from_switch('leaf1', 'xe-0/0/1'),
-            mock.call.get_virtual_port_group(uuid='vpg-id-1'),
+            mock.call.list_virtual_port_groups(
+                obj_uuids=['vpg-id-1'], detail=True,
+                fields=['physical_interface_refs']),
             mock.call.make_key_value_pairs(expected_bindings),
         ]
         self.tf_client.assert_has_calls(tf_expected_calls)
@@ -131,7 +146,7 @@ class DmBindingsHelperTestCase(base.TestCase):
         self._mock_tf_client_read_fabric_name()
         tf_kvpairs = self._mock_tf_client_make_key_value_pairs()
 
-        bindings = self.helper.get_bindings_for_host('compute1')
+        bindings, _ = self.helper.get_bindings_for_host('compute1')
 
         expected_binding_profile = {'local_link_information':
                                     [{'port_id': 'xe-0/0/1',
@@ -146,7 +161,9 @@ class DmBindingsHelperTestCase(base.TestCase):
             mock.call.read_fabric_name_from_switch('leaf1'),
             mock.call.read_fabric_name_from_switch('leaf2'),
             mock.call.read_pi_from_switch('leaf1', 'xe-0/0/1'),
-            mock.call.get_virtual_port_group(uuid='vpg-id-1'),
+            mock.call.list_virtual_port_groups(
+                obj_uuids=['vpg-id-1'], detail=True,
+                fields=['physical_interface_refs']),
             mock.call.make_key_value_pairs(expected_bindings),
         ]
         self.tf_client.assert_has_calls(tf_expected_calls)
@@ -159,7 +176,7 @@ class DmBindingsHelperTestCase(base.TestCase):
         self._mock_tf_client_read_fabric_name()
         tf_kvpairs = self._mock_tf_client_make_key_value_pairs()
 
-        bindings = self.helper.get_bindings_for_host('compute1')
+        bindings, _ = self.helper.get_bindings_for_host('compute1')
 
         expected_binding_profile = {'local_link_information':
                                     [{'port_id': 'xe-0/0/1',
@@ -175,14 +192,69 @@ class DmBindingsHelperTestCase(base.TestCase):
             mock.call.read_fabric_name_from_switch('leaf1'),
             mock.call.read_fabric_name_from_switch('leaf2'),
             mock.call.read_pi_from_switch('leaf1', 'xe-0/0/1'),
-            mock.call.get_virtual_port_group(uuid='vpg-id-1'),
-            mock.call.get_virtual_port_group(uuid='vpg-id-2'),
+            mock.call.list_virtual_port_groups(
+                obj_uuids=['vpg-id-1', 'vpg-id-2'], detail=True,
+                fields=['physical_interface_refs']),
             mock.call.make_key_value_pairs(expected_bindings),
         ]
         self.tf_client.assert_has_calls(tf_expected_calls)
         self.dm_topology.get_node.assert_called_with('compute1')
         self.assertEqual(tf_kvpairs, bindings)
 
+    def test_get_bindings_for_host_remembers_lookups(self):
+        self._mock_get_node()
+        self._mock_tf_client_when_autocreated_vpg_exists()
+        self._mock_tf_client_read_fabric_name()
+        self._mock_tf_client_make_key_value_pairs()
+
+        self.helper.get_bindings_for_host('compute1')
+        self.helper.get_bindings_for_host('compute1')
+
+        self.assertEqual(
+            2, self.tf_client.read_fabric_name_from_switch.call_count)
+        self.tf_client.read_pi_from_switch.assert_called_once()
+        self.tf_client.list_virtual_port_groups.assert_called_once()
+
+    def test_vmi_created_forgets_missing_vpg(self):
+        self._mock_get_node()
+        self._mock_tf_client_when_no_vpg()
+        self._mock_tf_client_read_fabric_name()
+        self._mock_tf_client_make_key_value_pairs()
+        _, vpg_key = self.helper.get_bindings_for_host('compute1')
+
+        self.helper.vmi_created(vpg_key)
+        self.helper.get_bindings_for_host('compute1')
+
+        self.assertEqual(2, self.tf_client.read_pi_from_switch.call_count)
+        self.assertEqual(2, self.dm_topology.get_node.call_count)
+        self.assertEqual(
+            2, self.tf_client.read_fabric_name_from_switch.call_count)
+
+    def test_vmi_created_keeps_existing_vpg(self):
+        self._mock_get_node()
+        self._mock_tf_client_when_autocreated_vpg_exists()
+        self._mock_tf_client_read_fabric_name()
+        self._mock_tf_client_make_key_value_pairs()
+        _, vpg_key = self.helper.get_bindings_for_host('compute1')
+
+        self.helper.vmi_created(vpg_key)
+        self.helper.get_bindings_for_host('compute1')
+
+        self.tf_client.read_pi_from_switch.assert_called_once()
+
+    def test_vpg_changed_forgets_vpg(self):
+        self._mock_get_node()
+        self._mock_tf_client_when_autocreated_vpg_exists()
+        self._mock_tf_client_read_fabric_name()
+        self._mock_tf_client_make_key_value_pairs()
+        self.helper.get_bindings_for_host('compute1')
+        vpg = self.tf_client.list_virtual_port_groups.return_value[0]
+
+        self.helper.vpg_changed(vpg)
+        self.helper.get_bindings_for_host('compute1')
+
+        self.assertEqual(2, self.tf_client.read_pi_from_switch.call_count)
+
     def test_get_bindings_for_host_raise_when_no_fabric_name(self):
         self._mock_get_node()
         self._mock_tf_client_read_fabric_name(None)
@@ -225,7 +297,8 @@ class DmBindingsHelperTestCase(base.TestCase):
         vpg_1 = mock.Mock(fq_name=['parent-name', 'vpg-1'], uuid='vpg-id-1')
         vpg_1.get_virtual_port_group_user_created = mock.Mock(
             return_value=True)
-        self.tf_client.get_virtual_port_group = mock.Mock(side_effect=[vpg_1])
+        self.tf_client.list_virtual_port_groups = mock.Mock(
+            return_value=[vpg_1])
 
         vpg_refs = [{'to': vpg_1.fq_name, 'uuid': vpg_1.uuid}]
         self._mock_tf_client_physical_interface(vpg_refs)
@@ -242,8 +315,8 @@ class DmBindingsHelperTestCase(base.TestCase):
             return_value=vpg_2_pi_refs)
         vpg_2.get_virtual_port_group_user_created = mock.Mock(
             return_value=False)
-        self.tf_client.get_virtual_port_group = mock.Mock(
-            side_effect=[vpg_1, vpg_2])
+        self.tf_client.list_virtual_port_groups = mock.Mock(
+            return_value=[vpg_2, vpg_1])
 
         vpg_refs = [{'to': vpg_1.fq_name, 'uuid': vpg_1.uuid},
                     {'to': vpg_2.fq_name, 'uuid': vpg_2.uuid}]
@@ -256,8 +329,8 @@ class DmBindingsHelperTestCase(base.TestCase):
             return_value=vpg_pi_refs)
         vpg.get_virtual_port_group_user_created = mock.Mock(
             return_value=False)
-        self.tf_client.get_virtual_port_group = mock.Mock(
-            side_effect=[vpg])
+        self.tf_client.list_virtual_port_groups = mock.Mock(
+            return_value=[vpg])
 
         vpg_refs = [{'to': vpg.fq_name, 'uuid': vpg.uuid}]
         self._mock_tf_client_physical_interface(vpg_refs)
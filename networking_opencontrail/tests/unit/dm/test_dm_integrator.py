@@ -106,7 +106,8 @@ class DeviceManagerIntegratorTestCase(base.TestCase):
         self.tf_client.assert_has_calls(tf_expected_calls)
         bindings_helper_expected_calls = [
             mock.call.check_host_managed('compute1'),
-            mock.call.get_bindings_for_host('compute1')
+            mock.call.get_bindings_for_host('compute1'),
+            mock.call.vmi_created('vpg-key')
         ]
         self.bindings_helper.assert_has_calls(bindings_helper_expected_calls)
         self.core_plugin.get_network.assert_called_with(context, "net-1")
@@ -482,7 +483,7 @@ class DeviceManagerIntegratorTestCase(base.TestCase):
     def _mock_bindings_helper_get_bindings(self):
         binding = mock.Mock()
         self.bindings_helper.get_bindings_for_host = mock.Mock(
-            return_value=binding)
+            return_value=(binding, 'vpg-key'))
         return binding
 
     def _mock_bindings_helper_raise(self, exc):
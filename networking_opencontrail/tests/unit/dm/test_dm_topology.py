@@ -18,6 +18,7 @@ import mock
 
 from networking_opencontrail.dm.dm_topology import DmTopologyApi
 from networking_opencontrail.dm.dm_topology import DmTopologyFile
+from networking_opencontrail.dm.dm_topology import DmTopologySnapshot
 from networking_opencontrail.dm.dm_topology import InvalidNodeError
 from networking_opencontrail.dm.dm_topology import NodeNotFoundError
 from networking_opencontrail.dm.dm_topology_loader import ConfigInvalidFormat
@@ -168,6 +169,94 @@ class DmTopologyApiTestCase(base.TestCase):
         self.tf_client.get_port = mock.Mock(side_effect=[port_1, port_2])
 
 
+class DmTopologySnapshotTestCase(base.TestCase):
+    @mock.patch("oslo_config.cfg.CONF")
+    def setUp(self, config):
+        super(DmTopologySnapshotTestCase, self).setUp()
+
+        self.tf_client = mock.Mock(spec_set=VncApiClient())
+        self._mock_tf_client_topology()
+        self.dm_topology = DmTopologySnapshot(self.tf_client, 60)
+
+    def test_get_node_from_snapshot(self):
+        with mock.patch('time.time', return_value=100.0):
+            node = self.dm_topology.get_node('host-2')
+            self.assertIn('host-2', self.dm_topology)
+
+        expected_node = {'name': 'host-2',
+                         'ports': [{'name': 'port-1',
+                                    'switch_name': 'leaf2',
+                                    'port_name': 'xe-1/1/1'}]}
+        self.assertEqual(expected_node, node)
+        self.tf_client.list_ports.assert_called_once_with(
+            detail=True, fields=['physical_interface_back_refs'])
+        self.tf_client.list_nodes.assert_called_once_with(
+            detail=True, fields=['ports'])
+
+    def test_contains_host_false_when_not_in_snapshot(self):
+        self.assertNotIn('not-managed', self.dm_topology)
+
+    def test_get_node_raise_when_not_in_snapshot(self):
+        self.assertRaises(NodeNotFoundError,
+                          self.dm_topology.get_node, 'not-managed')
+
+    def test_get_node_raise_when_no_port_with_pi_ref(self):
+        self.assertRaises(InvalidNodeError,
+                          self.dm_topology.get_node, 'host-3')
+
+    def test_snapshot_is_reloaded_after_refresh_interval(self):
+        with mock.patch('time.time', return_value=100.0):
+            self.dm_topology.get_node('host-2')
+        with mock.patch('time.time', return_value=150.0):
+            self.dm_topology.get_node('host-2')
+        self.assertEqual(1, self.tf_client.list_nodes.call_count)
+
+        with mock.patch('time.time', return_value=160.0):
+            self.dm_topology.get_node('host-2')
+        self.assertEqual(2, self.tf_client.list_nodes.call_count)
+
+    def test_previous_snapshot_is_used_when_reload_fails(self):
+        with mock.patch('time.time', return_value=100.0):
+            self.dm_topology.get_node('host-2')
+        self.tf_client.list_ports.side_effect = RuntimeError
+
+        with mock.patch('time.time', return_value=200.0):
+            self.assertIn('host-2', self.dm_topology)
+
+    def test_failed_load_is_retried_with_backoff(self):
+        self.tf_client.list_ports.side_effect = RuntimeError
+
+        with mock.patch('time.time', return_value=100.0):
+            self.assertNotIn('host-2', self.dm_topology)
+            self.assertNotIn('host-2', self.dm_topology)
+        self.assertEqual(1, self.tf_client.list_ports.call_count)
+
+        with mock.patch('time.time', return_value=101.0):
+            self.assertNotIn('host-2', self.dm_topology)
+        with mock.patch('time.time', return_value=102.0):
+            self.assertNotIn('host-2', self.dm_topology)
+        self.assertEqual(2, self.tf_client.list_ports.call_count)
+
+        self.tf_client.list_ports.side_effect = None
+        with mock.patch('time.time', return_value=103.0):
+            self.assertIn('host-2', self.dm_topology)
+        self.assertEqual(3, self.tf_client.list_ports.call_count)
+
+    def _mock_tf_client_topology(self):
+        port_1 = mock.Mock(uuid='port-id-1', fq_name=['parent', 'port-1'])
+        port_1.get_physical_interface_back_refs = mock.Mock(
+            return_value=[{'to': ['default-config', 'leaf2', 'xe-1/1/1']}])
+        port_2 = mock.Mock(uuid='port-id-2', fq_name=['parent', 'port-2'])
+        port_2.get_physical_interface_back_refs = mock.Mock(return_value=None)
+        node_2 = mock.Mock(fq_name=['default-config', 'host-2'])
+        node_2.get_ports = mock.Mock(return_value=[{'uuid': 'port-id-1'}])
+        node_3 = mock.Mock(fq_name=['default-config', 'host-3'])
+        node_3.get_ports = mock.Mock(return_value=[{'uuid': 'port-id-2'}])
+
+        self.tf_client.list_ports = mock.Mock(return_value=[port_1, port_2])
+        self.tf_client.list_nodes = mock.Mock(return_value=[node_2, node_3])
+
+
 @ddt.ddt
 class DmTopologyFileTestCase(base.TestCase):
     @mock.patch("oslo_config.cfg.CONF")
@@ -697,6 +697,77 @@ class PortTestCases(test_extensions_base.ExtensionTestCase):
         drv._create_resource.assert_called_with(self.RESOURCE_NAME, context,
                                                 port)
 
+    def test_get_ports_forwards_pagination(self):
+        drv = self._get_drv()
+        drv._list_resource = mock.Mock(return_value=[])
+        context = mock.Mock()
+
+        drv.get_ports(context, sorts=[('id', True)], limit=10,
+                      marker='port-1')
+
+        drv._list_resource.assert_called_with(
+            self.RESOURCE_NAME, context, None, None, sorts=[('id', True)],
+            limit=10, marker='port-1')
+
+    def _make_ports(self, *ids):
+        return [{'id': port_id, 'name': 'name-' + port_id}
+                for port_id in ids]
+
+    def test_iter_ports_requests_pages_lazily(self):
+        drv = self._get_drv()
+        drv._list_resource = mock.Mock(side_effect=[
+            self._make_ports('a', 'b'), self._make_ports('c')])
+        context = mock.Mock()
+
+        ports = drv.iter_ports(context, page_size=2)
+
+        drv._list_resource.assert_not_called()
+        self.assertEqual(['a', 'b', 'c'], [port['id'] for port in ports])
+        drv._list_resource.assert_has_calls([
+            mock.call(self.RESOURCE_NAME, context, None, None,
+                      sorts=[('id', True)], limit=2, marker=None),
+            mock.call(self.RESOURCE_NAME, context, None, None,
+                      sorts=[('id', True)], limit=2, marker='b')])
+
+    def test_iter_ports_requests_id_for_marker(self):
+        drv = self._get_drv()
+        drv._list_resource = mock.Mock(
+            return_value=self._make_ports('a'))
+        context = mock.Mock()
+
+        ports = list(drv.iter_ports(context, fields=['name'], page_size=2))
+
+        self.assertEqual([{'name': 'name-a'}], ports)
+        drv._list_resource.assert_called_once_with(
+            self.RESOURCE_NAME, context, None, ['name', 'id'],
+            sorts=[('id', True)], limit=2, marker=None)
+
+    def test_iter_ports_when_backend_ignores_pagination(self):
+        drv = self._get_drv()
+        drv._list_resource = mock.Mock(
+            return_value=self._make_ports('a', 'b'))
+        context = mock.Mock()
+
+        ports = list(drv.iter_ports(context, page_size=2))
+
+        self.assertEqual(['a', 'b'], [port['id'] for port in ports])
+        self.assertEqual(2, drv._list_resource.call_count)
+
+    def test_create_port_bulk(self):
+        drv = self._get_drv()
+        drv._create_resource_bulk = mock.Mock()
+        ports = [self._get_port(), self._get_port()]
+        context = mock.Mock(tenant_id='tenant-id')
+        drv._create_resource_bulk.return_value = ports
+
+        result = drv.create_port_bulk(context, {'ports': ports})
+
+        self.assertEqual(result, ports)
+        for port in ports:
+            self.assertEqual('tenant-id', port['port']['tenant_id'])
+        drv._create_resource_bulk.assert_called_with(self.RESOURCE_NAME,
+                                                     context, ports)
+
     def test_get_port(self):
         drv = self._get_drv()
         drv._get_resource = mock.Mock()
@@ -747,6 +818,77 @@ class PortTestCases(test_extensions_base.ExtensionTestCase):
         drv._update_resource.assert_called_with(self.RESOURCE_NAME, context,
                                                 port_id, port)
 
+    def test_update_port_without_fixed_ips_is_not_read(self):
+        drv = self._get_drv()
+        drv._update_resource = mock.Mock()
+        drv._get_port = mock.Mock()
+        port = {'port': {'name': 'new-name'}}
+        context = mock.Mock()
+
+        drv.update_port(context, 'port-id', port)
+
+        drv._get_port.assert_not_called()
+        drv._update_resource.assert_called_once_with(
+            self.RESOURCE_NAME, context, 'port-id', port)
+
+    def test_get_port_changes(self):
+        original = self._get_port(fixed_ips=[self._get_ip('10.0.0.1'),
+                                             self._get_ip('10.0.0.2')])['port']
+        original.update(status='DOWN', name='port')
+        current = dict(original, status='ACTIVE', name='renamed',
+                       fixed_ips=list(reversed(original['fixed_ips'])))
+
+        changes = base.get_port_changes(original, current)
+
+        self.assertEqual({'id': 'port-mock-id', 'name': 'renamed'}, changes)
+
+    def test_get_port_changes_fixed_ips(self):
+        original = self._get_port(fixed_ips=[self._get_ip('10.0.0.1')])['port']
+        current = dict(original, status='ACTIVE',
+                       fixed_ips=[self._get_ip('10.0.0.2')])
+
+        self.assertEqual({'id': 'port-mock-id',
+                          'fixed_ips': [self._get_ip('10.0.0.2')]},
+                         base.get_port_changes(original, current))
+        self.assertEqual({}, base.get_port_changes(original,
+                                                   dict(original)))
+
+    def test_update_ips_for_port(self):
+        drv = self._get_drv()
+        original_ips = [dict(self._get_ip('10.0.0.1'), subnet_id='s'),
+                        dict(self._get_ip('10.0.0.2'), subnet_id='s')]
+        new_ips = [self._get_ip('10.0.0.3'), self._get_ip('10.0.0.2'),
+                   {'subnet_id': 's'}]
+
+        added_ips, prev_ips = drv._update_ips_for_port(
+            mock.Mock(), 'net-id', 'port-id', original_ips, new_ips)
+
+        self.assertEqual([self._get_ip('10.0.0.3'), {'subnet_id': 's'}],
+                         added_ips)
+        self.assertEqual([original_ips[1]], prev_ips)
+
+    def test_bind_port_sends_only_binding(self):
+        drv = self._get_drv()
+        drv._update_resource = mock.Mock()
+        drv._get_port = mock.Mock()
+        port = self._get_port(fixed_ips=[self._get_ip()],
+                              host_id='compute-1')['port']
+        port['binding:vnic_type'] = 'normal'
+        port['binding:profile'] = {}
+        context = mock.Mock(current=port,
+                            segments_to_bind=[{'id': 'segment-id'}])
+
+        drv.bind_port(context)
+
+        drv._get_port.assert_not_called()
+        drv._update_resource.assert_called_once_with(
+            self.RESOURCE_NAME, context, port['id'],
+            {'port': {'binding:host_id': 'compute-1',
+                      'binding:vnic_type': 'normal',
+                      'binding:profile': {}}})
+        context.set_binding.assert_called_once_with(
+            'segment-id', 'vrouter', {'port_filter': True}, 'ACTIVE')
+
     @mock.patch("oslo_config.cfg.CONF")
     def test_update_port_fixed_ips(self, config):
         config.max_fixed_ips_per_port = 10
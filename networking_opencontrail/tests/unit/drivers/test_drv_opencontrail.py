@@ -13,7 +13,6 @@
 #    under the License.
 #
 
-import json
 import logging
 import mock
 import requests
@@ -24,6 +23,8 @@ from neutron_lib import exceptions
 
 from networking_opencontrail.drivers import drv_opencontrail
 
+TOKEN_MANAGER = "networking_opencontrail.common.tokens.get_token_manager"
+
 
 class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
 
@@ -45,7 +46,7 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
 
         return drv_opencontrail.OpenContrailDrivers()
 
-    @mock.patch("requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_request_api_server_authorized(self, options, config, request):
@@ -61,57 +62,61 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
         self.assertEqual(response, result)
 
         request.assert_called_with(url, data=None, headers=mock.ANY,
-                                   verify=False)
+                                   verify=False, timeout=mock.ANY)
 
-    @mock.patch("requests.post")
+    @mock.patch(TOKEN_MANAGER)
+    @mock.patch("requests.Session.post")
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
-    def test_request_api_server_auth_failed(self, options, config, request):
+    def test_request_api_server_auth_failed(self, options, config, request,
+                                            get_token_manager):
         driver = self._get_driver(options, config)
         driver._apiinsecure = False
         driver._use_api_certs = False
         response = requests.Response()
         response.status_code = requests.codes.unauthorized
         request.return_value = response
+        token_manager = get_token_manager.return_value
+        token_manager.get_token.side_effect = RuntimeError
         url = "/URL"
 
         self.assertRaises(RuntimeError, driver._request_api_server, url)
 
-    @mock.patch("requests.Response.text", new_callable=mock.PropertyMock)
-    @mock.patch("requests.post")
+    @mock.patch(TOKEN_MANAGER)
+    @mock.patch("requests.Session.post")
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_request_api_server_auth_recover(self, options, config, request,
-                                             text):
+                                             get_token_manager):
         driver = self._get_driver(options, config)
         driver._apiinsecure = False
         driver._use_api_certs = False
         response_bad = requests.Response()
         response_bad.status_code = requests.codes.unauthorized
         token = "xyztoken"
-        text.return_value = json.dumps({
-            'access': {
-                'token': {
-                    'id': token
-                },
-            },
-        })
+        token_manager = get_token_manager.return_value
+        token_manager.get_token.return_value = token
         response_good = requests.Response()
         response_good.status_code = requests.codes.ok
-        request.side_effect = [response_bad, response_good, response_good]
+        request.side_effect = [response_bad, response_good]
         url = "/URL"
 
-        driver._request_api_server(url)
+        driver._request_api_server(url, headers={'X-AUTH-TOKEN': 'expired'})
 
+        token_manager.invalidate.assert_called_once_with('expired')
         request.assert_called_with('/URL', data=None,
-                                   headers={'X-AUTH-TOKEN': token})
+                                   headers={'X-AUTH-TOKEN': token},
+                                   timeout=mock.ANY)
 
-    @mock.patch("requests.post")
+    @mock.patch(TOKEN_MANAGER)
+    @mock.patch("requests.Session.post")
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
-    def test_request_api_server_authn(self, options, config, request):
+    def test_request_api_server_authn(self, options, config, request,
+                                      get_token_manager):
         driver = self._get_driver(options, config)
         driver._apiinsecure = True
+        get_token_manager.return_value.current_token.return_value = "xyztoken"
         response = requests.Response()
         response.status_code = requests.codes.ok
         request.return_value = response
@@ -121,8 +126,29 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
 
         self.assertEqual(response, result)
 
-        request.assert_called_with(url, data=None, headers=mock.ANY,
-                                   verify=False)
+        request.assert_called_with(url, data=None,
+                                   headers={'X-AUTH-TOKEN': "xyztoken"},
+                                   verify=False, timeout=mock.ANY)
+
+    @mock.patch(TOKEN_MANAGER)
+    @mock.patch("requests.Session.post")
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_request_api_server_authn_no_token(self, options, config,
+                                               request, get_token_manager):
+        driver = self._get_driver(options, config)
+        driver._apiinsecure = True
+        token_manager = get_token_manager.return_value
+        token_manager.current_token.return_value = None
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        request.return_value = response
+
+        driver._request_api_server_authn("/URL")
+
+        token_manager.get_token.assert_not_called()
+        request.assert_called_with("/URL", data=None, headers={},
+                                   verify=False, timeout=mock.ANY)
 
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
@@ -139,7 +165,8 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
         url = "API://localhost:8082/URL"
         driver._request_api_server_authn.assert_called_with(url,
                                                             data=None,
-                                                            headers=mock.ANY)
+                                                            headers=mock.ANY,
+                                                            stream=False)
 
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
@@ -162,6 +189,47 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
         self.assertEqual({'message': None}, message)
         driver._relay_request.assert_called()
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_request_backend_bulk(self, options, config):
+        driver = self._get_driver(options, config)
+        config.APISERVER.bulk_concurrency = 4
+        driver._request_backend = mock.MagicMock()
+        driver._request_backend.side_effect = (
+            lambda context, data_dict, obj_name, action:
+                (requests.codes.ok, data_dict))
+        context = mock.MagicMock()
+        data_dicts = [{'id': 'id-%d' % i} for i in range(10)]
+
+        result = driver._request_backend_bulk(context, data_dicts, 'port',
+                                              'CREATE')
+
+        self.assertEqual([(requests.codes.ok, data_dict)
+                          for data_dict in data_dicts], result)
+        self.assertEqual(10, driver._request_backend.call_count)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_request_backend_bulk_item_error(self, options, config):
+        driver = self._get_driver(options, config)
+        config.APISERVER.bulk_concurrency = 4
+        error = ValueError()
+
+        def request_backend(context, data_dict, obj_name, action):
+            if data_dict['id'] == 'id-1':
+                raise error
+            return requests.codes.ok, data_dict
+
+        driver._request_backend = mock.MagicMock(side_effect=request_backend)
+        context = mock.MagicMock()
+        data_dicts = [{'id': 'id-%d' % i} for i in range(3)]
+
+        result = driver._request_backend_bulk(context, data_dicts, 'port',
+                                              'CREATE')
+
+        self.assertEqual([(requests.codes.ok, data_dicts[0]), error,
+                          (requests.codes.ok, data_dicts[2])], result)
+
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_encode_resource(self, options, config):
@@ -179,6 +247,23 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
         }
         self.assertEqual(expected, result)
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_encode_resource_with_pagination(self, options, config):
+        driver = self._get_driver(options, config)
+
+        result = driver._encode_resource(fields=['id'], sorts=[('id', True)],
+                                         limit=10, marker='port-1')
+
+        expected = {
+            'fields': ['id'],
+            'filters': None,
+            'sorts': [('id', True)],
+            'limit': 10,
+            'marker': 'port-1',
+        }
+        self.assertEqual(expected, result)
+
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_transform_response_dict(self, options, config):
@@ -203,6 +288,29 @@ class ApiRequestsTestCases(test_extensions_base.ExtensionTestCase):
 
         self.assertEqual(info, result)
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_transform_response_list_projected_by_server(self, options,
+                                                         config):
+        driver = self._get_driver(options, config)
+        code = requests.codes.ok
+        info = [{'id': 'port-1'}, {'id': 'port-2'}]
+
+        result = driver._transform_response(code, info, fields=['id'])
+
+        self.assertIs(info, result)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_transform_response_list_pruned(self, options, config):
+        driver = self._get_driver(options, config)
+        code = requests.codes.ok
+        info = [{'id': 'port-1', 'name': 'a'}, {'id': 'port-2', 'name': 'b'}]
+
+        result = driver._transform_response(code, info, fields=['id'])
+
+        self.assertEqual([{'id': 'port-1'}, {'id': 'port-2'}], result)
+
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_transform_response_error(self, options, config):
@@ -259,6 +367,30 @@ class ApiCrudTestCases(test_extensions_base.ExtensionTestCase):
         driver._request_backend.assert_called_with(context, mock.ANY,
                                                    res_type, 'CREATE')
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_create_resource_bulk(self, options, config):
+        driver = self._get_driver(options, config)
+        driver._request_backend_bulk = mock.MagicMock()
+        context = mock.MagicMock()
+        res_type = 'port'
+        res_datas = [{res_type: {'id': 'port-1',
+                                 'tenant_id': ATTR_NOT_SPECIFIED}},
+                     {res_type: {'id': 'port-2'}}]
+        error = {'exception': 'PortNotFound', 'port_id': 'port-2'}
+        driver._request_backend_bulk.return_value = [
+            (requests.codes.ok, {'id': 'port-1'}),
+            (requests.codes.not_found, error)]
+
+        result = driver._create_resource_bulk(res_type, context, res_datas)
+
+        self.assertEqual({'id': 'port-1'}, result[0])
+        self.assertIsInstance(result[1], exceptions.PortNotFound)
+        driver._request_backend_bulk.assert_called_with(
+            context, [driver._encode_resource(resource={'id': 'port-1'}),
+                      driver._encode_resource(resource={'id': 'port-2'})],
+            res_type, 'CREATE')
+
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_get_resource(self, options, config):
@@ -322,6 +454,7 @@ class ApiCrudTestCases(test_extensions_base.ExtensionTestCase):
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_list_resource(self, options, config):
         driver = self._get_driver(options, config)
+        config.APISERVER.stream_list_responses = False
         driver._request_backend = mock.MagicMock()
         status_code = requests.codes.ok
         context = mock.MagicMock()
@@ -338,6 +471,64 @@ class ApiCrudTestCases(test_extensions_base.ExtensionTestCase):
         driver._request_backend.assert_called_with(context, mock.ANY,
                                                    res_type, 'READALL')
 
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_stream_resource(self, options, config):
+        driver = self._get_driver(options, config)
+        config.APISERVER.stream_list_responses = True
+        driver._relay_request = mock.MagicMock()
+        response = mock.MagicMock(status_code=requests.codes.ok)
+        response.iter_content.return_value = [
+            b'[{"id": "port-1", "na', b'me": "a", "status": "ACTIVE"},',
+            b' {"id": "port-2", "name": "b", "status": "DOWN"}]']
+        driver._relay_request.return_value = response
+        context = mock.MagicMock()
+
+        ports = driver._stream_resource('port', context, None, ['id', 'name'])
+
+        driver._relay_request.assert_not_called()
+        self.assertEqual([{'id': 'port-1', 'name': 'a'},
+                          {'id': 'port-2', 'name': 'b'}], list(ports))
+        driver._relay_request.assert_called_once_with(
+            '/neutron/port', data=mock.ANY, stream=True, idempotent=True)
+        response.close.assert_called_once_with()
+
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_list_resource_streamed(self, options, config):
+        driver = self._get_driver(options, config)
+        config.APISERVER.stream_list_responses = True
+        driver._request_backend = mock.MagicMock()
+        driver._relay_request = mock.MagicMock()
+        response = mock.MagicMock(status_code=requests.codes.ok)
+        response.iter_content.return_value = [
+            b'[{"id": "port-1", "name": "a"}, {"id": "port-2", "name": "b"}]']
+        driver._relay_request.return_value = response
+        context = mock.MagicMock()
+
+        ports = driver._list_resource('port', context, None, ['id'])
+
+        self.assertEqual([{'id': 'port-1'}, {'id': 'port-2'}], ports)
+        driver._request_backend.assert_not_called()
+        response.close.assert_called_once_with()
+
+    @mock.patch("oslo_config.cfg.CONF")
+    @mock.patch("oslo_config.cfg.CONF.register_opts")
+    def test_stream_resource_error(self, options, config):
+        driver = self._get_driver(options, config)
+        config.APISERVER.stream_list_responses = True
+        driver._relay_request = mock.MagicMock()
+        response = mock.MagicMock(status_code=requests.codes.not_found)
+        response.content = b'{"exception": "NetworkNotFound", "net_id": "n"}'
+        driver._relay_request.return_value = response
+        context = mock.MagicMock()
+
+        ports = driver._stream_resource('network', context, None, None)
+
+        self.assertRaises(exceptions.NetworkNotFound, list, ports)
+        response.iter_content.assert_not_called()
+        response.close.assert_called_once_with()
+
     @mock.patch("oslo_config.cfg.CONF")
     @mock.patch("oslo_config.cfg.CONF.register_opts")
     def test_count_resource(self, options, config):
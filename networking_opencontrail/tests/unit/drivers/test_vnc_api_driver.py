@@ -31,7 +31,8 @@ class VncApiDriverTestCase(base.TestCase):
         self.vnc_api = mock.Mock()
         vnc_api_driver.vnc_api.VncApi = mock.Mock(return_value=self.vnc_api)
 
-        self.driver = vnc_api_driver.VncApiClient()
+        self.driver = vnc_api_driver.VncApiClient(
+            object_cache=vnc_api_driver.VncObjectCache(0, 0))
 
     def test_make_virtual_machine_interface(self):
         project = self._get_fake_project()
@@ -224,6 +225,88 @@ class VncApiDriverTestCase(base.TestCase):
         self.assertIsNone(obj)
         vnc_read.assert_called_with(id="uuid-1", fq_name=["name-1"])
 
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_get_object_is_cached(self, cfg):
+        self.driver = self._make_cached_driver()
+        vn = mock.Mock(uuid="vn-1", fq_name=["domain", "project", "vn-1"])
+        self.vnc_api.virtual_network_read = mock.Mock(return_value=vn)
+
+        by_uuid = self.driver.get_virtual_network(uuid="vn-1")
+        by_fq_name = self.driver.get_virtual_network(
+            fq_name=["domain", "project", "vn-1"])
+
+        self.assertEqual(vn, by_uuid)
+        self.assertEqual(vn, by_fq_name)
+        self.vnc_api.virtual_network_read.assert_called_once_with(
+            id="vn-1", fq_name=None)
+        stats = self.driver.get_cache_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_get_object_caches_missing_object(self, cfg):
+        self.driver = self._make_cached_driver()
+        self.vnc_api.virtual_machine_interface_read = mock.Mock(
+            side_effect=vnc_api.NoIdError("id"))
+
+        self.driver.get_virtual_machine_interface(fq_name=["vmi-1"])
+        obj = self.driver.get_virtual_machine_interface(fq_name=["vmi-1"])
+
+        self.assertIsNone(obj)
+        self.vnc_api.virtual_machine_interface_read.assert_called_once()
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_get_object_uses_ttl_of_type(self, cfg):
+        self.driver = self._make_cached_driver(ttls={'project': 0})
+        self.vnc_api.project_read = mock.Mock(
+            return_value=mock.Mock(uuid="proj-1", fq_name=["project-1"]))
+
+        self.driver.get_project(uuid="proj-1")
+        self.driver.get_project(uuid="proj-1")
+
+        self.assertEqual(2, self.vnc_api.project_read.call_count)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_create_vmi_invalidates_cache(self, cfg):
+        self.driver = self._make_cached_driver()
+        self.vnc_api.virtual_machine_interface_read = mock.Mock(
+            side_effect=vnc_api.NoIdError("id"))
+        vpg = mock.Mock(uuid="vpg-1", fq_name=["vpg-1"])
+        self.vnc_api.virtual_port_group_read = mock.Mock(return_value=vpg)
+        self.driver.get_virtual_machine_interface(fq_name=["vmi-1"])
+        self.driver.get_virtual_port_group(uuid="vpg-1")
+
+        self.driver.create_virtual_machine_interface(
+            mock.Mock(uuid="vmi-1", fq_name=["vmi-1"]))
+        self.driver.get_virtual_machine_interface(fq_name=["vmi-1"])
+        self.driver.get_virtual_port_group(uuid="vpg-1")
+
+        self.assertEqual(
+            2, self.vnc_api.virtual_machine_interface_read.call_count)
+        self.assertEqual(2, self.vnc_api.virtual_port_group_read.call_count)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_update_vpg_invalidates_cache(self, cfg):
+        self.driver = self._make_cached_driver()
+        vpg = mock.Mock(uuid="vpg-1", fq_name=["vpg-1"])
+        self.vnc_api.virtual_port_group_read = mock.Mock(return_value=vpg)
+        self.driver.get_virtual_port_group(uuid="vpg-1")
+
+        self.driver.update_virtual_port_group(vpg)
+        self.driver.get_virtual_port_group(fq_name=["vpg-1"])
+
+        self.assertEqual(2, self.vnc_api.virtual_port_group_read.call_count)
+
+    @mock.patch("oslo_config.cfg.CONF")
+    def test_list_virtual_routers(self, cfg):
+        vrouters = [{'fq_name': ['global', 'compute-1'], 'uuid': 'vr-1'}]
+        self.vnc_api.resource_list.return_value = {'virtual-routers': vrouters}
+
+        result = self.driver.list_virtual_routers()
+
+        self.assertEqual(vrouters, result)
+        self.vnc_api.resource_list.assert_called_once_with('virtual-router')
+
     @mock.patch("oslo_config.cfg.CONF")
     def test_vnc_connect_decorator(self, config):
         args = mock.Mock()
@@ -246,6 +329,12 @@ class VncApiDriverTestCase(base.TestCase):
         self.assertEqual(value1, (args, kwargs))
         self.assertEqual(value2, (args, kwargs))
 
+    @staticmethod
+    def _make_cached_driver(ttls=None):
+        object_cache = vnc_api_driver.VncObjectCache(
+            max_size=100, default_ttl=60, ttls=ttls, negative_ttl=5)
+        return vnc_api_driver.VncApiClient(object_cache=object_cache)
+
     def _get_fake_project(self):
         return mock.Mock(uuid="proj-1", fq_name=["project-1"])
 
@@ -124,6 +124,66 @@ class L3FlavorTestCases(test_extensions_base.ExtensionTestCase):
         self.assertFalse(
             self.provider._validate_l3_flavor(context, None))
 
+    @mock.patch("networking_opencontrail.l3.l3_flavor.l3_obj."
+                "Router.get_object")
+    @mock.patch("networking_opencontrail.l3.l3_flavor.directory")
+    def test_validate_l3_flavor_cached(self, directory, get_router):
+        router_id, router = self._get_router_test()
+        get_router.return_value = router
+        context = self.get_mock_network_operation_context()
+        flavor_plugin = self.mock_directory(
+            directory,
+            provider="networking_opencontrail.l3.l3_flavor."
+            "TFL3ServiceProvider")
+
+        for _ in range(3):
+            self.assertTrue(
+                self.provider._validate_l3_flavor(context, router_id))
+
+        get_router.assert_called_once_with(context, id=router_id)
+        flavor_plugin.get_flavor_next_provider.assert_called_once_with(
+            context, router.flavor_id)
+
+    @mock.patch("networking_opencontrail.l3.l3_flavor.l3_obj."
+                "Router.get_object")
+    @mock.patch("networking_opencontrail.l3.l3_flavor.directory")
+    def test_router_create_fills_cache(self, directory, get_router):
+        router_id, router = self._get_router_test()
+        context = self.get_mock_network_operation_context()
+        self.mock_directory(directory, provider="other.Provider")
+        router_dict = {'id': router_id, 'flavor_id': router.flavor_id}
+
+        self.provider.router_create_precommit(
+            'router', 'precommit_create', mock.Mock(), context=context,
+            router=router_dict, router_db=mock.Mock())
+
+        self.assertFalse(
+            self.provider._validate_l3_flavor(context, router_id))
+        get_router.assert_not_called()
+        self.provider.driver.create_router.assert_not_called()
+
+    @mock.patch("networking_opencontrail.l3.l3_flavor.l3_obj."
+                "Router.get_object")
+    @mock.patch("networking_opencontrail.l3.l3_flavor.directory")
+    def test_router_delete_invalidates_cache(self, directory, get_router):
+        router_id, router = self._get_router_test()
+        get_router.return_value = router
+        context = self.get_mock_network_operation_context()
+        self.mock_directory(
+            directory,
+            provider="networking_opencontrail.l3.l3_flavor."
+            "TFL3ServiceProvider")
+
+        self.provider._validate_l3_flavor(context, router_id)
+        self.provider.router_delete_precommit(
+            'router', 'precommit_delete', mock.Mock(), context=context,
+            router_id=router_id)
+        self.provider._validate_l3_flavor(context, router_id)
+
+        self.provider.driver.delete_router.assert_called_once_with(
+            context, router_id)
+        self.assertEqual(2, get_router.call_count)
+
     def mock_directory(self, directory, provider=None):
         flavor_provider = {'driver': provider}
         flavor_plugin = mock.MagicMock()
@@ -119,7 +119,7 @@ class L3OpenContrailTestCases(test_extensions_base.ExtensionTestCase):
         hook.create_router(context, router)
 
         hook.driver.create_router.assert_called_with(context, router)
-        hook.snat_sync.sync_snat_interfaces.assert_called_once()
+        hook.snat_sync.schedule_sync.assert_called_once()
 
     @mock.patch("networking_opencontrail.l3.snat_synchronizer."
                 "SnatSynchronizer")
@@ -135,7 +135,7 @@ class L3OpenContrailTestCases(test_extensions_base.ExtensionTestCase):
         hook.delete_router(context, router_id)
 
         hook.driver.delete_router.assert_called_with(context, router_id)
-        hook.snat_sync.sync_snat_interfaces.assert_called_once()
+        hook.snat_sync.schedule_sync.assert_called_once()
 
     @mock.patch("networking_opencontrail.l3.snat_synchronizer."
                 "SnatSynchronizer")
@@ -152,7 +152,7 @@ class L3OpenContrailTestCases(test_extensions_base.ExtensionTestCase):
 
         hook.driver.update_router.assert_called_with(context, router_id,
                                                      router)
-        hook.snat_sync.sync_snat_interfaces.assert_called_once()
+        hook.snat_sync.schedule_sync.assert_called_once()
 
     @mock.patch("networking_opencontrail.l3.snat_synchronizer."
                 "SnatSynchronizer")
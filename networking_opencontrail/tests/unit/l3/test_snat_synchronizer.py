@@ -52,7 +52,8 @@ class SnatSynchronizerTestCases(test_extensions_base.ExtensionTestCase):
             self.context,
             self.router['external_gateway_info'],
             self.router['id'],
-            '10.10.10.10')
+            '10.10.10.10',
+            tenant_id=None)
 
     def test_remove_snat_interface(self):
         snat_interface = {'fixed_ips': [{'ip_address': '10.10.10.10'}]}
@@ -99,6 +100,99 @@ class SnatSynchronizerTestCases(test_extensions_base.ExtensionTestCase):
         self.neutron_helper.delete_snat_interface.assert_not_called()
 
 
+class SnatSyncSchedulingTestCases(test_extensions_base.ExtensionTestCase):
+    def setUp(self):
+        super(SnatSyncSchedulingTestCases, self).setUp()
+        logging.disable(logging.CRITICAL)
+
+        with mock.patch("networking_opencontrail.l3.snat_synchronizer."
+                        "TFHelper"):
+            self.snat_sync = snat_synchronizer.SnatSynchronizer()
+        self.snat_sync.sync_snat_interfaces = mock.Mock()
+
+        cfg_patcher = mock.patch.object(snat_synchronizer, 'cfg')
+        self.conf = cfg_patcher.start().CONF
+        self.addCleanup(cfg_patcher.stop)
+        self.conf.SNAT_SYNC.delay = 2.0
+        spawn_patcher = mock.patch.object(snat_synchronizer.eventlet,
+                                          'spawn_after')
+        self.spawn_after = spawn_patcher.start()
+        self.addCleanup(spawn_patcher.stop)
+        context_patcher = mock.patch.object(snat_synchronizer, 'n_context')
+        self.admin_context = (context_patcher.start().get_admin_context.
+                              return_value)
+        self.addCleanup(context_patcher.stop)
+
+        self.context = mock.Mock()
+        self.router_id = '9e824605-64b4-4f29-bbbb-4a537dea9f4c'
+
+    def tearDown(self):
+        super(SnatSyncSchedulingTestCases, self).tearDown()
+        logging.disable(logging.NOTSET)
+
+    def _fire_timer(self):
+        delay, func, router_id = self.spawn_after.call_args[0]
+        self.assertEqual(2.0, delay)
+        func(router_id)
+
+    def test_burst_is_coalesced(self):
+        routers = [{'name': 'router-%d' % i} for i in range(3)]
+        timers = [mock.Mock() for _ in routers]
+        self.spawn_after.side_effect = timers
+
+        for router in routers:
+            self.snat_sync.schedule_sync(self.context, self.router_id, router)
+        self._fire_timer()
+
+        timers[0].cancel.assert_called_once_with()
+        timers[1].cancel.assert_called_once_with()
+        timers[2].cancel.assert_not_called()
+        self.snat_sync.sync_snat_interfaces.assert_called_once_with(
+            self.admin_context, self.router_id, routers[2])
+        self.assertEqual({'scheduled': 3, 'coalesced': 2, 'synced': 1,
+                          'pending': 0, 'running': 0},
+                         self.snat_sync.get_stats())
+
+    def test_event_during_sync_reruns_it(self):
+        router = {'name': 'router-1'}
+        updated_router = {'name': 'router-2'}
+
+        def sync(context, router_id, router_state):
+            if router_state is router:
+                self.snat_sync.schedule_sync(context, router_id,
+                                             updated_router)
+
+        self.snat_sync.sync_snat_interfaces.side_effect = sync
+
+        self.snat_sync.schedule_sync(self.context, self.router_id, router)
+        self._fire_timer()
+
+        self.assertEqual(1, self.spawn_after.call_count)
+        self.assertEqual(
+            [mock.call(self.admin_context, self.router_id, router),
+             mock.call(self.admin_context, self.router_id, updated_router)],
+            self.snat_sync.sync_snat_interfaces.call_args_list)
+        self.assertEqual(0, self.snat_sync.get_stats()['running'])
+
+    def test_sync_without_delay(self):
+        self.conf.SNAT_SYNC.delay = 0
+
+        self.snat_sync.schedule_sync(self.context, self.router_id)
+
+        self.spawn_after.assert_not_called()
+        self.snat_sync.sync_snat_interfaces.assert_called_once_with(
+            self.context, self.router_id, None)
+
+    def test_failed_sync(self):
+        self.snat_sync.sync_snat_interfaces.side_effect = ValueError()
+
+        self.snat_sync.schedule_sync(self.context, self.router_id)
+        self._fire_timer()
+
+        self.assertEqual(1, self.snat_sync.stats['failed'])
+        self.assertEqual({}, self.snat_sync._pending)
+
+
 class NeutronSNATTestCases(test_extensions_base.ExtensionTestCase):
     def setUp(self):
         super(NeutronSNATTestCases, self).setUp()
@@ -137,6 +231,19 @@ class NeutronSNATTestCases(test_extensions_base.ExtensionTestCase):
         self.core_plugin.create_port.assert_called_once_with(
             self.context, {'port': expected_port_data})
 
+    def test_create_snat_interface_for_router_tenant(self):
+        external_gateway_info = {
+            'network_id': '60a84ed2-5722-4a50-8b15-ce65b4e210c2'}
+
+        self.neutron_helper.create_snat_interface(self.context,
+                                                  external_gateway_info,
+                                                  self.router_id,
+                                                  '10.10.10.10',
+                                                  tenant_id='tenant-1')
+
+        port_data = self.core_plugin.create_port.call_args[0][1]['port']
+        self.assertEqual('tenant-1', port_data['tenant_id'])
+
     def test_get_snat_interfaces(self):
         expected_ports = [mock.Mock()]
         self.core_plugin.get_ports.return_value = expected_ports
@@ -199,13 +306,45 @@ class TungstenFabricSNATTestCases(test_extensions_base.ExtensionTestCase):
 
     @mock.patch("retrying.time.sleep")
     def test_max_attempt_get_snat_ips(self, _):
-        self.rest_driver_mock.exceptions = [KeyError()] * 4
+        self.rest_driver_mock.exceptions = [KeyError()] * 5
 
         snat_ips = self.tf_helper.get_snat_ips(
             '9e824605-64b4-4f29-bbbb-4a537dea9f4c')
 
         self.assertEqual(snat_ips, [])
 
+    def test_get_snat_ips_reads_levels_with_list_requests(self):
+        self.rest_driver_mock.list_resource = mock.Mock(
+            wraps=self.rest_driver_mock.list_resource)
+
+        self.tf_helper.get_snat_ips('9e824605-64b4-4f29-bbbb-4a537dea9f4c')
+
+        self.rest_driver_mock.list_resource.assert_has_calls([
+            mock.call('virtual-machine', {
+                'obj_uuids': 'cde8f476-8342-4792-b020-82b40446b18a',
+                'detail': True,
+                'fields': 'virtual_machine_interface_back_refs'}),
+            mock.call('virtual-machine-interface', {
+                'obj_uuids': '0f716eb5-2820-4edc-921d-bdd6f8670733,'
+                             'fb33517f-eddb-4a4b-bf54-05226a0956c9',
+                'detail': True,
+                'fields': 'instance_ip_back_refs'}),
+            mock.call('instance-ip', {
+                'obj_uuids': 'a905c5e1-7564-44bb-9edc-436caad7d7a2',
+                'detail': True})])
+
+    @mock.patch("networking_opencontrail.l3.snat_synchronizer."
+                "MAX_UUIDS_PER_REQUEST", 1)
+    def test_get_resources_by_uuids_in_chunks(self):
+        with mock.patch("oslo_config.cfg.CONF") as conf:
+            conf.APISERVER.bulk_concurrency = 2
+            vmis = self.tf_helper._get_resources_by_uuids(
+                'virtual-machine-interface',
+                ['fb33517f-eddb-4a4b-bf54-05226a0956c9',
+                 '0f716eb5-2820-4edc-921d-bdd6f8670733'])
+
+        self.assertEqual(2, len(vmis))
+
     def test_no_router_in_tf(self):
         self.rest_driver_mock.router_status_code = 404
 
@@ -238,12 +377,24 @@ class RestDriverMock(object):
 
     def get_resource(self, res_type, query, res_id):
         if res_type != 'logical-router':
-            try:
-                raise next(self._exceptions)
-            except StopIteration:
-                pass
+            self._raise_next_exception()
         return self._get_resource(res_type, query, res_id)
 
+    def list_resource(self, res_type, query):
+        self._raise_next_exception()
+        resources = []
+        for res_id in query['obj_uuids'].split(','):
+            _, content = self._get_resource(res_type, None, res_id)
+            if content:
+                resources.append(content)
+        return self.router_status_code, {res_type + 's': resources}
+
+    def _raise_next_exception(self):
+        try:
+            raise next(self._exceptions)
+        except StopIteration:
+            pass
+
     def _get_resource(self, res_type, query, res_id):
         resource_infos = {
             'logical-router':
@@ -0,0 +1,162 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import os
+
+import fixtures
+import mock
+
+from oslo_config import cfg
+
+from networking_opencontrail.common import utils
+from networking_opencontrail.ml2 import journal
+from networking_opencontrail.tests import base
+
+
+class OperationJournalTestCase(base.TestCase):
+    def setUp(self):
+        super(OperationJournalTestCase, self).setUp()
+        utils.register_vnc_api_options()
+        self._set_config(retry_interval=10, max_attempts=3)
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'journal.sqlite')
+        self.journal = journal.OperationJournal(path)
+
+    def _set_config(self, **overrides):
+        for name, value in overrides.items():
+            cfg.CONF.set_override(name, value, 'JOURNAL')
+            self.addCleanup(cfg.CONF.clear_override, name, 'JOURNAL')
+
+    def _replay(self):
+        executed = []
+        self.journal.replay(lambda entry: executed.append(
+            (entry.resource, entry.action, entry.data)))
+        return executed
+
+    def test_record(self):
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+
+        self.assertTrue(self.journal.has_pending('port-1'))
+        self.assertFalse(self.journal.has_pending('port-2'))
+        self.assertEqual({'pending': 1}, self.journal.get_stats())
+
+    def test_replay_in_order_and_remove(self):
+        self.journal.record('network', journal.CREATE, {'id': 'net-1'})
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+        self.journal.record('port', journal.DELETE, {'id': 'port-2'})
+
+        executed = self._replay()
+
+        self.assertEqual([('network', journal.CREATE, {'id': 'net-1'}),
+                          ('port', journal.CREATE, {'id': 'port-1'}),
+                          ('port', journal.DELETE, {'id': 'port-2'})],
+                         executed)
+        self.assertEqual(0, self.journal.count())
+
+    def test_create_and_delete_are_compacted(self):
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'a'})
+        self.journal.record('port', journal.DELETE, {'id': 'port-1'})
+
+        self.assertFalse(self.journal.has_pending('port-1'))
+
+    def test_updates_are_merged(self):
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'a'})
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'b'})
+
+        self.assertEqual([('port', journal.UPDATE,
+                           {'id': 'port-1', 'name': 'b'})],
+                         self._replay())
+
+    def test_update_is_merged_into_create(self):
+        self.journal.record('port', journal.CREATE,
+                            {'id': 'port-1', 'name': 'a'})
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'b'})
+
+        self.assertEqual([('port', journal.CREATE,
+                           {'id': 'port-1', 'name': 'b'})],
+                         self._replay())
+
+    def test_delete_supersedes_updates(self):
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'a'})
+        self.journal.record('port', journal.DELETE, {'id': 'port-1'})
+
+        self.assertEqual([('port', journal.DELETE, {'id': 'port-1'})],
+                         self._replay())
+
+    def test_claimed_entry_is_not_compacted(self):
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+        claimed = self.journal.claim_next()
+
+        self.journal.record('port', journal.DELETE, {'id': 'port-1'})
+        self.assertIsNone(self.journal.claim_next())
+        self.journal.complete(claimed)
+
+        self.assertEqual([('port', journal.DELETE, {'id': 'port-1'})],
+                         self._replay())
+
+    def test_failed_entry_blocks_resource_until_retry(self):
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+        self.journal.record('port', journal.DELETE, {'id': 'port-2'})
+        execute = mock.Mock(side_effect=[RuntimeError, None])
+
+        replayed = self.journal.replay(execute)
+
+        self.assertEqual(1, replayed)
+        self.assertTrue(self.journal.has_pending('port-1'))
+        self.assertIsNone(self.journal.claim_next())
+
+    def test_failed_entry_dropped_after_max_attempts(self):
+        self._set_config(retry_interval=0)
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+        execute = mock.Mock(side_effect=RuntimeError)
+
+        self.journal.replay(execute)
+
+        self.assertEqual(3, execute.call_count)
+        self.assertFalse(self.journal.has_pending('port-1'))
+
+    def test_original_is_kept_for_replay(self):
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'b'},
+                            {'id': 'port-1', 'name': 'a'})
+        self.journal.record('port', journal.UPDATE,
+                            {'id': 'port-1', 'name': 'c'},
+                            {'id': 'port-1', 'name': 'b'})
+
+        entry = self.journal.claim_next()
+
+        self.assertEqual({'id': 'port-1', 'name': 'c'}, entry.data)
+        self.assertEqual({'id': 'port-1', 'name': 'a'}, entry.original)
+
+    def test_has_pending_loads_only_after_change(self):
+        self.assertFalse(self.journal.has_pending('port-1'))
+        self.journal.record('port', journal.CREATE, {'id': 'port-1'})
+
+        with mock.patch.object(self.journal, '_load_pending_ids',
+                               wraps=self.journal._load_pending_ids) as load:
+            self.assertTrue(self.journal.has_pending('port-1'))
+            self.assertFalse(self.journal.has_pending('port-2'))
+            self.assertEqual(1, load.call_count)
+
+            self.journal.record('port', journal.CREATE, {'id': 'port-2'})
+
+            self.assertTrue(self.journal.has_pending('port-2'))
+            self.assertEqual(2, load.call_count)
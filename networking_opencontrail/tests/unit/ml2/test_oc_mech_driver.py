@@ -38,6 +38,7 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         self.drv.initialize()
         self.drv.dm_integrator = mock.MagicMock(enabled=False)
         self.drv.tf_client = mock.MagicMock()
+        self.drv.vrouter_index = mock.Mock()
 
     def tearDown(self):
         super(OpenContrailTestCases, self).tearDown()
@@ -246,15 +247,15 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         ]
 
         # Chnage the port properties
-        port_name = 'second-port'
-
-        port_context, port = self.get_port_context(tenant_id, network_id,
-                                                   port_id, port_name)
+        port_context, port = self.get_port_context(
+            tenant_id, network_id, port_id, 'second-port',
+            original_name=port_name)
         self.drv.update_port_postcommit(port_context)
 
         expected_calls.append(
             mock.call.OpenContrailDrivers().update_port(
-                port_context._plugin_context, port_id, port))
+                port_context._plugin_context, port_id,
+                {'port': {'id': port_id, 'name': 'second-port'}}))
 
         mech_driver.drv.assert_has_calls(expected_calls)
 
@@ -276,21 +277,100 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         ]
 
         # Chnage the port properties
-        port_name = 'second-port'
-
-        port_context, port = self.get_port_context(tenant_id, network_id,
-                                                   port_id, port_name)
+        port_context, port = self.get_port_context(
+            tenant_id, network_id, port_id, 'second-port',
+            original_name=port_name)
         self.drv.update_port_postcommit(port_context)
 
         expected_calls.append(
             mock.call.OpenContrailDrivers().update_port(
-                port_context._plugin_context, port_id, port))
+                port_context._plugin_context, port_id,
+                {'port': {'id': port_id, 'name': 'second-port'}}))
 
         mech_driver.drv.assert_has_calls(expected_calls)
         self.drv.dm_integrator.sync_vlan_tagging_for_port.assert_called_with(
             port_context._plugin_context, port_context.current,
             port_context.original)
 
+    def test_failed_operation_recorded_in_journal(self):
+        self.drv.journal = mock.Mock()
+        self.drv.journal.has_pending.return_value = False
+        self.mock_drv_opencontrail_method('create_network', None)
+        self.drv.drv.create_network.side_effect = RuntimeError
+        net_context, network = self.get_network_context('ten-1', 'net-1')
+
+        self.drv.create_network_postcommit(net_context)
+
+        self.drv.journal.record.assert_called_once_with(
+            'network', 'create', network['network'], None)
+
+    def test_operation_recorded_when_resource_pending_in_journal(self):
+        self.drv.journal = mock.Mock()
+        self.drv.journal.has_pending.return_value = True
+        self.mock_drv_opencontrail_method('update_network', None)
+        net_context, network = self.get_network_context('ten-1', 'net-1')
+
+        self.drv.update_network_postcommit(net_context)
+
+        self.drv.drv.update_network.assert_not_called()
+        self.drv.journal.record.assert_called_once_with(
+            'network', 'update', network['network'], None)
+
+    @mock.patch('networking_opencontrail.common.circuit_breaker.'
+                'get_circuit_breaker')
+    def test_operation_recorded_when_circuit_open(self, get_breaker):
+        get_breaker.return_value.is_open = True
+        self.drv.journal = mock.Mock()
+        self.drv.journal.has_pending.return_value = False
+        self.mock_drv_opencontrail_method('update_network', None)
+        net_context, network = self.get_network_context('ten-1', 'net-1')
+
+        self.drv.update_network_postcommit(net_context)
+
+        self.drv.drv.update_network.assert_not_called()
+        self.drv.journal.record.assert_called_once_with(
+            'network', 'update', network['network'], None)
+
+    @mock.patch('networking_opencontrail.ml2.mech_driver.n_context')
+    def test_async_operations_ordered_per_network(self, n_context):
+        self.drv.dispatcher = mock.Mock(enabled=True)
+        net_context, _ = self.get_network_context('ten-1', 'net-1')
+        subnet_context, _ = self.get_subnet_context('ten-1', 'net-1',
+                                                    'sub-1')
+        port_context, _ = self.get_port_context('ten-1', 'net-1', 'port-1')
+
+        self.drv.create_network_postcommit(net_context)
+        self.drv.create_subnet_postcommit(subnet_context)
+        self.drv.create_port_postcommit(port_context)
+
+        calls = self.drv.dispatcher.dispatch.call_args_list
+        self.assertEqual(['net-1'] * 3, [c[0][0] for c in calls])
+        queued_context = n_context.Context.from_dict.return_value
+        self.assertEqual([queued_context] * 3, [c[0][3] for c in calls])
+        n_context.Context.from_dict.assert_called_with(
+            {'tenant_id': 'ten-1'})
+        n_context.get_admin_context.assert_not_called()
+
+    def test_replay_journal_entry(self):
+        self.mock_drv_opencontrail_method('delete_port', None)
+        entry = mock.Mock(resource='port', action='delete',
+                          data={'id': 'port-1'})
+
+        self.drv._replay_journal_entry(entry)
+
+        self.drv.drv.delete_port.assert_called_once_with(mock.ANY, 'port-1')
+
+    def test_replay_journal_entry_with_original(self):
+        self.drv._execute = mock.Mock()
+        entry = mock.Mock(resource='port', action='update',
+                          data={'id': 'port-1', 'name': 'b'},
+                          original={'id': 'port-1', 'name': 'a'})
+
+        self.drv._replay_journal_entry(entry)
+
+        self.drv._execute.assert_called_once_with(
+            mock.ANY, 'port', 'update', entry.data, entry.original)
+
     def test_create_port_omit_callback(self):
         network_id = 'test_net1'
         tenant_id = 'ten-1'
@@ -315,6 +395,18 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
 
         mech_driver.drv.OpenContrailDrivers().delete_port.assert_not_called()
 
+    def test_update_port_without_changes_for_tf(self):
+        port_context, port = self.get_port_context(
+            'ten-1', 'net-1', 'port-1', 'port', original_name='port')
+        port_context.current['status'] = 'ACTIVE'
+        port_context.original['status'] = 'DOWN'
+
+        self.drv.update_port_postcommit(port_context)
+
+        self.drv.drv.update_port.assert_not_called()
+        self.assertEqual({'port_updates_suppressed': 1},
+                         self.drv.get_stats())
+
     def test_update_port_omit_callback(self):
         network_id = 'test_net1'
         tenant_id = 'ten-1'
@@ -335,10 +427,8 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         context.network.current = {"id": "asd"}
 
         self.drv.bind_port(context)
-        self.drv.tf_client.get_virtual_router.assert_called_with(
-            fq_name=[
-                self.drv.tf_client.DEFAULT_GLOBAL_CONF,
-                context._port["binding:host_id"]])
+        self.drv.vrouter_index.is_managed.assert_called_with(
+            context._port["binding:host_id"])
 
     def test_bind_port_ommits_port_when_not_in_tf(self):
         context = mock.Mock()
@@ -346,7 +436,7 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         context.current = {"id": "asd"}
         context.network.current = {"id": "asd"}
 
-        self.drv.tf_client.get_virtual_router.return_value = None
+        self.drv.vrouter_index.is_managed.return_value = False
 
         self.drv.bind_port(context)
 
@@ -455,7 +545,7 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
         return context, subnt
 
     def get_port_context(self, ten_id, net_id, port_id, port_name=None,
-                         device_owner=None):
+                         device_owner=None, original_name=None):
         if not port_name:
             port_name = 'test_port'
         port = {'id': port_id,
@@ -463,7 +553,10 @@ class OpenContrailTestCases(testlib_api.SqlTestCase):
                 'tenant_id': ten_id,
                 'name': port_name,
                 'device_owner': device_owner}
-        context = fake_port_context(ten_id, port, port)
+        original = port
+        if original_name:
+            original = dict(port, name=original_name)
+        context = fake_port_context(ten_id, port, original)
         prt = {'port': port}
         return context, prt
 
@@ -525,3 +618,6 @@ class fake_plugin_context(object):
     def __init__(self, tenant_id):
         self.tenant_id = tenant_id
         self.session = mock.MagicMock()
+
+    def to_dict(self):
+        return {'tenant_id': self.tenant_id}
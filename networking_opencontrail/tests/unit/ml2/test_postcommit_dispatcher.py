@@ -0,0 +1,119 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import eventlet
+import mock
+
+from oslo_config import cfg
+
+from networking_opencontrail.common import utils
+from networking_opencontrail.ml2 import postcommit_dispatcher
+from networking_opencontrail.tests import base
+
+
+class PostcommitDispatcherTestCase(base.TestCase):
+    def setUp(self):
+        super(PostcommitDispatcherTestCase, self).setUp()
+        utils.register_vnc_api_options()
+        self._set_config(enabled=True, workers=2, retry_interval=0)
+        self.dispatcher = postcommit_dispatcher.PostcommitDispatcher()
+
+    def _set_config(self, **overrides):
+        for name, value in overrides.items():
+            cfg.CONF.set_override(name, value, 'ASYNC_POSTCOMMIT')
+            self.addCleanup(cfg.CONF.clear_override, name,
+                            'ASYNC_POSTCOMMIT')
+
+    def _wait_for_queues(self):
+        for _ in range(100):
+            if not self.dispatcher.get_queue_depth():
+                return
+            eventlet.sleep(0)
+        self.fail("Operations were not processed")
+
+    def test_dispatch_executes_immediately_when_disabled(self):
+        self._set_config(enabled=False)
+        func = mock.Mock()
+
+        self.dispatcher.dispatch('res-1', "Failed", func, 'arg')
+
+        func.assert_called_once_with('arg')
+        self.assertEqual(0, self.dispatcher.get_queue_depth())
+
+    def test_dispatch_does_not_raise_when_disabled(self):
+        self._set_config(enabled=False)
+        func = mock.Mock(side_effect=RuntimeError)
+
+        self.dispatcher.dispatch('res-1', "Failed", func)
+
+        func.assert_called_once_with()
+
+    def test_dispatch_is_asynchronous(self):
+        func = mock.Mock()
+
+        self.dispatcher.dispatch('res-1', "Failed", func)
+
+        func.assert_not_called()
+        self.assertEqual(1, self.dispatcher.get_queue_depth())
+        self._wait_for_queues()
+        func.assert_called_once_with()
+
+    def test_operations_on_resource_are_ordered(self):
+        calls = []
+
+        def operation(name):
+            eventlet.sleep(0)
+            calls.append(name)
+
+        for i in range(5):
+            self.dispatcher.dispatch('res-1', "Failed", operation, i)
+        self._wait_for_queues()
+
+        self.assertEqual(list(range(5)), calls)
+
+    def test_failed_operation_is_retried_before_next(self):
+        calls = []
+        failing = mock.Mock(side_effect=[RuntimeError, RuntimeError, None])
+
+        def first():
+            failing()
+            calls.append('first')
+
+        self.dispatcher.dispatch('res-1', "Failed", first)
+        self.dispatcher.dispatch('res-1', "Failed", calls.append, 'second')
+        self._wait_for_queues()
+
+        self.assertEqual(['first', 'second'], calls)
+        stats = self.dispatcher.get_stats()
+        self.assertEqual(2, stats['retried'])
+        self.assertEqual(2, stats['completed'])
+
+    def test_operation_dropped_after_max_retries(self):
+        self._set_config(max_retries=2)
+        func = mock.Mock(side_effect=RuntimeError)
+
+        self.dispatcher.dispatch('res-1', "Failed", func)
+        self._wait_for_queues()
+
+        self.assertEqual(3, func.call_count)
+        self.assertEqual(1, self.dispatcher.get_stats()['failed'])
+
+    def test_get_lag(self):
+        self.assertEqual(0.0, self.dispatcher.get_lag())
+
+        with mock.patch('time.time', return_value=100.0):
+            self.dispatcher.dispatch('res-1', "Failed", mock.Mock())
+        with mock.patch('time.time', return_value=103.0):
+            self.assertEqual(3.0, self.dispatcher.get_lag())
@@ -214,6 +214,8 @@ class SecurityGroupTestCases(testlib_api.SqlTestCase):
             **kwargs)
         log_mock.error.assert_called()
         log_mock.exception.assert_called()
+        self.sg_handler.client.delete_security_group_rule.assert_called_with(
+            kwargs['context'], kwargs['security_group_rule']['id'])
 
     @mock.patch('networking_opencontrail.ml2.opencontrail_sg_callback.LOG')
     def test_delete_security_group_rule_fails(self, log_mock):
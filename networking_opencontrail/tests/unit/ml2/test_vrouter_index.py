@@ -0,0 +1,77 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import mock
+
+from oslo_config import cfg
+
+from networking_opencontrail.common import utils
+from networking_opencontrail.ml2 import vrouter_index
+from networking_opencontrail.tests import base
+
+
+class VirtualRouterIndexTestCase(base.TestCase):
+    def setUp(self):
+        super(VirtualRouterIndexTestCase, self).setUp()
+        utils.register_vnc_api_options()
+        self.tf_client = mock.Mock(DEFAULT_GLOBAL_CONF='global')
+        self.tf_client.list_virtual_routers.return_value = [
+            {'fq_name': ['global', 'compute-1'], 'uuid': 'vr-1'},
+            {'fq_name': ['global', 'compute-2'], 'uuid': 'vr-2'}]
+        self.index = vrouter_index.VirtualRouterIndex(self.tf_client)
+
+    def _is_managed_at(self, host_id, now):
+        with mock.patch('time.time', return_value=now):
+            return self.index.is_managed(host_id)
+
+    def test_known_host_is_managed_without_reload(self):
+        self.assertTrue(self._is_managed_at('compute-1', 100.0))
+        self.assertTrue(self._is_managed_at('compute-2', 101.0))
+
+        self.tf_client.list_virtual_routers.assert_called_once_with()
+        self.tf_client.get_virtual_router.assert_not_called()
+
+    def test_unknown_host_reloads_with_rate_limit(self):
+        self.assertTrue(self._is_managed_at('compute-1', 100.0))
+
+        self.assertFalse(self._is_managed_at('baremetal', 101.0))
+        self.assertFalse(self._is_managed_at('baremetal', 102.0))
+
+        self.assertEqual(2, self.tf_client.list_virtual_routers.call_count)
+
+    def test_new_host_is_found_after_reload_on_miss(self):
+        self.assertFalse(self._is_managed_at('compute-3', 100.0))
+        self.tf_client.list_virtual_routers.return_value.append(
+            {'fq_name': ['global', 'compute-3'], 'uuid': 'vr-3'})
+
+        interval = cfg.CONF.VROUTER_INDEX.miss_refresh_interval
+        self.assertTrue(self._is_managed_at('compute-3', 101.0 + interval))
+
+    def test_index_is_reloaded_periodically(self):
+        self._is_managed_at('compute-1', 100.0)
+
+        interval = cfg.CONF.VROUTER_INDEX.refresh_interval
+        self._is_managed_at('compute-1', 100.0 + interval)
+
+        self.assertEqual(2, self.tf_client.list_virtual_routers.call_count)
+
+    def test_host_is_read_when_index_cannot_be_loaded(self):
+        self.tf_client.list_virtual_routers.side_effect = RuntimeError
+        self.tf_client.get_virtual_router.return_value = None
+
+        self.assertFalse(self._is_managed_at('compute-1', 100.0))
+
+        self.tf_client.get_virtual_router.assert_called_once_with(
+            fq_name=['global', 'compute-1'])
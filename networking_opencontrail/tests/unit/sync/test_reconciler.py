@@ -0,0 +1,165 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import mock
+
+from networking_opencontrail.sync import reconciler
+from networking_opencontrail.tests import base
+
+
+class ReconcilerTestCase(base.TestCase):
+    def setUp(self):
+        super(ReconcilerTestCase, self).setUp()
+        self.plugin = mock.Mock()
+        self._patch('directory.get_plugin', return_value=self.plugin)
+        self._patch('drv.OpenContrailDrivers')
+        self._patch('rest_driver.ContrailRestApiDriver')
+        self.context = mock.Mock()
+        self.reconciler = reconciler.Reconciler(page_size=2)
+        self.driver = self.reconciler.driver
+        self.rest_driver = self.reconciler.rest_driver
+
+    def _patch(self, target, **kwargs):
+        patcher = mock.patch(
+            'networking_opencontrail.sync.reconciler.' + target, **kwargs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _network(net_id, name='net'):
+        return {'id': net_id, 'name': name, 'admin_state_up': True,
+                'shared': False, 'router:external': False}
+
+    def test_sync_creates_and_updates_only_differences(self):
+        neutron = [self._network('1'), self._network('2', name='new'),
+                   self._network('3')]
+        self.plugin.get_networks.side_effect = [neutron[:2], neutron[2:]]
+        self.driver.get_networks.side_effect = [
+            [self._network('1'), self._network('2', name='old')], []]
+
+        report = self.reconciler.reconcile(self.context, [reconciler.NETWORK])
+
+        self.plugin.get_networks.assert_has_calls([
+            mock.call(self.context, sorts=[('id', True)], limit=2,
+                      marker=None),
+            mock.call(self.context, sorts=[('id', True)], limit=2,
+                      marker='2')])
+        self.driver.get_networks.assert_has_calls([
+            mock.call(self.context, filters={'id': ['1', '2']},
+                      fields=mock.ANY),
+            mock.call(self.context, filters={'id': ['3']},
+                      fields=mock.ANY)])
+        self.driver.update_network.assert_called_once_with(
+            self.context, '2', {'network': neutron[1]})
+        self.driver.create_network.assert_called_once_with(
+            self.context, {'network': neutron[2]})
+        self.assertEqual({'created': 1, 'updated': 1, 'in_sync': 1},
+                         report['network'])
+
+    def test_sync_creates_page_in_bulk(self):
+        neutron = [self._network('1'), self._network('2')]
+        self.plugin.get_networks.side_effect = [neutron, []]
+        self.driver.get_networks.return_value = []
+        self.driver.create_network_bulk.return_value = [
+            neutron[0], RuntimeError()]
+
+        report = self.reconciler.reconcile(self.context, [reconciler.NETWORK])
+
+        self.driver.create_network_bulk.assert_called_once_with(
+            self.context, {'networks': [{'network': neutron[0]},
+                                        {'network': neutron[1]}]})
+        self.driver.create_network.assert_not_called()
+        self.assertEqual({'created': 1, 'failed': 1}, report['network'])
+
+    def test_hash_ignores_order_of_lists(self):
+        port = {'fixed_ips': [{'ip_address': '10.0.0.2', 'subnet_id': 'a'},
+                              {'ip_address': '10.0.0.1', 'subnet_id': 'a'}],
+                'security_groups': ['sg-1', 'sg-2']}
+        reordered = {'fixed_ips': list(reversed(port['fixed_ips'])),
+                     'security_groups': ['sg-2', 'sg-1']}
+
+        self.assertEqual(reconciler.PORT.content_hash(port),
+                         reconciler.PORT.content_hash(reordered))
+
+    def test_sync_skips_ports_omitted_by_mech_driver(self):
+        self.plugin.get_ports.return_value = [
+            {'id': 'fip-port', 'device_owner': 'network:floatingip'}]
+
+        report = self.reconciler.reconcile(self.context, [reconciler.PORT])
+
+        self.driver.get_ports.assert_not_called()
+        self.assertEqual({}, report['port'])
+
+    def test_dry_run_does_not_change_tf(self):
+        self.reconciler.dry_run = True
+        self.plugin.get_networks.return_value = [self._network('1')]
+        self.driver.get_networks.return_value = []
+
+        report = self.reconciler.reconcile(self.context, [reconciler.NETWORK])
+
+        self.driver.create_network.assert_not_called()
+        self.assertEqual({'created': 1}, report['network'])
+
+    def test_failure_is_counted(self):
+        self.plugin.get_networks.return_value = [self._network('1')]
+        self.driver.get_networks.return_value = []
+        self.driver.create_network.side_effect = RuntimeError
+
+        report = self.reconciler.reconcile(self.context, [reconciler.NETWORK])
+
+        self.assertEqual({'failed': 1}, report['network'])
+
+    def test_find_orphans(self):
+        self.reconciler.find_orphans = True
+        self.plugin.get_networks.side_effect = [
+            [dict(self._network('kept'), tenant_id='p1')], [{'id': 'kept'}]]
+        self.driver.get_networks.return_value = [self._network('kept')]
+        self.rest_driver.list_resource.return_value = (200, {
+            'virtual-networks': [
+                {'virtual-network': self._tf_network('kept')},
+                {'virtual-network': self._tf_network('orphan')},
+                {'virtual-network': self._tf_network('other-project',
+                                                     project='p-2')},
+                {'virtual-network': self._tf_network('other-creator',
+                                                     creator='kube')},
+                {'virtual-network': {
+                    'uuid': 'internal', 'parent_type': 'project',
+                    'parent_uuid': 'p-1',
+                    'fq_name': ['default-domain', 'default-project',
+                                'ip-fabric']}}]})
+
+        report = self.reconciler.reconcile(self.context, [reconciler.NETWORK])
+
+        self.rest_driver.list_resource.assert_called_once_with(
+            'virtual-network', {'detail': True, 'page_limit': 2})
+        self.plugin.get_networks.assert_called_with(
+            self.context, filters={'id': ['kept', 'orphan']}, fields=['id'])
+        self.driver.delete_network.assert_not_called()
+        self.assertEqual(['orphan'], [tf_obj['uuid'] for _, tf_obj
+                                      in self.reconciler.orphans])
+        self.assertEqual({'in_sync': 1, 'orphaned': 1}, report['network'])
+
+        self.reconciler.delete_orphans(self.context, report)
+
+        self.driver.delete_network.assert_called_once_with(self.context,
+                                                           'orphan')
+        self.assertEqual({'in_sync': 1, 'orphaned': 1, 'deleted': 1},
+                         report['network'])
+
+    @staticmethod
+    def _tf_network(uuid, project='p-1', creator=None):
+        return {'uuid': uuid, 'parent_type': 'project',
+                'parent_uuid': project, 'id_perms': {'creator': creator},
+                'fq_name': ['default-domain', 'admin', uuid]}
@@ -0,0 +1,94 @@
+# Copyright (c) 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+"""Compare JSON codecs on payloads exchanged with VNC API.
+
+Usage: python tools/benchmark_json_codecs.py [--items N] [--repeat N]
+"""
+import argparse
+import timeit
+import uuid
+
+from networking_opencontrail.common import codec
+
+
+def make_port(index):
+    return {
+        'id': str(uuid.uuid4()),
+        'name': 'port-%d' % index,
+        'tenant_id': uuid.uuid4().hex,
+        'network_id': str(uuid.uuid4()),
+        'mac_address': '02:00:00:%02x:%02x:%02x' % (
+            index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff),
+        'admin_state_up': True,
+        'status': 'ACTIVE',
+        'device_id': str(uuid.uuid4()),
+        'device_owner': 'compute:nova',
+        'fixed_ips': [{'subnet_id': str(uuid.uuid4()),
+                       'ip_address': '10.%d.%d.%d' % (
+                           index >> 16 & 0xff, index >> 8 & 0xff,
+                           index & 0xff)}],
+        'security_groups': [str(uuid.uuid4())],
+        'allowed_address_pairs': [],
+        'binding:host_id': 'compute-%d' % (index % 100),
+        'binding:vif_type': 'vrouter',
+        'binding:vif_details': {'port_filter': True},
+        'created_at': '2019-01-01T00:00:00Z',
+        'updated_at': '2019-01-01T00:00:00Z',
+    }
+
+
+def make_sg_rule(index):
+    return {
+        'id': str(uuid.uuid4()),
+        'tenant_id': uuid.uuid4().hex,
+        'security_group_id': str(uuid.uuid4()),
+        'direction': 'ingress' if index % 2 else 'egress',
+        'ethertype': 'IPv4',
+        'protocol': 'tcp',
+        'port_range_min': index % 65535,
+        'port_range_max': index % 65535,
+        'remote_ip_prefix': '0.0.0.0/0',
+        'remote_group_id': None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=5000,
+                        help='Number of resources in a listing')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Number of repetitions of each measurement')
+    args = parser.parse_args()
+
+    payloads = {
+        'ports': [make_port(i) for i in range(args.items)],
+        'sg_rules': [make_sg_rule(i) for i in range(args.items)],
+    }
+
+    print("%-10s %-8s %12s %12s" % ('payload', 'codec', 'dumps [ms]',
+                                    'loads [ms]'))
+    for payload_name, payload in sorted(payloads.items()):
+        encoded = codec.StdlibCodec().dumps(payload)
+        for codec_name, json_codec in codec.CODECS.items():
+            dumps = min(timeit.repeat(lambda: json_codec.dumps(payload),
+                                      number=1, repeat=args.repeat))
+            loads = min(timeit.repeat(lambda: json_codec.loads(encoded),
+                                      number=1, repeat=args.repeat))
+            print("%-10s %-8s %12.2f %12.2f" % (
+                payload_name, codec_name, dumps * 1000, loads * 1000))
+
+
+if __name__ == '__main__':
+    main()